@@ -0,0 +1,90 @@
+"""Deadline order, adding and removing active jobs: a plain list against JobEnv's ActiveJobs.
+
+    python -m benchmarks.active_jobs
+
+A long session on a busy generated catalogue keeps up to ~170 jobs active.
+Every day, `sorted` orders env.jobs by remaining deadlines the way the pages
+used to, and `index` reads the same order from env.jobs_by_deadline(); the
+two must agree. Then n of the catalogue's jobs are added to a list and to an
+ActiveJobs, and taken out again in random order, from the sizes a session
+has (10 to a few hundred) up to ones it doesn't. Each figure is the best of
+a few runs. list.remove is a scan in C, so it only loses once lists grow;
+ActiveJobs.remove is a dict pop and does not grow with n.
+"""
+import copy
+import random
+import time
+
+from investment import job_env
+from investment.generator import JobGenerator
+
+N_DAYS = 400
+N_WORKERS = 60
+
+
+def deadline_order(job):
+    return max(0, job.soft_deadline_remaining()), job.hard_deadline_remaining()
+
+
+def main():
+    env = job_env.JobEnv(JobGenerator(0, arrival_rate=12, max_arrivals=30), N_DAYS, N_WORKERS)
+    rng = random.Random(0)
+    sort_seconds = index_seconds = 0
+    peak = []
+    for _ in range(N_DAYS):
+        env.step([1]*len(env.offers), [int(rng.random() < 0.7) for _ in env.jobs])
+        start = time.perf_counter()
+        expected = sorted(env.jobs, key=deadline_order)
+        sort_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = env.jobs_by_deadline()
+        index_seconds += time.perf_counter() - start
+        assert actual == expected
+        if len(env.jobs) > len(peak):
+            peak = list(env.jobs)
+
+    print(f"{N_DAYS} days, up to {len(peak)} active jobs")
+    print(f"{'Deadline order, sorted':<28} {sort_seconds / N_DAYS * 1e6:>8.1f} us/day")
+    print(f"{'Deadline order, index':<28} {index_seconds / N_DAYS * 1e6:>8.1f} us/day")
+
+    catalogue = JobGenerator(1, arrival_rate=12, max_arrivals=30)
+    offered = [(day, copy.copy(job)) for day in range(1000) for job in catalogue[day]]
+    print(f"{'Jobs':>6} {'list.append':>12} {'ActiveJobs.add':>15} {'list.remove':>12} {'ActiveJobs.remove':>18}  us/job")
+    for n in (10, 30, 100, 300, 1000, 5000):
+        jobs = offered[:n]
+        order = [job for _, job in jobs]
+        rng.shuffle(order)
+        repeats = max(1, 20000 // n)
+        times = [min(time_list(jobs, order, repeats) for _ in range(5)),
+                 min(time_index(jobs, order, repeats) for _ in range(5))]
+        (list_add, list_remove), (index_add, index_remove) = [[t / (repeats*n) * 1e6 for t in pair] for pair in times]
+        print(f"{n:>6} {list_add:>12.2f} {index_add:>15.2f} {list_remove:>12.2f} {index_remove:>18.2f}")
+
+
+def time_list(jobs, order, repeats):
+    lists = [[] for _ in range(repeats)]
+    start = time.perf_counter()
+    for active in lists:
+        for _, job in jobs:
+            active.append(job)
+    added = time.perf_counter()
+    for active in lists:
+        for job in order:
+            active.remove(job)
+    return added - start, time.perf_counter() - added
+
+
+def time_index(jobs, order, repeats):
+    indexes = [job_env.ActiveJobs() for _ in range(repeats)]
+    start = time.perf_counter()
+    for active in indexes:
+        for day, job in jobs:
+            active.add(job, day)
+    added = time.perf_counter()
+    for active in indexes:
+        for job in order:
+            active.remove(job)
+    return added - start, time.perf_counter() - added
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Time and environment loads of the session export after a full session of random play.
+
+    python -m benchmarks.export_stream
+
+Players stand in for oTree's: every read of participant.vars unpickles the
+stored environment, as loading a participant from the database does.
+`per player` is the previous custom_export, which loaded the environment for
+every player of every round. `streamed` is export.export_rows. Both must
+produce the same rows up to order.
+
+check_parquet exports a session with pay scaled by 1.05 with a Parquet
+path, and reads the file back: it must hold the CSV rows, fractional
+payments included.
+"""
+import os
+import pickle
+import tempfile
+import time
+
+from investment import export, job_env
+from .participant_state import N_DAYS, PARTS, play_session
+
+
+class Participant:
+    def __init__(self, code, blob):
+        self.code = code
+        self.blob = blob
+        self.loads = 0
+
+    @property
+    def vars(self):
+        self.loads += 1
+        return {'env': pickle.loads(self.blob)}
+
+
+class Player:
+    def __init__(self, participant_id, participant, round_number):
+        self.participant_id = participant_id
+        self.participant = participant
+        self.round_number = round_number
+        self.id_in_group = participant_id + 1
+
+
+def get_env(player):
+    return player.participant.vars['env']
+
+
+def per_player_rows(players):
+    for player in players:
+        env = get_env(player)
+        if len(env.history.history) > player.round_number-1:
+            for row in export.day_rows(player.id_in_group, player.round_number,
+                                       env.history.history[player.round_number-1]):
+                yield row + [player.participant.code]
+
+
+def session_players(envs):
+    participants = [Participant(f'p{i}', pickle.dumps(env)) for i, env in enumerate(envs)]
+    # oTree orders the export by round, then participant
+    return participants, [Player(i, participant, round_number)
+                          for round_number in range(1, N_DAYS + 1) for i, participant in enumerate(participants)]
+
+
+def check_parquet(n_participants=3, pay_scale_factor=1.05):
+    import pyarrow.parquet as pq
+
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS, pay_scale_factor=pay_scale_factor)
+    _, players = session_players(play_session(n_participants, catalogue, job_env.register_catalogue(catalogue)))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'export.parquet')
+        rows = list(export.export_rows(players, get_env, path))
+        table = pq.read_table(path)
+        n_groups = pq.ParquetFile(path).num_row_groups
+    assert table.schema.names == export.EXPORT_HEADERS
+    assert table.num_rows == len(rows)
+    read = list(zip(*(table.column(name).to_pylist() for name in export.EXPORT_HEADERS)))
+    assert read == [tuple(None if value == '' else value for value in row) for row in rows]
+    payments = [row[-2] for row in rows if row[-2] != '']
+    assert any(payment != int(payment) for payment in payments)
+    return len(rows), n_groups
+
+
+def main():
+    n_rows, n_groups = check_parquet()
+    print(f"Parquet round trip with pay scaled by 1.05: {n_rows} rows in {n_groups} row groups\n")
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    key = job_env.register_catalogue(catalogue)
+    print(f"{'Participants':>12} {'Export':<10} {'Rows':>8} {'Seconds':>8} {'Env loads':>10}")
+    for n in (6, 60):
+        participants, players = session_players(play_session(n, catalogue, key))
+        results = {}
+        for name, rows in (('per player', per_player_rows), ('streamed', lambda p: export.export_rows(p, get_env))):
+            for participant in participants:
+                participant.loads = 0
+            start = time.perf_counter()
+            results[name] = sorted(map(tuple, rows(players)), key=repr)
+            elapsed = time.perf_counter() - start
+            loads = sum(participant.loads for participant in participants)
+            print(f"{n:>12} {name:<10} {len(results[name]):>8} {elapsed:>8.2f} {loads:>10}")
+        assert results['per player'] == results['streamed']
+
+
+if __name__ == '__main__':
+    main()
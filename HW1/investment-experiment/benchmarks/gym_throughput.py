@@ -0,0 +1,51 @@
+"""Env-steps/sec of the gymnasium interfaces with 1, 16 and 256 sub-environments.
+
+    python -m benchmarks.gym_throughput
+
+`native` is JobVectorEnv, which steps every sub-environment in one call.
+`sync` is gymnasium's SyncVectorEnv looping over JobGymEnv instances. Both
+play random MultiBinary actions over full 100-day episodes, on test_jobs.csv
+and on a generator.JobGenerator catalogue.
+"""
+import time
+
+import numpy as np
+from gymnasium.vector import SyncVectorEnv
+
+from investment import gym_env, job_env
+from investment.generator import JobGenerator
+
+N_DAYS = 100
+N_WORKERS = 10
+PARTS = 10
+
+
+def throughput(envs, n_episodes):
+    rng = np.random.default_rng(0)
+    envs.reset(seed=0)
+    n_actions = envs.single_action_space.n
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(n_episodes):
+        for _ in range(N_DAYS):
+            envs.step((rng.random((envs.num_envs, n_actions)) < 0.5).astype(np.int8))
+            steps += envs.num_envs
+        envs.step(np.zeros((envs.num_envs, n_actions), dtype=np.int8))  # autoreset
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    job_env.fill_length_quantiles(job_env.flatten(catalogue))
+    catalogues = [('test_jobs.csv', catalogue), ('generated', JobGenerator(0, parts=PARTS))]
+    print(f"{'Catalogue':<13} {'Sub-envs':>8} {'native steps/s':>15} {'sync steps/s':>13} {'speedup':>8}")
+    for name, all_jobs in catalogues:
+        for n in (1, 16, 256):
+            native = throughput(gym_env.JobVectorEnv(all_jobs, N_DAYS, N_WORKERS, n), max(1, 256 // n))
+            sync = SyncVectorEnv([lambda: gym_env.JobGymEnv(all_jobs, N_DAYS, N_WORKERS) for _ in range(n)])
+            looped = throughput(sync, 1)
+            print(f"{name:<13} {n:>8} {native:>15,.0f} {looped:>13,.0f} {native / looped:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Check EnvHistory's running aggregates against a recompute from scratch.
+
+    python -m benchmarks.history_aggregates
+
+Every metric is compared after every simulated day, for several seeds, against
+the flatten-and-sum definitions EnvHistory used before it kept running
+totals. It exits non-zero on any mismatch and then reports how long one
+per-step metric refresh (every metric plus the current day's cumulative
+payment) takes both ways as the history grows.
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from investment import job_env
+
+N_DAYS = 100
+N_WORKERS = 10
+PARTS = 10
+
+
+def recomputed_metrics(hist, all_days=True):
+    taken = hist.get_taken(flattened=True)
+    untaken = hist.get_untaken(flattened=True)
+    ended = hist.get_ended(flattened=True)
+    payments = np.cumsum([day_hist.get_payment() for day_hist in hist.history])
+    n_taken = len(taken)
+    n_assigned = sum(day_hist.get_n_workers_assigned() for day_hist in hist.history)
+    metrics = {
+        'n_taken': n_taken,
+        'n_ended': len(ended),
+        'acceptance_rate': n_taken / (n_taken + len(untaken)),
+        'completion_rate': sum(job.completed for job in ended) / len(ended) if ended else None,
+        'on_time_rate': sum(job.on_time for job in ended) / len(ended) if ended else None,
+        'avg_accepted_length': sum(job.expected_length(current=False) for job in taken) / n_taken if n_taken else 0,
+        'avg_accepted_workers': sum(job.n_workers for job in taken) / n_taken if n_taken else 0,
+        'avg_accepted_rate': sum(job.return_rate(current=False) for job in taken) / n_taken if n_taken else 0,
+        'n_workers_assigned': n_assigned,
+        'utilization': n_assigned / (hist.n_workers * len(hist.history)),
+        'total_payment': payments[-1],
+        'payments_by_day': [payments[day-1] for day in range(1, len(hist.history) + 1)] if all_days else payments[-1],
+        'rate': payments[-1] / (hist.n_workers * len(hist.history)),
+    }
+    return metrics
+
+
+def running_metrics(hist, all_days=True):
+    ended = hist.get_n_ended() > 0
+    return {
+        'n_taken': hist.get_n_taken(),
+        'n_ended': hist.get_n_ended(),
+        'acceptance_rate': hist.acceptance_rate(),
+        'completion_rate': hist.completion_rate() if ended else None,
+        'on_time_rate': hist.on_time_rate() if ended else None,
+        'avg_accepted_length': hist.avg_accepted_length(),
+        'avg_accepted_workers': hist.avg_accepted_workers(),
+        'avg_accepted_rate': hist.avg_accepted_rate(),
+        'n_workers_assigned': hist.get_n_workers_assigned(),
+        'utilization': hist.utilization(),
+        'total_payment': hist.total_payment(),
+        'payments_by_day': [hist.total_payment(day) for day in range(1, len(hist.history) + 1)] if all_days else hist.total_payment(len(hist.history)),
+        'rate': hist.rate(),
+    }
+
+
+def check_equivalence(seeds):
+    mismatches = 0
+    for seed in seeds:
+        rng = random.Random(seed)
+        env = job_env.JobEnv(job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS), N_DAYS, N_WORKERS)
+        p_accept, p_work = rng.uniform(0.1, 1), rng.uniform(0.3, 1)
+        for _ in range(N_DAYS):
+            env.step([int(rng.random() < p_accept) for _ in env.offers],
+                     [int(rng.random() < p_work) for _ in env.jobs])
+            expected, actual = recomputed_metrics(env.history), running_metrics(env.history)
+            for name in expected:
+                if expected[name] != actual[name]:
+                    mismatches += 1
+                    print(f"seed {seed} day {env.current_day}: {name} {actual[name]!r} != {expected[name]!r}")
+    return mismatches
+
+
+def time_refresh(env, metrics):
+    start = time.perf_counter()
+    for _ in range(20):
+        metrics(env.history, all_days=False)
+    return (time.perf_counter() - start) / 20 * 1e6
+
+
+def main():
+    mismatches = check_equivalence(range(20))
+    print(f"Equivalence over 20 seeds x {N_DAYS} days: {'OK' if not mismatches else f'{mismatches} mismatches'}")
+
+    n_days = 2000
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    all_jobs = [catalogue[day % N_DAYS] for day in range(n_days)] + [[]]
+    env = job_env.JobEnv(all_jobs, n_days, N_WORKERS)
+    rng = random.Random(0)
+    print(f"\n{'Days':>6} {'Recompute us':>13} {'Running us':>11}")
+    for day in range(1, n_days + 1):
+        env.step([int(rng.random() < 0.5) for _ in env.offers], [1] * len(env.jobs))
+        if day in (10, 100, 1000, 2000):
+            print(f"{day:>6} {time_refresh(env, recomputed_metrics):>13.0f} {time_refresh(env, running_metrics):>11.0f}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
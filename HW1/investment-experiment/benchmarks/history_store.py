@@ -0,0 +1,74 @@
+"""Summary metrics of many runs: walking DayHistory objects against group-bys over a history store.
+
+    python -m benchmarks.history_store
+
+`objects` is tournament.summary_rows over every finished environment, the
+way the summary CSV is written without a store. `store` appends the same
+environments to a history_store directory, then computes the summary with
+day_summary from the memory-mapped columns. Both must agree before
+rounding. Sums taken in another order can flip a value that sits exactly on
+a rounding boundary, so the rounded CSVs may differ in the last digit.
+"""
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from investment import history_store, job_env, tournament
+from .participant_state import N_DAYS, N_WORKERS, PARTS
+
+N_RUNS = 300
+
+
+def main():
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    job_env.fill_length_quantiles(job_env.flatten(catalogue))
+    envs = []
+    rng = random.Random(0)
+    for _ in range(N_RUNS):
+        env = job_env.JobEnv(catalogue, N_DAYS, N_WORKERS)
+        p_accept = rng.uniform(0.1, 1)
+        for _ in range(N_DAYS):
+            env.step([int(rng.random() < p_accept) for _ in env.offers], [1]*len(env.jobs))
+        envs.append(env)
+
+    start = time.perf_counter()
+    for sid, env in enumerate(envs):
+        tournament.summary_rows(sid, env)
+    objects = time.perf_counter() - start
+    expected = np.array([[day_hist.get_n_workers_assigned(), day_hist.get_utilization(), day_hist.get_worker_rate(),
+                          day_hist.get_active_worker_rate(), day_hist.get_average_length(),
+                          day_hist.get_average_workers(), day_hist.get_expected_commitment(), day_hist.get_payment()]
+                         for env in envs for day_hist in env.history.history])
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = os.path.join(directory, 'runs.history')
+        start = time.perf_counter()
+        with history_store.HistoryWriter(store) as writer:
+            for sid, env in enumerate(envs):
+                writer.append(sid, env)
+        write = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(store) for name in names)
+        start = time.perf_counter()
+        list(tournament.store_summary_rows(store))
+        summary = time.perf_counter() - start
+        day_summary = history_store.day_summary(store)
+        start = time.perf_counter()
+        payments = history_store.load(store, 'jobs', ['final_payment'])['final_payment']
+        column = time.perf_counter() - start
+
+    actual = np.stack([day_summary[name] for name in ('workers_assigned', 'utilization', 'worker_rate',
+                                                      'active_worker_rate', 'average_length', 'average_workers',
+                                                      'expected_commitment', 'payment')], axis=1)
+    assert np.allclose(expected, actual, rtol=1e-12, atol=1e-9)
+    print(f"{N_RUNS} runs x {N_DAYS} days, {len(payments):,} job rows, store {size / 2**20:.1f} MiB")
+    print(f"{'Objects summary':<24} {objects*1000:>8.0f} ms")
+    print(f"{'Store write':<24} {write*1000:>8.0f} ms")
+    print(f"{'Store summary':<24} {summary*1000:>8.0f} ms")
+    print(f"{'Store load one column':<24} {column*1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Investment page latency with a lab of N concurrent bot participants.
+
+    python -m benchmarks.load_test --participants 6 30 60 --rounds 20 --round-length 45 --time-scale 0.02
+    python -m benchmarks.load_test --live ...
+
+The server is an in-process stand-in for the devserver. The session is
+created by the app's creating_session. Participant vars live pickled in a
+dict standing in for the database, loaded for every request and saved after
+every submit. Requests run the app's page functions on a thread pool. Each
+bot is an asyncio client that loads the Investment page, waits part of the
+round timer, and submits what a rate-threshold player would tick from the
+rendered page: offers paying more than --rate per worker-day, then the
+shortest jobs that fit the workers. --time-scale shrinks the round timer so
+a 100-round session does not take 75 minutes.
+
+With --live the session runs on the LiveInvestment page instead: the bot
+opens it once and then sends each day's actions to its live method, keeping
+the job rows up to date from the replies the way the page's script does.
+Bytes is the size of the JSON the server returns, for page loads its
+template and js_vars before the template is rendered around them.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pickle
+import random
+import time
+
+import numpy as np
+
+import investment
+from investment.tournament import DEFAULT_CONFIG
+
+PAGES = ['Investment GET', 'Investment POST']
+LIVE_PAGES = ['live load', 'live submit']
+
+
+class Participant:
+    def __init__(self, code, id_in_session, vars):
+        self.code = code
+        self.id_in_session = id_in_session
+        self.vars = vars
+        self.payoff = 0
+
+    # PARTICIPANT_FIELDS are kept in vars, as oTree does
+    env = property(lambda self: self.vars['env'], lambda self, env: self.vars.__setitem__('env', env))
+    expiry = property(lambda self: self.vars['expiry'], lambda self, expiry: self.vars.__setitem__('expiry', expiry))
+
+
+class Session:
+    def __init__(self, config, code='load_test'):
+        self.config = config
+        self.code = code
+
+
+class Player:
+    def __init__(self, session, participant, round_number):
+        self.session = session
+        self.participant = participant
+        self.participant_id = participant.id_in_session
+        self.id_in_group = participant.id_in_session
+        self.round_number = round_number
+        self.offer_actions = ''
+        self.work_actions = ''
+
+    def in_round(self, round_number):
+        return Player(self.session, self.participant, round_number)
+
+
+class Subsession:
+    def __init__(self, session, players):
+        self.session = session
+        self.round_number = 1
+        self.players = players
+
+    def get_players(self):
+        return self.players
+
+
+class StandInServer:
+    def __init__(self, n_participants, config, threads):
+        self.session = Session(config)
+        participants = [Participant(f'p{i}', i + 1, {}) for i in range(n_participants)]
+        investment.creating_session(Subsession(self.session, [Player(self.session, p, 1) for p in participants]))
+        self.session.start_time = time.time() - 1
+        self.db = {p.code: pickle.dumps(p.vars) for p in participants}
+        self.executor = ThreadPoolExecutor(threads)
+        self.page = investment.DraftInvestment if config.get('step_processes') else investment.Investment
+
+    def _player(self, code, round_number):
+        participant = Participant(code, int(code[1:]) + 1, pickle.loads(self.db[code]))
+        return Player(self.session, participant, round_number)
+
+    def _get(self, code, round_number):
+        player = self._player(code, round_number)
+        return self.page.vars_for_template(player), self.page.js_vars(player)
+
+    def _post(self, code, round_number, form):
+        player = self._player(code, round_number)
+        player.offer_actions = form['offer_actions']
+        player.work_actions = form['work_actions']
+        self.page.before_next_page(player, False)
+        self.db[code] = pickle.dumps(player.participant.vars)
+
+    def _live(self, code, data):
+        player = self._player(code, 1)
+        reply = investment.live_investment(player, data)[player.id_in_group]
+        self.db[code] = pickle.dumps(player.participant.vars)
+        return reply
+
+    async def request(self, handler, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, handler, *args)
+
+
+def choose(offers, jobs, available, rate):
+    """Offers above `rate`, and the shortest of `jobs` ({name: (workers, expected length)}) that fit."""
+    chosen_offers = [job['name'] for job in offers if float(job['rate']) > rate]
+    work = []
+    for name, (workers, _) in sorted(jobs.items(), key=lambda item: item[1][1]):
+        if workers <= available:
+            available -= workers
+            work.append(name)
+    return chosen_offers, work
+
+
+async def timed(server, latencies, sizes, page, handler, *args):
+    start = time.perf_counter()
+    reply = await server.request(handler, *args)
+    latencies[page].append(time.perf_counter() - start)
+    sizes[page].append(len(json.dumps(reply)))
+    return reply
+
+
+async def think(round_seconds, rng):
+    # Most players submit well before the timer, some let it run out
+    await asyncio.sleep(round_seconds * min(1, rng.betavariate(2, 3) * 1.5))
+
+
+async def bot(server, code, rounds, round_seconds, rate, latencies, sizes, errors, rng):
+    for round_number in range(1, rounds + 1):
+        try:
+            page, js_vars = await timed(server, latencies, sizes, 'Investment GET', server._get, code, round_number)
+            workers = {job['name']: job['workers'] for job in page['job_strs']}
+            jobs = {job['name']: (workers[job['name']], job['expectedLength'])
+                    for job in js_vars['jobs'] if job['name'] in workers}
+            offers, work = choose(page['offer_strs'], jobs, js_vars['workers'], rate)
+            await think(round_seconds, rng)
+            await timed(server, latencies, sizes, 'Investment POST', server._post, code, round_number,
+                        {'offer_actions': ','.join(offers), 'work_actions': ','.join(work)})
+        except Exception:
+            errors.append((code, round_number))
+
+
+async def live_bot(server, code, rounds, round_seconds, rate, latencies, sizes, errors, rng):
+    rows = {}
+    lengths = {}
+    try:
+        reply = await timed(server, latencies, sizes, 'live load', server._live, code, {'type': 'load'})
+    except Exception:
+        errors.append((code, 0))
+        return
+    for round_number in range(1, rounds + 1):
+        try:
+            # Patch the rows as LiveInvestment.html does
+            for row in reply['added']:
+                rows[row['name']] = dict(row)
+            for name, fields in reply['changed'].items():
+                rows[name].update(fields)
+            rows = {name: rows[name] for name in reply['order']}
+            lengths.update({name: job['expectedLength'] for name, job in reply['sparklines'].items()})
+            offers, work = choose(reply['offers'], {name: (row['workers'], lengths[name]) for name, row in rows.items()},
+                                  server.session.workers, rate)
+            await think(round_seconds, rng)
+            reply = await timed(server, latencies, sizes, 'live submit', server._live, code,
+                                {'type': 'submit', 'day': reply['day'], 'offers': offers, 'work': work})
+        except Exception:
+            errors.append((code, round_number))
+
+
+async def run(n_participants, args):
+    config = dict(DEFAULT_CONFIG, round_length=args.round_length, accumulate_time=True, allow_submit=True,
+                  live_rounds=args.live)
+    server = StandInServer(n_participants, config, args.threads)
+    latencies = {page: [] for page in (LIVE_PAGES if args.live else PAGES)}
+    sizes = {page: [] for page in latencies}
+    errors = []
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    await asyncio.gather(*((live_bot if args.live else bot)(server, code, args.rounds,
+                                                            args.round_length * args.time_scale, args.rate,
+                                                            latencies, sizes, errors, random.Random(rng.random()))
+                           for code in server.db))
+    elapsed = time.perf_counter() - start
+    server.executor.shutdown()
+    payoff = np.mean([pickle.loads(blob)['env'].total_payment for blob in server.db.values()]) / 100
+    return latencies, sizes, errors, elapsed, payoff
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Investment page with concurrent bot participants.")
+    parser.add_argument('--participants', type=int, nargs='+', default=[6, 30, 60])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--round-length', type=float, default=45)
+    parser.add_argument('--time-scale', type=float, default=0.02)
+    parser.add_argument('--threads', type=int, default=40, help="server worker threads")
+    parser.add_argument('--rate', type=float, default=2.9, help="bots accept offers above this return rate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--live', action='store_true', help="play on the LiveInvestment page")
+    args = parser.parse_args(argv)
+    print(f"{'Participants':>12} {'Page':<16} {'Requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'Bytes':>7} {'Req/s':>7} {'Errors':>7} {'Mean payoff':>12}")
+    for n in args.participants:
+        latencies, sizes, errors, elapsed, payoff = asyncio.run(run(n, args))
+        n_requests = sum(map(len, latencies.values()))
+        for page in latencies:
+            ms = np.array(latencies[page]) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0, 0, 0)
+            print(f"{n:>12} {page:<16} {len(ms):>8} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} "
+                  f"{np.mean(sizes[page]) if sizes[page] else 0:>7.0f} "
+                  f"{n_requests / elapsed:>7.1f} {len(errors) / (n * args.rounds):>7.1%} {payoff:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Pickle size and save/load latency of per-participant environments.
+
+Run from the project directory after a full session of random play:
+
+    python -m benchmarks.participant_state
+
+`compact` is JobEnv's own pickled state, which refers to the session catalogue
+by key. `object graph` pickles the environment's attributes directly, the way
+participant.env was stored before, including a copy of the catalogue.
+Loading the compact state leaves the history's days encoded until they
+are read, and saving reuses them, so the last table times what a submit
+does: load, step the last day and save again.
+
+Before timing, a session on a catalogue with pay scaled by a non-integer
+factor must round-trip through the compact state with its fractional
+payments intact, loaded and saved again without its days built, and saved
+and loaded every day.
+"""
+import pickle
+import random
+import time
+
+from investment import job_env
+
+N_DAYS = 100
+N_WORKERS = 10
+PARTS = 10
+
+
+def play_days(env, rng, n_days):
+    for _ in range(n_days):
+        env.step([int(rng.random() < 0.5) for _ in env.offers],
+                 [int(rng.random() < 0.7) for _ in env.jobs])
+
+
+def play_session(n_participants, catalogue, key, n_days=N_DAYS):
+    envs = []
+    for seed in range(n_participants):
+        env = job_env.JobEnv(catalogue, N_DAYS, N_WORKERS, catalogue_key=key)
+        play_days(env, random.Random(seed), n_days)
+        envs.append(env)
+    return envs
+
+
+def history_rows(env):
+    return [(hist.day, hist.offer_actions, hist.job_actions, hist._job_states)
+            for hist in env.history.history]
+
+
+METRICS = ('total_payment', 'utilization', 'rate', 'acceptance_rate', 'completion_rate', 'avg_accepted_rate')
+
+
+def check_round_trip(pay_scale_factor=1.05):
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS, pay_scale_factor=pay_scale_factor)
+    key = job_env.register_catalogue(catalogue)
+    env, = play_session(1, catalogue, key)
+    loaded = pickle.loads(pickle.dumps(env))
+    assert loaded.total_payment == env.total_payment
+    # Metrics come from the stored totals, before the days are built
+    assert [getattr(loaded.history, name)() for name in METRICS] == [getattr(env.history, name)() for name in METRICS]
+    assert loaded.history.last_day().job_actions == env.history.history[-1].job_actions
+    # Saved again without building its days
+    loaded = pickle.loads(pickle.dumps(loaded))
+    assert history_rows(loaded) == history_rows(env)
+    assert [job.state() for job in loaded.jobs] == [job.state() for job in env.jobs]
+
+    # A participant saved every day, as oTree does, matches one that never was
+    rng, saved_rng = random.Random(1), random.Random(1)
+    env = job_env.JobEnv(catalogue, N_DAYS, N_WORKERS, catalogue_key=key)
+    saved = job_env.JobEnv(catalogue, N_DAYS, N_WORKERS, catalogue_key=key)
+    for _ in range(N_DAYS):
+        play_days(env, rng, 1)
+        saved = pickle.loads(pickle.dumps(saved))
+        play_days(saved, saved_rng, 1)
+    assert saved.total_payment == env.total_payment
+    assert [getattr(saved.history, name)() for name in METRICS] == [getattr(env.history, name)() for name in METRICS]
+    assert history_rows(saved) == history_rows(env)
+    return env.total_payment
+
+
+def measure(objs):
+    start = time.perf_counter()
+    blobs = [pickle.dumps(obj) for obj in objs]
+    save = time.perf_counter() - start
+    start = time.perf_counter()
+    for blob in blobs:
+        pickle.loads(blob)
+    load = time.perf_counter() - start
+    return sum(len(blob) for blob in blobs), save, load
+
+
+def measure_request(blobs):
+    """Seconds to load each environment, step its last day and save it, as a submit does."""
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for blob in blobs:
+        env = pickle.loads(blob)
+        play_days(env, rng, 1)
+        pickle.dumps(env)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"Round trip with pay scaled by 1.05: {check_round_trip() / 100:.4f}")
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    key = job_env.register_catalogue(catalogue)
+    print(f"Session catalogue, stored once: {len(pickle.dumps(catalogue)) / 1024:.1f} KiB\n")
+    print(f"{'Participants':>12} {'Format':<13} {'Total KiB':>10} {'KiB/player':>10} "
+          f"{'Save ms':>9} {'Load ms':>9} {'Save ms/player':>15} {'Load ms/player':>15}")
+    for n in (6, 60, 600):
+        envs = play_session(n, catalogue, key)
+        formats = [('compact', envs),
+                   ('object graph', [env.__dict__ for env in envs])]
+        for name, objs in formats:
+            size, save, load = measure(objs)
+            print(f"{n:>12} {name:<13} {size / 1024:>10.1f} {size / 1024 / n:>10.2f} "
+                  f"{save * 1000:>9.1f} {load * 1000:>9.1f} {save * 1000 / n:>15.3f} {load * 1000 / n:>15.3f}")
+    print(f"\n{'Participants':>12} {'Load, last day, save ms/player':>31}")
+    for n in (6, 60, 600):
+        blobs = [pickle.dumps(env) for env in play_session(n, catalogue, key, N_DAYS - 1)]
+        print(f"{n:>12} {measure_request(blobs) * 1000 / n:>31.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Env-days/sec of strategy sweeps: per-job Python strategies against batched policy kernels.
+
+    python -m benchmarks.policy_sweep
+
+`loop` plays strategies.py's strategy in one JobEnv per environment.
+`kernel` plays the policies.py version of the same spec in one
+VectorJobEnv. Deterministic specs must give every environment the loop's
+payment, also with fractional pay: SCALED plays them once more with
+payments scaled by a non-integer factor and fractional worker pay.
+"""
+import time
+
+import numpy as np
+
+from investment import job_env, policies, strategies
+from .participant_state import N_DAYS, N_WORKERS, PARTS
+
+SPECS = ['rate:2.9/shortest', 'rate:3.1/fifo', 'all/shortest', 'random:0.5/shortest']
+# pay_scale_factor and worker_pay of the fractional-pay check
+SCALED = (1.05, 2.5)
+
+
+def check_scaled(spec, n_envs=4):
+    pay_scale_factor, worker_pay = SCALED
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS, pay_scale_factor=pay_scale_factor)
+    job_env.fill_length_quantiles(job_env.flatten(catalogue))
+    env = strategies.run_strategy(strategies.strategy_from_spec(spec), catalogue, N_DAYS, N_WORKERS,
+                                  worker_pay=worker_pay, seed=0)
+    venv = policies.run_policy(policies.policy_from_spec(spec), catalogue, N_DAYS, N_WORKERS, n_envs,
+                               worker_pay=worker_pay, seed=0)
+    assert np.allclose(venv.total_payment, env.total_payment, rtol=0, atol=1e-6), (spec, venv.total_payment,
+                                                                                   env.total_payment)
+    assert np.allclose(venv.env_history(0).total_payment(), env.history.total_payment(), rtol=0, atol=1e-6)
+    return env.total_payment
+
+
+def main():
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    job_env.fill_length_quantiles(job_env.flatten(catalogue))
+    print(f"{'Spec':<20} {'Envs':>5} {'Loop env-days/s':>16} {'Kernel env-days/s':>18} {'Mean payment':>13}")
+    for spec in SPECS:
+        for n_envs in (16, 256):
+            strategy = strategies.strategy_from_spec(spec)
+            start = time.perf_counter()
+            loop_payments = [strategies.run_strategy(strategy, catalogue, N_DAYS, N_WORKERS, seed=seed).total_payment
+                             for seed in range(n_envs)]
+            loop = n_envs*N_DAYS / (time.perf_counter() - start)
+            start = time.perf_counter()
+            venv = policies.run_policy(policies.policy_from_spec(spec), catalogue, N_DAYS, N_WORKERS, n_envs, seed=0)
+            kernel = n_envs*N_DAYS / (time.perf_counter() - start)
+            if not spec.startswith('random'):
+                assert (venv.total_payment == loop_payments[0]).all()
+            print(f"{spec:<20} {n_envs:>5} {loop:>16,.0f} {kernel:>18,.0f} "
+                  f"{np.mean(loop_payments)/100:>6.2f}/{venv.total_payment.mean()/100:<6.2f}")
+    for spec in SPECS:
+        if not spec.startswith('random'):
+            print(f"{spec:<20} pay x{SCALED[0]}, worker pay {SCALED[1]}: both {check_scaled(spec)/100:.4f}")
+
+
+if __name__ == '__main__':
+    main()
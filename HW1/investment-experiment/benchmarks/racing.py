@@ -0,0 +1,54 @@
+"""Sessions evaluation.race plays with and without `top`, on strategies with known payments.
+
+    python -m benchmarks.racing
+
+The strategies stand in for real ones: a seed's total payment is drawn from
+the seed alone, so the race's stopping rule is all that is measured.
+`leader` is best but noisy. `runner-up` is 1 behind it, and `tracker`
+follows runner-up 0.5 lower with almost the same draws, so their paired
+interval closes within min_seeds while tracker's interval against leader is
+still wide. With top=1 the race must stop well before max_seeds, although
+tracker's differences stop being updated while that interval is open.
+"""
+import time
+
+import numpy as np
+
+from investment import evaluation
+
+MAX_SEEDS = 1000
+
+
+def stand_in_rows(strategy, seeds, config=None):
+    rows = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        leader, shared, jitter = rng.normal(0, 4), rng.normal(0, 1), rng.normal(0, 0.05)
+        payment = {'leader': 10 + leader, 'runner-up': 9 + shared, 'tracker': 8.5 + shared + jitter}[strategy]
+        rows.append([payment] + [0]*(len(evaluation.METRICS) - 1))
+    return rows
+
+
+def check_top(top=1):
+    run_seeds = evaluation.run_seeds
+    evaluation.run_seeds = stand_in_rows
+    try:
+        start = time.perf_counter()
+        stats, pairs = evaluation.race(['leader', 'runner-up', 'tracker'], max_seeds=MAX_SEEDS, top=top)
+        elapsed = time.perf_counter() - start
+    finally:
+        evaluation.run_seeds = run_seeds
+    return [s.count for s in stats], elapsed
+
+
+def main():
+    print(f"{'Top':>4} {'Seeds per strategy':>24} {'Sessions':>9} {'Seconds':>8}")
+    for top in (None, 1):
+        counts, elapsed = check_top(top)
+        print(f"{str(top):>4} {str(counts):>24} {sum(counts):>9} {elapsed:>8.2f}")
+        if top == 1:
+            assert max(counts) < MAX_SEEDS // 4, counts
+
+
+if __name__ == '__main__':
+    main()
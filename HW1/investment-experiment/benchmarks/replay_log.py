@@ -0,0 +1,72 @@
+"""Replay time per subject, after checking a replayed payoff against the session's.
+
+    python -m benchmarks.replay_log
+
+check_idle_days plays a subject who stops submitting, with the rest of the
+session played as LiveInvestment.before_next_page plays it: nothing taken or
+worked. The catalogue has no offers after day 70, so once the subject's jobs
+end the log has no rows, while worker pay is still charged every day. The
+export's rows must replay to the session's total payment. The timing then
+replays sessions of random play exported the same way.
+"""
+import csv
+import os
+import tempfile
+import time
+
+from investment import export, job_env, replay
+from investment.strategies import run_strategy, strategy_from_spec
+from .participant_state import N_DAYS, N_WORKERS, PARTS, play_session
+
+WORKER_PAY = 2.5
+
+
+def write_log(path, envs):
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(export.HEADERS)
+        for subject_id, env in enumerate(envs, 1):
+            writer.writerows(export.env_rows(env, [(day, subject_id) for day in range(1, N_DAYS + 1)]))
+
+
+def check_idle_days(last_offer_day=70, last_submit_day=60):
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    catalogue = catalogue[:last_offer_day] + [[] for _ in catalogue[last_offer_day:]]
+    env = run_strategy(strategy_from_spec('rate:2.9/shortest'), catalogue, last_submit_day, N_WORKERS, WORKER_PAY,
+                       seed=0)
+    env.n_days = N_DAYS
+    env.offers = catalogue[env.current_day]
+    while env.current_day < N_DAYS:
+        env.step([0]*len(env.offers), [0]*len(env.jobs))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'actions.csv')
+        write_log(path, [env])
+        days = replay.read_actions(path)[1]
+    assert max(days) < N_DAYS, max(days)
+    replayed, mismatches = replay.replay_subject(1, days, catalogue, N_DAYS, N_WORKERS, WORKER_PAY)
+    assert not mismatches, mismatches[:5]
+    assert replayed.total_payment == env.total_payment, (replayed.total_payment, env.total_payment)
+    return max(days), env.total_payment
+
+
+def main():
+    last_logged, total = check_idle_days()
+    print(f"Idle after day {last_logged}: replayed and session payment {total / 100:.2f}\n")
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    key = job_env.register_catalogue(catalogue)
+    print(f"{'Subjects':>8} {'Seconds':>8} {'ms/subject':>11}")
+    for n in (6, 60):
+        envs = play_session(n, catalogue, key)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'actions.csv')
+            write_log(path, envs)
+            start = time.perf_counter()
+            replayed, mismatches = replay.replay_log(path, './test_jobs.csv')
+            elapsed = time.perf_counter() - start
+        assert not mismatches, mismatches[:5]
+        assert [env.total_payment for env in replayed.values()] == [env.total_payment for env in envs]
+        print(f"{n:>8} {elapsed:>8.2f} {elapsed * 1000 / n:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Random-policy rollouts/sec to the end of a 100-day session.
+
+    python -m benchmarks.rollouts
+
+Each rollout starts from the same decision point, plays random actions to
+day 100 and returns the final payment. `deepcopy` copies the environment
+for every rollout, the way lookahead strategies used to. `snapshot` plays on
+the environment itself and restores it afterwards, with and without history
+recording. Seeded rollouts must agree on the payments across the three.
+"""
+import copy
+import random
+import time
+
+from investment import job_env
+from .participant_state import N_DAYS, N_WORKERS, PARTS
+
+N_ROLLOUTS = 200
+
+
+def play(env, rng):
+    while env.current_day < env.n_days:
+        env.step([int(rng.random() < 0.5) for _ in env.offers],
+                 [int(rng.random() < 0.7) for _ in env.jobs])
+    return env.total_payment
+
+
+def deepcopy_rollouts(env, n):
+    return [play(copy.deepcopy(env), random.Random(seed)) for seed in range(n)]
+
+
+def snapshot_rollouts(env, n, record_history):
+    snapshot = env.snapshot()
+    env.record_history = record_history
+    payments = []
+    for seed in range(n):
+        payments.append(play(env, random.Random(seed)))
+        env.restore(snapshot)
+    env.record_history = True
+    return payments
+
+
+def main():
+    catalogue = job_env.read_jobs('./test_jobs.csv', N_DAYS, PARTS)
+    print(f"{'From day':>8} {'Method':<26} {'Rollouts/s':>11} {'Snapshot us':>12}")
+    for start_day in (0, 50, 90):
+        env = job_env.JobEnv(catalogue, N_DAYS, N_WORKERS)
+        rng = random.Random(1234)
+        for _ in range(start_day):
+            env.step([int(rng.random() < 0.5) for _ in env.offers], [int(rng.random() < 0.7) for _ in env.jobs])
+        start = time.perf_counter()
+        for _ in range(1000):
+            env.snapshot()
+        snapshot_us = (time.perf_counter() - start) * 1000
+        payments = {}
+        for name, rollouts in (('deepcopy', deepcopy_rollouts),
+                               ('snapshot, history on', lambda env, n: snapshot_rollouts(env, n, True)),
+                               ('snapshot, history off', lambda env, n: snapshot_rollouts(env, n, False))):
+            start = time.perf_counter()
+            payments[name] = rollouts(env, N_ROLLOUTS)
+            elapsed = time.perf_counter() - start
+            print(f"{start_day:>8} {name:<26} {N_ROLLOUTS / elapsed:>11,.0f} {snapshot_us:>12.1f}")
+        assert len(set(map(tuple, payments.values()))) == 1
+        assert env.current_day == start_day and len(env.history.history) == start_day
+
+
+if __name__ == '__main__':
+    main()
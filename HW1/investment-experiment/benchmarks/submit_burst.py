@@ -0,0 +1,116 @@
+"""Investment submit latency when every participant's timer runs out at once.
+
+    python -m benchmarks.submit_burst --participants 10 30 60 --rounds 10
+    python -m benchmarks.submit_burst --step-processes 4 --changed 0.2
+
+Bots play on load_test's stand-in server. Each round they load the
+Investment page and pick jobs as load_test's bots do, then all submit at
+the same instant, as when the round timer expires. Every N is played twice:
+inline, with step_processes 0, and drafted, where the page is DraftInvestment
+and each bot first sends its picks to the page's live method as the page
+script does, and the step pool steps them ahead during the --think seconds
+before the burst. A --changed
+fraction of bots then untick one job before submitting, so their drafts
+miss. POST is the burst's submits, GET the next round's page loads, which
+drafted days have already rendered. Payoffs must not depend on the mode.
+"""
+import argparse
+import asyncio
+import pickle
+import random
+import time
+
+import numpy as np
+
+import investment
+from investment import step_pool
+from investment.tournament import DEFAULT_CONFIG
+from benchmarks.load_test import StandInServer, choose
+
+
+class BurstServer(StandInServer):
+    def _draft(self, code, round_number, data):
+        # The live method does not change participant vars, so nothing is saved
+        investment.DraftInvestment.live_method(self._player(code, round_number), data)
+
+
+async def timed(server, latencies, handler, *args):
+    start = time.perf_counter()
+    reply = await server.request(handler, *args)
+    latencies.append(time.perf_counter() - start)
+    return reply
+
+
+def pick(page, js_vars, rate):
+    workers = {job['name']: job['workers'] for job in page['job_strs']}
+    jobs = {job['name']: (workers[job['name']], job['expectedLength'])
+            for job in js_vars['jobs'] if job['name'] in workers}
+    return choose(page['offer_strs'], jobs, js_vars['workers'], rate)
+
+
+async def run(n_participants, step_processes, args):
+    config = dict(DEFAULT_CONFIG, round_length=45, accumulate_time=True, allow_submit=True, live_rounds=False,
+                  step_processes=step_processes)
+    server = BurstServer(n_participants, config, args.threads)
+    codes = list(server.db)
+    rng = random.Random(args.seed)
+    latencies = {'POST': [], 'GET': [], 'draft': []}
+    hits = []
+    take = step_pool.take
+
+    def counted_take(*take_args):
+        stepped = take(*take_args)
+        hits.append(stepped is not None)
+        return stepped
+
+    step_pool.take = counted_take
+    try:
+        for round_number in range(1, args.rounds + 1):
+            pages = await asyncio.gather(*(timed(server, latencies['GET'], server._get, code, round_number)
+                                           for code in codes))
+            picks = [pick(page, js_vars, args.rate) for page, js_vars in pages]
+            if step_processes:
+                await asyncio.gather(*(timed(server, latencies['draft'], server._draft, code, round_number,
+                                             {'offers': offers, 'work': work})
+                                       for code, (offers, work) in zip(codes, picks)))
+            for offers, work in picks:
+                if rng.random() < args.changed and (offers or work):
+                    (work or offers).pop()
+            await asyncio.sleep(args.think)
+            await asyncio.gather(*(timed(server, latencies['POST'], server._post, code, round_number,
+                                         {'offer_actions': ','.join(offers), 'work_actions': ','.join(work)})
+                                   for code, (offers, work) in zip(codes, picks)))
+    finally:
+        step_pool.take = take
+        step_pool.shutdown()
+        investment._render_cache.clear()
+        server.executor.shutdown()
+    payoff = np.mean([pickle.loads(blob)['env'].total_payment for blob in server.db.values()]) / 100
+    return latencies, np.mean(hits) if hits else 0, payoff
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time Investment submits arriving in one burst, inline and drafted.")
+    parser.add_argument('--participants', type=int, nargs='+', default=[10, 30, 60])
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--step-processes', type=int, default=2, help="step pool processes of the drafted runs")
+    parser.add_argument('--think', type=float, default=0.5, help="seconds between drafts and the burst")
+    parser.add_argument('--changed', type=float, default=0.0, help="fraction of bots changing picks after drafting")
+    parser.add_argument('--threads', type=int, default=40, help="server worker threads")
+    parser.add_argument('--rate', type=float, default=2.9, help="bots accept offers above this return rate")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    print(f"{'Participants':>12} {'Mode':<8} {'POST p50 ms':>11} {'p95':>8} {'p99':>8} {'max':>8} "
+          f"{'GET p50 ms':>10} {'p99':>8} {'Draft p50':>9} {'Hits':>6} {'Mean payoff':>12}")
+    for n in args.participants:
+        for mode, step_processes in (('inline', 0), ('drafted', args.step_processes)):
+            latencies, hit_rate, payoff = asyncio.run(run(n, step_processes, args))
+            post = np.percentile(np.array(latencies['POST']) * 1000, [50, 95, 99, 100])
+            get = np.percentile(np.array(latencies['GET']) * 1000, [50, 99])
+            draft = np.median(latencies['draft']) * 1000 if latencies['draft'] else 0
+            print(f"{n:>12} {mode:<8} {post[0]:>11.2f} {post[1]:>8.2f} {post[2]:>8.2f} {post[3]:>8.2f} "
+                  f"{get[0]:>10.2f} {get[1]:>8.2f} {draft:>9.2f} {hit_rate:>6.0%} {payoff:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,10 @@ from datetime import datetime
 from otree.api import *
 import random
 import os
+import sys
+import pickle
 import time
-from . import job_env
-import csv
-import copy
+from . import export, job_env, profiling, step_pool
 
 doc = """
 """
@@ -22,37 +22,35 @@ class C(BaseConstants):
 
 
 def creating_session(subsession):
+    if subsession.round_number == 1 and subsession.session.config.get('profile'):
+        profiling.enable(subsession.session)
+    with profiling.session_scope(subsession.session), profiling.timing('creating_session'):
+        setup_session(subsession)
+
+def setup_session(subsession):
     if subsession.round_number == 1:
         session = subsession.session
-        with open('./test_jobs.csv', mode='r') as file:
-            csv_reader = csv.DictReader(file)
-            session.n_days = session.config['max_rounds']
-            session.jobs = [[] for _ in range(session.config['max_rounds']+1)]
-            session.workers = session.config['workers']
-            session.parts = session.config['parts']
-            session.day_length = session.config['round_length']
-            session.accumulate_time = session.config['accumulate_time']
-            for row in csv_reader:
-                progression = string_to_int_list(row['Progression'])
-                job = job_env.Job(name=row['Name'],
-                                  reqs=int(row['Workers']),
-                                  parts=session.parts,
-                                  complication=float(row['Complication Probability']),
-                                  soft_deadline=int(row['Soft Deadline']),
-                                  hard_deadline=int(row['Hard Deadline']),
-                                  payment=int(row['Payment'])*session.config['pay_scale_factor'],
-                                  progression=progression,
-                                  late_penalty=session.config['late_penalty'],
-                                  fail_penalty=session.config['fail_penalty']
-                                )
-                day=int(row['Day'])
-                session.jobs[day-1].append(job)
+        session.n_days = session.config['max_rounds']
+        session.workers = session.config['workers']
+        session.parts = session.config['parts']
+        session.day_length = session.config['round_length']
+        session.accumulate_time = session.config['accumulate_time']
+        session.jobs = job_env.read_jobs('./test_jobs.csv',
+                                         session.n_days,
+                                         session.parts,
+                                         pay_scale_factor=session.config['pay_scale_factor'],
+                                         late_penalty=session.config['late_penalty'],
+                                         fail_penalty=session.config['fail_penalty'])
+        job_env.fill_length_quantiles(job_env.flatten(session.jobs))
+        catalogue_key = job_env.register_catalogue(session.jobs)
 
+        # Every participant shares the session's catalogue, jobs are copied only when taken
         for player in subsession.get_players():
-            player.participant.env = job_env.JobEnv(copy.deepcopy(session.jobs),
+            player.participant.env = job_env.JobEnv(session.jobs,
                                                     session.n_days,
                                                     session.workers,
-                                                    worker_pay=session.config['worker_pay'])
+                                                    worker_pay=session.config['worker_pay'],
+                                                    catalogue_key=catalogue_key)
         if 'initial_date' in session.config:
             initial_date = session.config['initial_date']
             initial_hour = session.config['initial_hour']
@@ -73,8 +71,11 @@ def get_period_time_seconds(player):
     participant = player.participant
     return participant.expiry - time.time()
 
-def string_to_int_list(s):
-    return list(map(int, s.split(',')))
+def get_env(player):
+    env = player.participant.vars['env']
+    if env.all_jobs is None:
+        env.bind(player.session.jobs)
+    return env
 
 class Subsession(BaseSubsession):
     pass
@@ -98,127 +99,256 @@ class FrontPage(Page):
     def is_displayed(player: Player):
         return get_seconds_until_start(player) > 0
 
+# Per-participant page payloads, kept until JobEnv.step changes the state they were built from
+_render_cache = {}
+
+def get_rendered(player, name, render):
+    env = get_env(player)
+    key = (env.current_day, env.revision)
+    cached_key, payloads = _render_cache.get(player.participant.code, (None, None))
+    if cached_key != key:
+        payloads = {}
+        _render_cache[player.participant.code] = (key, payloads)
+    if name not in payloads:
+        payloads[name] = render(env)
+    return payloads[name]
+
+def forget_pages(participant):
+    # Drop the participant's page caches once none of their pages will render again
+    _render_cache.pop(participant.code, None)
+    _live_rows.pop(participant.code, None)
+
+def render_js_jobs(env):
+    jobs = env.jobs_by_deadline()
+    return [{'name':j.name,
+             'lengthRange':[j.lower_length(), j.upper_length()],
+             'pastSoft':j.is_late(),
+             'expectedLength':j.expected_length(),
+             'hardDeadline': j.hard_deadline_remaining(),
+             'softDeadline': j.soft_deadline_remaining()}
+     for j in jobs]
+
+def render_job_tables(env):
+    offers_strs = [job_env.common_job_str(job) for job in env.offers]
+
+    job_strs = []
+    ended_strs = []
+    danger_bools = []
+    hist = env.history.last_day()
+    if hist is not None:
+        worked = {job.name: action for job, action in zip(hist.jobs, hist.job_actions)}
+        for job in env.jobs_by_deadline():
+            s = job_env.common_job_str(job)
+            # Jobs taken at the end of the day have not had a day pass yet
+            new = job.days_passed == 0
+            parts_completed_this_day = 0 if new else job.last_progress() * worked[job.name]
+            (cur, last) = job_env.progress_str(job, parts_completed_this_day)
+            s['progress_cur'] = cur
+            s['progress_last'] = last
+            s['status'] = "New" if new else ''
+            s['danger'] = job.is_late() or job.hard_deadline_remaining()==1
+            job_strs.append(s)
+
+        ended_jobs = hist.ended
+        ended_actions = hist.ended_actions
+        for job, worked in zip(ended_jobs, ended_actions):
+            s = job_env.common_job_str(job)
+            parts_completed_this_day = job.last_progress() * worked
+            (cur, last) = job_env.progress_str(job, parts_completed_this_day)
+            s['progress_cur'] = cur
+            s['progress_last'] = last
+            s['status'] = 'Failed' if job.failed else 'Completed'
+            ended_strs.append(s)
+    return dict(
+        offer_strs = offers_strs,
+        job_strs = job_strs,
+        ended_strs = ended_strs,
+        danger_bools = danger_bools,
+        payoff_usd = f"${env.total_payment/100:.2f}"
+    )
+
+def play_day(player, offer_names, work_names):
+    """Step the participant's environment with the jobs named on the page, as one day."""
+    participant = player.participant
+    env = get_env(player)
+    stepped = step_pool.take(participant.code, env, offer_names, work_names)
+    if stepped is None:
+        env.step(*step_pool.day_actions(env, offer_names, work_names))
+    else:
+        # Drafted from the same state and jobs, see draft_investment
+        participant.env, payloads = stepped
+        env = get_env(player)
+        _render_cache[participant.code] = ((env.current_day, env.revision), payloads)
+    if profiling.active():
+        profiling.record('play_day.drafted', stepped is not None, unit='hit')
+        profiling.record('participant.env', len(pickle.dumps(env)), unit='bytes', round_number=env.current_day)
+    participant.payoff = env.total_payment
+    if env.current_day >= player.session.n_days:
+        forget_pages(participant)
+        step_pool.finish(participant.code)
+    if player.session.accumulate_time:
+        participant.expiry = max(time.time(), participant.expiry) + player.session.day_length
+    else:
+        participant.expiry = time.time() + player.session.day_length
+
+# Payloads the step pool renders for the page after a drafted day, by get_rendered name
+DRAFT_RENDERS = dict(js_jobs=render_js_jobs, job_tables=render_job_tables)
+
+def draft_investment(player, data):
+    # {'offers', 'work'}: the jobs ticked so far, sent as they change
+    env = get_env(player)
+    if player.round_number == env.current_day + 1:
+        step_pool.speculate(player.participant.code, env, data.get('offers', []), data.get('work', []),
+                            player.session.config['step_processes'], DRAFT_RENDERS)
+
+def investment_displayed(player, drafted):
+    return (not player.session.config.get('live_rounds')
+            and bool(player.session.config.get('step_processes', 0)) == drafted
+            and player.round_number <= player.session.config['max_rounds'])
+
 class Investment(Page):
     form_model = "player"
     form_fields = ['offer_actions', 'work_actions']
+
     @staticmethod
     def js_vars(player):
-        participant = player.participant
-        env = participant.env
-        jobs = env.jobs
-        jobs = sorted(jobs, key=lambda x:(max(0,x.soft_deadline_remaining()), x.hard_deadline_remaining()))
-        job_dict = [{'name':j.name,
-                     'lengthRange':[j.lower_length(), j.upper_length()],
-                     'pastSoft':j.is_late(),
-                     'expectedLength':j.expected_length(),
-                     'hardDeadline': j.hard_deadline_remaining(),
-                     'softDeadline': j.soft_deadline_remaining()}
-         for j in jobs]
         return dict(
             workers=player.session.workers,
-            jobs=job_dict
+            jobs=get_rendered(player, 'js_jobs', render_js_jobs)
         )
 
     @staticmethod
     def vars_for_template(player):
-        participant = player.participant
-        env = participant.env
-        offers_strs = [job_env.common_job_str(job) for job in env.offers]
-
-        job_strs = []
-        ended_strs = []
-        danger_bools = []
-        if env.history.history:
-            hist = env.history.history[-1]
-            old_jobs = hist.jobs
-            old_job_actions = hist.job_actions
-            for job, worked in zip(old_jobs, old_job_actions):
-                if not job.is_ended():
-                    s = job_env.common_job_str(job)
-                    parts_completed_this_day = job.last_progress() * worked
-                    (cur, last) = job_env.progress_str(job, parts_completed_this_day)
-                    s['progress_cur'] = cur
-                    s['progress_last'] = last
-                    s['status'] = ''
-                    s['danger'] = job.is_late() or job.hard_deadline_remaining()==1
-                    job_strs.append((max(0,job.soft_deadline_remaining()), job.hard_deadline_remaining(), s))
-            new_jobs = hist.get_taken_jobs()
-            for job in new_jobs:
-                s = job_env.common_job_str(job)
-                (cur, last) = job_env.progress_str(job, 0)
-                s['progress_cur'] = cur
-                s['progress_last'] = last
-                s['status'] = "New"
-                s['danger'] = job.is_late() or job.hard_deadline_remaining()==1
-                job_strs.append((max(0,job.soft_deadline_remaining()), job.hard_deadline_remaining(), s))
-            job_strs = sorted(job_strs, key=lambda x:(x[0], x[1]))
-            job_strs = [x[2] for x in job_strs]
-
-            ended_jobs = hist.ended
-            ended_actions = hist.ended_actions
-            for job, worked in zip(ended_jobs, ended_actions):
-                s = job_env.common_job_str(job)
-                parts_completed_this_day = job.last_progress() * worked
-                (cur, last) = job_env.progress_str(job, parts_completed_this_day)
-                s['progress_cur'] = cur
-                s['progress_last'] = last
-                s['status'] = 'Failed' if job.failed else 'Completed'
-                ended_strs.append(s)
         return dict(
-            offer_strs = offers_strs,
-            job_strs = job_strs,
-            ended_strs = ended_strs,
-            danger_bools = danger_bools,
-            payoff_usd = f"${participant.env.total_payment/100:.2f}",
+            **get_rendered(player, 'job_tables', render_job_tables),
             workers = player.session.workers,
-            allow_submit = player.session.config['allow_submit']
+            allow_submit = player.session.config['allow_submit'],
+            draft = False
         )
     get_timeout_seconds = get_period_time_seconds
 
     @staticmethod
     def before_next_page(player, timeout_happened):
-        participant = player.participant
-        taken_job_names = set(player.offer_actions.split(','))
-        offer_actions = []
-        for job in participant.env.offers:
-            if job.name in taken_job_names:
-                offer_actions.append(1)
-            else:
-                offer_actions.append(0)
-        worked_job_names = set(player.work_actions.split(','))
-        work_actions = []
-        for job in participant.env.jobs:
-            if job.name in worked_job_names:
-                work_actions.append(1)
-            else:
-                work_actions.append(0)
-        participant.env.step(offer_actions, work_actions)
-        participant.payoff = participant.env.total_payment
-        if player.session.accumulate_time:
-            participant.expiry = max(time.time(), participant.expiry) + player.session.day_length
-        else:
-            participant.expiry = time.time() + player.session.day_length
+        play_day(player, player.offer_actions.split(','), player.work_actions.split(','))
+
+    @staticmethod
+    def is_displayed(player):
+        return investment_displayed(player, drafted=False)
+
+class DraftInvestment(Investment):
+    """The Investment page of sessions with step_processes, which sends its ticked jobs as drafts.
+
+    Only this page has a live method, so the default Investment page opens
+    no websocket and sends nothing before its submit.
+    """
+    template_name = 'investment/Investment.html'
+    live_method = staticmethod(draft_investment)
+
+    @staticmethod
+    def vars_for_template(player):
+        return dict(Investment.vars_for_template(player), draft=True)
+
+    @staticmethod
+    def is_displayed(player):
+        return investment_displayed(player, drafted=True)
+
+# Job table rows each live participant's page last received, by job name
+_live_rows = {}
+
+def render_live_day(player, reset=False):
+    """The live page's update for the coming day.
+
+    Offers and the day's ended jobs are new every day and sent whole. Of the
+    current jobs, rows the page has not seen are sent whole and the others
+    only with the fields that changed. `order` lists every current job, so
+    the page drops the rest. With reset, nothing is assumed to be on the page.
+    """
+    env = get_env(player)
+    tables = get_rendered(player, 'job_tables', render_job_tables)
+    rows = {row['name']: row for row in tables['job_strs']}
+    sent = {} if reset else _live_rows.get(player.participant.code, {})
+    _live_rows[player.participant.code] = rows
+    added = [row for name, row in rows.items() if name not in sent]
+    changed = {name: {field: value for field, value in row.items() if sent[name].get(field) != value}
+               for name, row in rows.items() if name in sent and row != sent[name]}
+    sparklines = {job['name']: job for job in get_rendered(player, 'js_jobs', render_js_jobs)}
+    return dict(day=env.current_day + 1,
+                reset=reset,
+                done=env.current_day >= player.session.n_days,
+                seconds_left=get_period_time_seconds(player),
+                offers=tables['offer_strs'],
+                added=added,
+                changed=changed,
+                order=list(rows),
+                ended=tables['ended_strs'],
+                sparklines={name: sparklines[name] for name in [row['name'] for row in added] + list(changed)},
+                payoff_usd=tables['payoff_usd'])
+
+def live_investment(player, data):
+    # {'type': 'load'} when the page opens, {'type': 'submit', 'day', 'offers', 'work'} to end a day
+    env = get_env(player)
+    if data.get('type') == 'submit' and data.get('day') == env.current_day + 1 <= player.session.n_days:
+        round_player = player.in_round(data['day'])
+        round_player.offer_actions = ','.join(data.get('offers', []))
+        round_player.work_actions = ','.join(data.get('work', []))
+        play_day(player, data.get('offers', []), data.get('work', []))
+    reply = render_live_day(player, reset=data.get('type') == 'load')
+    if reply['done']:
+        forget_pages(player.participant)
+    return {player.id_in_group: reply}
+
+class LiveInvestment(Page):
+    """Every day of the session on one page, stepped over the page's websocket.
+
+    Used instead of one Investment page per round when the session config
+    has live_rounds. Submits that are not for the coming day, such as a
+    repeat after a reconnect, only resend the state.
+    """
+    live_method = staticmethod(live_investment)
+
+    @staticmethod
+    def js_vars(player):
+        return dict(workers=player.session.workers, n_days=player.session.n_days,
+                    allow_submit=player.session.config['allow_submit'])
+
+    @staticmethod
+    def get_timeout_seconds(player):
+        # Safety net for a participant who leaves: the end of the last day
+        env = get_env(player)
+        return get_period_time_seconds(player) + (player.session.n_days - env.current_day - 1)*player.session.day_length
+
+    @staticmethod
+    def before_next_page(player, timeout_happened):
+        env = get_env(player)
+        while env.current_day < player.session.n_days:
+            play_day(player, [], [])
+        forget_pages(player.participant)
 
     @staticmethod
     def is_displayed(player):
-        return player.round_number <= player.session.config['max_rounds']
+        return player.session.config.get('live_rounds') and player.round_number == 1
 
 
-page_sequence = [FrontPage,Investment]
+page_sequence = [FrontPage,Investment,DraftInvestment,LiveInvestment]
 
 def custom_export(players):
-    yield [
-        'SubjectID','Day', 'Job Name','Action Type', 'Accepted/Worked On',
-        'Parts Completed', 'Soft Deadline Remaining', 'Hard Deadline Remaining', 'Current Payment', 'Payment Received']
-    for player in players:
-        participant = player.participant
-        env = participant.vars['env']
-        if len(env.history.history) > player.round_number-1:
-            hist = env.history.history[player.round_number-1]
-            for job, action in zip(hist.offers, hist.offer_actions):
-                yield [player.id_in_group, player.round_number, job.name, 'Offer', action,
-                       '','','','','']
-            for job, action in zip(hist.jobs, hist.job_actions):
-                received = '' if not job.is_ended() else job.final_payment
-                yield [player.id_in_group, player.round_number, job.name, 'Work', action,
-                       job.parts_completed, job.soft_deadline_remaining(), job.hard_deadline_remaining(), job.payment_current(), received]
+    yield export.EXPORT_HEADERS
+    session = _export_session(players)
+    parquet_path = session.config.get('export_parquet') if session is not None else None
+    yield from export.export_rows(players, get_env, parquet_path)
+
+
+def _player_session(player, *args):
+    return player.session
+
+def _export_session(players):
+    # oTree exports one app's players, of every session; time it for a profiled one
+    for player in players[:1]:
+        return player.session
+
+for hook in ('vars_for_template', 'js_vars', 'before_next_page'):
+    profiling.register(Investment, hook, session=_player_session)
+# DraftInvestment's other hooks run through Investment's
+profiling.register(DraftInvestment, 'live_method', 'DraftInvestment.live_method', session=_player_session)
+profiling.register(LiveInvestment, 'live_method', 'LiveInvestment.live_method', session=_player_session)
+profiling.register(sys.modules[__name__], 'custom_export', 'custom_export', session=_export_session)
@@ -0,0 +1,108 @@
+"""Job catalogue CSVs parsed into NumPy columns, validated, and cached on disk.
+
+A Catalogue holds one array per CSV column and the progressions as one flat
+array, with progression_offsets[i]:progression_offsets[i+1] the slice of job
+i. load_catalogue keeps the parsed arrays as .npy files in a directory named
+after the CSV's SHA-1, next to the CSV by default, and memory-maps them on
+later loads, so a catalogue is only parsed the first time it is seen.
+"""
+from collections import namedtuple
+import csv
+import hashlib
+import os
+import shutil
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+COLUMNS = {'Name': 'name', 'Day': 'day', 'Workers': 'workers', 'Parts': 'parts',
+           'Complication Probability': 'complication', 'Soft Deadline': 'soft_deadline',
+           'Hard Deadline': 'hard_deadline', 'Payment': 'payment'}
+
+Catalogue = namedtuple('Catalogue', list(COLUMNS.values()) + ['progression', 'progression_offsets'])
+
+
+def parse_csv(filename):
+    with open(filename, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        rows = list(reader)
+    missing = [name for name in list(COLUMNS) + ['Progression'] if name not in header]
+    if missing:
+        raise ValueError(f"{filename} is missing columns {missing}")
+    columns = dict(zip(header, zip(*rows))) if rows else {name: () for name in header}
+    arrays = {'name': np.array(columns['Name'], dtype=str)}
+    for name in ('Day', 'Workers', 'Parts', 'Soft Deadline', 'Hard Deadline', 'Payment'):
+        arrays[COLUMNS[name]] = np.array(columns[name], dtype=np.int64)
+    arrays['complication'] = np.array(columns['Complication Probability'], dtype=float)
+    progressions = columns['Progression']
+    lengths = np.array([progression.count(',') + 1 for progression in progressions], dtype=np.int64)
+    arrays['progression'] = np.array(','.join(progressions).split(',') if rows else [], dtype=np.int64)
+    arrays['progression_offsets'] = np.concatenate(([0], np.cumsum(lengths)))
+    return Catalogue(**arrays)
+
+
+def validate(catalogue, filename=''):
+    """Raise ValueError naming the offending rows if the catalogue is inconsistent."""
+    starts = catalogue.progression_offsets[:-1]
+    if len(starts):
+        sums = np.add.reduceat(catalogue.progression, starts)
+        smallest = np.minimum.reduceat(catalogue.progression, starts)
+    else:
+        sums = smallest = starts
+    checks = [('progression does not sum to Parts', sums != catalogue.parts),
+              ('progression has a day without progress', smallest < 1),
+              ('Soft Deadline is after Hard Deadline', catalogue.soft_deadline > catalogue.hard_deadline),
+              ('Soft Deadline is not positive', catalogue.soft_deadline < 1),
+              ('Workers is not positive', catalogue.workers < 1),
+              ('Day is not positive', catalogue.day < 1),
+              ('Complication Probability is outside [0, 1]',
+               (catalogue.complication < 0) | (catalogue.complication > 1))]
+    errors = []
+    for message, bad in checks:
+        rows = np.flatnonzero(bad)
+        if len(rows):
+            names = ', '.join(catalogue.name[rows[:5]].tolist()) + (', ...' if len(rows) > 5 else '')
+            errors.append(f"{message} for {len(rows)} jobs ({names})")
+    if errors:
+        raise ValueError(f"Invalid job catalogue {filename}: " + '; '.join(errors))
+
+
+def file_key(filename):
+    digest = hashlib.sha1(f'v{CACHE_VERSION}'.encode())
+    with open(filename, mode='rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_catalogue(filename, cache_dir=None):
+    """The validated Catalogue in `filename`, memory-mapped from the cache when possible.
+
+    `cache_dir` defaults to a .catalogue_cache directory beside the CSV. Pass
+    False to parse without caching.
+    """
+    if cache_dir is False:
+        catalogue = parse_csv(filename)
+        validate(catalogue, filename)
+        return catalogue
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(filename)), '.catalogue_cache')
+    path = os.path.join(cache_dir, file_key(filename))
+    if os.path.isdir(path):
+        return Catalogue(**{field: np.load(os.path.join(path, field + '.npy'), mmap_mode='r')
+                            for field in Catalogue._fields})
+    catalogue = parse_csv(filename)
+    validate(catalogue, filename)
+    # Written under a temporary name and renamed, so concurrent loaders never see a partial cache
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(tmp_path, exist_ok=True)
+        for field, array in zip(Catalogue._fields, catalogue):
+            np.save(os.path.join(tmp_path, field + '.npy'), array)
+        os.rename(tmp_path, path)
+    except OSError:
+        # Read-only directory, or another process cached it first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return catalogue
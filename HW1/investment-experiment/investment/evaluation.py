@@ -0,0 +1,244 @@
+"""Rank strategies by their mean over random sessions, sampling each only until its place is settled.
+
+Seed k plays every strategy on the jobs of JobGenerator(k), with `random`
+seeded to k for the strategy's own draws, so strategies are compared on the
+same sessions. Seeds are run in batches and folded into a RunningStats per
+strategy, Welford's streaming mean and variance of every METRICS column,
+and one per pair of strategies of their per-seed differences in the race
+metric. Paired differences cancel most of the session-to-session spread.
+After each batch, once min_seeds are in, a strategy stops being sampled when
+the t confidence interval of its difference from every other strategy
+excludes 0, when `top` others are certainly better than it, or when it
+reaches max_seeds.
+
+A stopped strategy's differences stop being updated. One stopped because
+`top` others beat it is out of the top, so the strategies still racing
+count it as settled against them whatever its frozen interval says;
+otherwise a comparison frozen while still wide would keep the best
+strategies sampling to max_seeds.
+
+    python -m investment.evaluation rate:2.9/shortest rate:3.1/fifo all/shortest --max-seeds 400
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+from scipy.stats import t
+
+from .generator import JobGenerator
+from .strategies import run_strategy, strategy_from_spec
+from .tournament import DEFAULT_CONFIG, add_config_arguments
+
+# Summary statistics of a finished JobEnv, as in the notebook's get_comparison_table
+METRICS = {
+    'total_payment': lambda env: env.total_payment,
+    'rate': lambda env: env.history.rate(),
+    'utilization': lambda env: env.history.utilization(),
+    'utilized_rate': lambda env: env.history.utilized_rate(),
+    'acceptance_rate': lambda env: env.history.acceptance_rate(),
+    'completion_rate': lambda env: env.history.completion_rate(),
+    'on_time_rate': lambda env: env.history.on_time_rate(),
+    'avg_accepted_rate': lambda env: env.history.avg_accepted_rate(),
+    'avg_accepted_length': lambda env: env.history.avg_accepted_length(),
+}
+METRIC_NAMES = list(METRICS)
+
+
+def metric_values(env):
+    # A session with nothing accepted or ended has no rates, count them as 0
+    values = []
+    for metric in METRICS.values():
+        try:
+            values.append(metric(env))
+        except ZeroDivisionError:
+            values.append(0)
+    return values
+
+
+class RunningStats:
+    """Streaming mean and variance of each of n_metrics columns.
+
+    update() folds in a batch of rows with Chan et al.'s pairwise form of
+    Welford's algorithm, so nothing but the count, mean and sum of squared
+    deviations is kept.
+    """
+    def __init__(self, n_metrics=len(METRICS)):
+        self.count = 0
+        self.mean = np.zeros(n_metrics)
+        self.m2 = np.zeros(n_metrics)
+
+    def update(self, rows):
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(self.mean))
+        n = len(rows)
+        if n == 0:
+            return
+        batch_mean = rows.mean(axis=0)
+        batch_m2 = ((rows - batch_mean)**2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta*n/total
+        self.m2 = self.m2 + batch_m2 + delta**2*self.count*n/total
+        self.count = total
+
+    def variance(self):
+        if self.count < 2:
+            return np.full(len(self.mean), np.inf)
+        return self.m2 / (self.count - 1)
+
+    def half_width(self, confidence=0.95):
+        """Half the width of the two-sided t confidence interval of each mean."""
+        if self.count < 2:
+            return np.full(len(self.mean), np.inf)
+        return t.ppf(0.5 + confidence/2, self.count - 1) * np.sqrt(self.variance() / self.count)
+
+    def interval(self, confidence=0.95):
+        half_width = self.half_width(confidence)
+        return self.mean - half_width, self.mean + half_width
+
+
+_config = None
+
+
+def _init_worker(config):
+    global _config
+    _config = config
+
+
+def run_seeds(strategy, seeds, config=None):
+    """METRICS rows of `strategy` for each seed, on the jobs of JobGenerator(seed)."""
+    config = config or _config
+    rows = []
+    for seed in seeds:
+        jobs = JobGenerator(seed, parts=config['parts'], pay_scale_factor=config['pay_scale_factor'],
+                            late_penalty=config['late_penalty'], fail_penalty=config['fail_penalty'])
+        env = run_strategy(strategy, jobs, config['max_rounds'], config['workers'],
+                           worker_pay=config['worker_pay'], seed=seed)
+        rows.append(metric_values(env))
+    return rows
+
+
+def _run_task(task):
+    strategy, seeds = task
+    return run_seeds(strategy, seeds)
+
+
+def difference(pairs, i, j, confidence=0.95):
+    """Confidence interval of strategy i's race metric minus strategy j's, on the seeds both played."""
+    if i < j:
+        low, high = pairs[i, j].interval(confidence)
+    else:
+        high, low = (-bound for bound in pairs[j, i].interval(confidence))
+    return low[0], high[0]
+
+
+def settled(pairs, n_strategies, active, confidence=0.95, top=None, out=()):
+    """Indices of active strategies whose rank the paired intervals already decide, and of those out of the top.
+
+    Strategies in `out` were found out of the top earlier and count as
+    separated from every other.
+    """
+    done = set()
+    now_out = set()
+    for i in active:
+        bounds = {j: difference(pairs, i, j, confidence) for j in range(n_strategies) if j != i}
+        racing = [bounds[j] for j in bounds if j not in out]
+        separate = sum(low > 0 or high < 0 for low, high in racing)
+        worse = sum(high < 0 for low, high in bounds.values())
+        # Worse than a strategy out of the top is out of it too
+        if top is not None and (worse >= top or any(bounds[j][1] < 0 for j in out)):
+            now_out.add(i)
+        if separate == len(racing) or i in now_out:
+            done.add(i)
+    return done, now_out
+
+
+def race(strategies, config=None, metric='total_payment', confidence=0.95, batch_size=10, min_seeds=10,
+         max_seeds=1000, top=None, processes=1, callback=None):
+    """Sample seeds 0, 1, ... for each strategy until its rank is settled or it has max_seeds.
+
+    Returns one RunningStats per strategy and the pairs' RunningStats of
+    their differences, keyed by (i, j) with i < j. callback(stats, active),
+    if given, is called after every batch with the indices still being sampled.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, metrics: {METRIC_NAMES}")
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    column = METRIC_NAMES.index(metric)
+    stats = [RunningStats() for _ in strategies]
+    pairs = {(i, j): RunningStats(1) for i in range(len(strategies)) for j in range(i + 1, len(strategies))}
+    active = list(range(len(strategies)))
+    out = set()
+    executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(config,)) if processes != 1 else None
+    try:
+        while active:
+            # Active strategies are always on the same seeds. Each one's batch
+            # is split so that every worker gets a share of the round.
+            seeds = range(stats[active[0]].count, min(stats[active[0]].count + batch_size, max_seeds))
+            step = -(-len(seeds) // max(1, (processes or os.cpu_count()) // len(active)))
+            tasks = [(i, seeds[j:j+step]) for i in active for j in range(0, len(seeds), step)]
+            if executor is None:
+                results = (run_seeds(strategies[i], chunk, config) for i, chunk in tasks)
+            else:
+                results = executor.map(_run_task, [(strategies[i], chunk) for i, chunk in tasks])
+            batch = {i: [] for i in active}
+            for (i, _), rows in zip(tasks, results):
+                batch[i] += rows
+            for i, rows in batch.items():
+                stats[i].update(rows)
+                for j in active:
+                    if j > i:
+                        pairs[i, j].update([[a[column] - b[column]] for a, b in zip(rows, batch[j])])
+            if stats[active[0]].count >= min_seeds:
+                done, now_out = settled(pairs, len(strategies), active, confidence, top, out)
+                out |= now_out
+                active = [i for i in active if i not in done and stats[i].count < max_seeds]
+            if callback is not None:
+                callback(stats, active)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return stats, pairs
+
+
+def comparison_table(names, stats, pairs, metric='total_payment', confidence=0.95):
+    """Rows of strategy, seeds, how many strategies it certainly beats and 'mean ± half-width' per metric.
+
+    Rows are ordered by that count, then by mean race metric.
+    """
+    beats = [sum(difference(pairs, i, j, confidence)[0] > 0 for j in range(len(stats)) if j != i)
+             for i in range(len(stats))]
+    column = METRIC_NAMES.index(metric)
+    rows = []
+    for i in sorted(range(len(stats)), key=lambda i: (-beats[i], -stats[i].mean[column])):
+        half_width = stats[i].half_width(confidence)
+        rows.append([names[i], stats[i].count, beats[i],
+                     *(f'{mean:.3g} ± {hw:.2g}' for mean, hw in zip(stats[i].mean, half_width))])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank strategies by their mean over random sessions.")
+    parser.add_argument('strategies', nargs='+', help="strategy specs such as rate:2.9/shortest or all/fifo")
+    parser.add_argument('--metric', default='total_payment', choices=METRIC_NAMES)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--min-seeds', type=int, default=10)
+    parser.add_argument('--max-seeds', type=int, default=1000)
+    parser.add_argument('--top', type=int, default=None, help="only rank the best TOP strategies")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes (0: all cores)")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    stats, pairs = race([strategy_from_spec(spec) for spec in args.strategies], config, metric=args.metric,
+                        confidence=args.confidence, batch_size=args.batch_size, min_seeds=args.min_seeds,
+                        max_seeds=args.max_seeds, top=args.top, processes=args.processes or None)
+    width = max(map(len, args.strategies))
+    print(f"{'Strategy':<{width}} {'Seeds':>6} {'Beats':>6} " + ' '.join(f'{name:>20}' for name in METRIC_NAMES))
+    for name, count, beats, *cells in comparison_table(args.strategies, stats, pairs, args.metric, args.confidence):
+        print(f"{name:<{width}} {count:>6} {beats:>6} " + ' '.join(f'{cell:>20}' for cell in cells))
+    print(f"{sum(s.count for s in stats)} sessions, against {args.max_seeds*len(stats)} without stopping")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Rows of the session export, produced one participant at a time.
+
+oTree hands custom_export every player of every round. participant_rounds
+groups those players by participant without touching participant.vars, so
+each participant's environment is unpickled once and all of its rounds are
+streamed from that copy before the next one is loaded.
+
+The rows therefore come out grouped by participant, each participant's in
+round order, where the export used to be ordered by round. SubjectID is the
+participant's id_in_group, which repeats across sessions, so custom_export
+adds the participant code as a last column after the HEADERS that
+test_actions.csv has.
+
+With a parquet_path, export_rows also writes its rows to a Parquet file as
+they stream, one row group per participant. custom_export passes the
+export_parquet session config, off by default. Blank cells become nulls and
+the payment columns are float64, since scaled pay is fractional. It needs
+pyarrow, which the oTree app itself does not.
+"""
+HEADERS = ['SubjectID', 'Day', 'Job Name', 'Action Type', 'Accepted/Worked On',
+           'Parts Completed', 'Soft Deadline Remaining', 'Hard Deadline Remaining', 'Current Payment',
+           'Payment Received']
+PARTICIPANT_HEADER = 'Participant Code'
+EXPORT_HEADERS = HEADERS + [PARTICIPANT_HEADER]
+
+
+def participant_rounds(players):
+    """Yield (a player of the participant, [(round_number, id_in_group)]) per participant."""
+    first_players = {}
+    rounds = {}
+    for player in players:
+        first_players.setdefault(player.participant_id, player)
+        rounds.setdefault(player.participant_id, []).append((player.round_number, player.id_in_group))
+    for participant_id, player in first_players.items():
+        yield player, sorted(rounds.pop(participant_id))
+
+
+def day_rows(subject_id, day, hist):
+    for job, action in zip(hist.offers, hist.offer_actions):
+        yield [subject_id, day, job.name, 'Offer', action,
+               '', '', '', '', '']
+    for job, action in zip(hist.jobs, hist.job_actions):
+        received = '' if not job.is_ended() else job.final_payment
+        yield [subject_id, day, job.name, 'Work', action,
+               job.parts_completed, job.soft_deadline_remaining(), job.hard_deadline_remaining(),
+               job.payment_current(), received]
+
+
+def env_rows(env, rounds):
+    history = env.history.history
+    for round_number, subject_id in rounds:
+        if len(history) > round_number-1:
+            yield from day_rows(subject_id, round_number, history[round_number-1])
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = [pa.int32(), pa.int32(), pa.string(), pa.string(), pa.int8(), pa.int32(), pa.int32(), pa.int32(),
+             pa.float64(), pa.float64(), pa.string()]
+    return pa.schema(list(zip(EXPORT_HEADERS, types)))
+
+
+def export_rows(players, get_env, parquet_path=None):
+    """Every EXPORT_HEADERS row, loading each participant's environment with get_env(player) once.
+
+    With parquet_path, the rows are also written there as they are yielded.
+    """
+    writer = None
+    if parquet_path:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = parquet_schema()
+        writer = pq.ParquetWriter(parquet_path, schema)
+    try:
+        for player, rounds in participant_rounds(players):
+            code = player.participant.code
+            columns = [[] for _ in EXPORT_HEADERS]
+            for row in env_rows(get_env(player), rounds):
+                row.append(code)
+                if writer is not None:
+                    for column, value in zip(columns, row):
+                        column.append(None if value == '' else value)
+                yield row
+            if writer is not None and columns[0]:
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
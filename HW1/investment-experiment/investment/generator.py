@@ -0,0 +1,141 @@
+"""Random job catalogues from the notebook's create_random_job model, sampled on demand.
+
+sample_catalogue draws any number of jobs at once with NumPy, as a
+catalogue.Catalogue. Each day's progression is a geometric number of parts,
+as in create_job_progression, so a job's length is 1 + Binomial(parts-1, p).
+
+JobGenerator can stand in for the all_jobs list of a JobEnv. Days are
+sampled in blocks when they are first looked at, each block from its own
+seed, so any day can be rebuilt and only the last few blocks are kept.
+With n_days=float('inf') an environment runs for as long as it is stepped.
+
+    env = JobEnv(JobGenerator(seed=42), 10_000, 10)
+"""
+import functools
+import hashlib
+
+import numpy as np
+from scipy.stats import binom
+
+from . import job_env
+from .catalogue import Catalogue
+
+
+def sample_progressions(rng, parts, complication):
+    """Flat progressions and their offsets for jobs of `parts` parts."""
+    progress = rng.geometric(complication[:, None], size=(len(complication), parts))
+    done = np.minimum(np.cumsum(progress, axis=1), parts)
+    progress = np.diff(done, axis=1, prepend=0)
+    lengths = (progress > 0).sum(axis=1)
+    return progress[progress > 0], np.concatenate(([0], np.cumsum(lengths)))
+
+
+def sample_jobs(rng, n, parts=10, threshold=1.3):
+    """Columns of `n` jobs drawn as by create_random_job, rejecting rates below `threshold` cents."""
+    columns = {'workers': [], 'complication': [], 'soft_deadline': [], 'hard_deadline': [], 'payment': []}
+    n_accepted = 0
+    while n_accepted < n:
+        size = n - n_accepted
+        req_diff = np.maximum(0, rng.normal(1.2, 0.2, size))
+        n_workers = 1 + rng.binomial(9, np.minimum(1, 0.18*req_diff))
+
+        job_diff = np.maximum(0, rng.normal(1.4, 0.1, size))
+        time_diff = rng.beta(9.6, 5.2, size)
+
+        # Rounded like write_job_csv, which also keeps the length quantile cache small
+        complication = np.round(rng.beta(1.7*job_diff, 3.5), 3)
+        late_length = 1 + binom.ppf(0.8, parts-1, complication)
+        soft_deadline = np.minimum(2*parts, np.ceil(late_length/time_diff)).astype(np.int64)
+        hard_deadline = np.minimum(2*parts, np.ceil(late_length/time_diff**1.8)).astype(np.int64)
+
+        expected_length = 1 + (parts-1)*complication
+        expected_worker_days = expected_length*n_workers
+        urgency = expected_length / soft_deadline
+        slack_days = soft_deadline - expected_length
+
+        mean_rate = 0.015
+        urgency_cent = (urgency-0.45)/0.1
+        workers_cent = (n_workers-3.0)/1.24
+        length_cent = (expected_length-4.5)/1.7
+        mean_payment_rate = mean_rate * np.exp(0.05*(req_diff-1.2)/0.15 +
+                                               0.05*(job_diff-1.4)/0.1 +
+                                               0.05*(time_diff-0.55)/0.15 +
+                                               0.15*workers_cent +
+                                               -0.10*length_cent +
+                                               0.22*urgency_cent +
+                                               -0.15*(slack_days-5.4)/2.6 +
+                                               -0.03*np.maximum(0,workers_cent)*np.maximum(0,length_cent) +
+                                               0.04*np.maximum(0,urgency_cent)*np.maximum(0,workers_cent) +
+                                               0.07*np.maximum(0,urgency_cent)*np.maximum(0,-length_cent) +
+                                               0.04*np.maximum(0,urgency_cent)*np.maximum(0,-length_cent)*np.maximum(0,workers_cent)
+                                               )
+        std = 0.01
+        scale = std**2 / mean_payment_rate
+        payment_rate = rng.gamma(mean_payment_rate/scale, scale)
+        accepted = payment_rate*100 >= threshold
+        payment = np.maximum(1, (payment_rate*expected_worker_days*100).astype(np.int64))
+
+        for name, values in (('workers', n_workers), ('complication', complication), ('soft_deadline', soft_deadline),
+                             ('hard_deadline', hard_deadline), ('payment', payment)):
+            columns[name].append(values[accepted])
+        n_accepted += accepted.sum()
+    return {name: np.concatenate(values) if values else np.zeros(0) for name, values in columns.items()}
+
+
+def sample_catalogue(rng, arrivals, first_day=1, parts=10, threshold=1.3):
+    """A Catalogue with arrivals[i] jobs on day first_day + i, named '<day>-<i>' like the notebook's."""
+    arrivals = np.asarray(arrivals, dtype=np.int64)
+    day = np.repeat(np.arange(first_day, first_day + len(arrivals)), arrivals)
+    slot = np.arange(len(day)) - np.repeat(np.cumsum(arrivals) - arrivals, arrivals)
+    columns = sample_jobs(rng, len(day), parts, threshold)
+    progression, progression_offsets = sample_progressions(rng, parts, columns['complication'])
+    return Catalogue(name=np.array([f'{d}-{i}' for d, i in zip(day.tolist(), slot.tolist())], dtype=str),
+                     day=day,
+                     parts=np.full(len(day), parts, dtype=np.int64),
+                     progression=progression,
+                     progression_offsets=progression_offsets,
+                     **columns)
+
+
+class JobGenerator:
+    """Days of random jobs for a JobEnv, indexed by day like all_jobs.
+
+    Each day gets min(Poisson(arrival_rate), max_arrivals) jobs, as in the
+    notebook's generate_jobs. Two generators with the same arguments produce
+    the same jobs, and share a catalogue key for pickled environments.
+    """
+    def __init__(self, seed, parts=10, arrival_rate=2, max_arrivals=7, threshold=1.3, pay_scale_factor=1,
+                 late_penalty=0.15, fail_penalty=0.2, block_days=1000, cached_blocks=2):
+        self.args = (seed, parts, arrival_rate, max_arrivals, threshold, pay_scale_factor, late_penalty,
+                     fail_penalty, block_days, cached_blocks)
+        self.seed = seed
+        self.parts = parts
+        self.arrival_rate = arrival_rate
+        self.max_arrivals = max_arrivals
+        self.threshold = threshold
+        self.job_args = (parts, pay_scale_factor, late_penalty, fail_penalty)
+        self.block_days = block_days
+        self.key = 'generator:' + hashlib.sha1(repr(self.args[:-1]).encode()).hexdigest()
+        self._block = functools.lru_cache(maxsize=cached_blocks)(self._make_block)
+
+    def __reduce__(self):
+        return (JobGenerator, self.args)
+
+    def __getitem__(self, day):
+        block, day_in_block = divmod(day, self.block_days)
+        return self._block(block)[day_in_block]
+
+    def _make_block(self, block):
+        rng = np.random.default_rng([self.seed, block])
+        first_day = block*self.block_days
+        arrivals = np.minimum(rng.poisson(self.arrival_rate, self.block_days), self.max_arrivals)
+        jobs = job_env.build_jobs(sample_catalogue(rng, arrivals, first_day + 1, self.parts, self.threshold),
+                                  *self.job_args)
+        days = []
+        start = 0
+        for day, n_jobs in enumerate(arrivals.tolist(), first_day):
+            days.append(jobs[start:start + n_jobs])
+            for slot, job in enumerate(days[-1]):
+                job.address = (day, slot)
+            start += n_jobs
+        return days
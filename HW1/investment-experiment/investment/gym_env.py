@@ -0,0 +1,165 @@
+"""Gymnasium interface to the investment task.
+
+JobGymEnv wraps one JobEnv. JobVectorEnv is a native gymnasium VectorEnv that
+steps all sub-environments together on a VectorJobEnv instead of looping over
+JobGymEnv instances.
+
+Observations pad the day's offers to `max_offers` rows and the active jobs to
+`max_jobs` rows of JOB_FEATURES, with 0/1 masks marking the real rows. Actions
+are MultiBinary(max_offers + max_jobs): accept flags for the offers, then work
+flags for the active jobs in JobEnv.jobs order. Offers accepted beyond the
+room left under `max_jobs` are dropped. The reward is the day's change in
+total payment.
+"""
+import gymnasium as gym
+from gymnasium import spaces
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+import numpy as np
+
+from . import job_env
+from .vector_env import VectorJobEnv
+
+JOB_FEATURES = ['n_workers', 'parts_remaining', 'complication_probability', 'soft_deadline_remaining',
+                'hard_deadline_remaining', 'payment_current', 'expected_length', 'return_rate']
+
+
+def job_features(job):
+    return [job.n_workers, job.parts_remaining(), job.complication_probability, job.soft_deadline_remaining(),
+            job.hard_deadline_remaining(), job.payment_current(), job.expected_length(), job.return_rate()]
+
+
+def vector_job_features(engine, jobs):
+    """JOB_FEATURES for a (n_envs, n) array of catalogue indices, -1 rows are zeroed."""
+    rows = np.arange(engine.n_envs)[:, None]
+    present = jobs >= 0
+    parts_remaining = engine.parts[jobs] - engine.parts_completed[rows, jobs]
+    payment = engine.payment_current(rows, jobs)
+    ended = parts_remaining == 0
+    expected_length = np.where(ended, 0, 1 + (parts_remaining - 1) * engine.complication[jobs])
+    return_rate = np.where(ended, 0, payment / (engine.workers[jobs] * np.where(ended, 1, expected_length)))
+    features = np.stack([engine.workers[jobs],
+                         parts_remaining,
+                         engine.complication[jobs],
+                         engine.soft_deadline[jobs] - engine.days_passed[rows, jobs],
+                         engine.hard_deadline[jobs] - engine.days_passed[rows, jobs],
+                         payment,
+                         expected_length,
+                         return_rate], axis=-1)
+    return np.where(present[..., None], features, 0).astype(np.float32)
+
+
+def observation_space(max_offers, max_jobs, n_days):
+    n_features = len(JOB_FEATURES)
+    return spaces.Dict({'offers': spaces.Box(-np.inf, np.inf, (max_offers, n_features), np.float32),
+                        'offer_mask': spaces.MultiBinary(max_offers),
+                        'jobs': spaces.Box(-np.inf, np.inf, (max_jobs, n_features), np.float32),
+                        'job_mask': spaces.MultiBinary(max_jobs),
+                        'day': spaces.Box(0, n_days, (1,), np.float32)})
+
+
+def _max_offers(all_jobs, n_days):
+    # A generated catalogue (generator.JobGenerator) cannot be sliced, and caps its days' offers itself
+    if hasattr(all_jobs, 'max_arrivals'):
+        return all_jobs.max_arrivals
+    return max((len(day_jobs) for day_jobs in all_jobs[:n_days]), default=0)
+
+
+class JobGymEnv(gym.Env):
+    metadata = {'render_modes': []}
+
+    def __init__(self, all_jobs, n_days, n_workers, worker_pay=0, max_offers=None, max_jobs=20):
+        self.all_jobs = all_jobs
+        self.n_days = n_days
+        self.n_workers = n_workers
+        self.worker_pay = worker_pay
+        self.max_offers = max_offers or _max_offers(all_jobs, n_days)
+        self.max_jobs = max_jobs
+        self.observation_space = observation_space(self.max_offers, self.max_jobs, n_days)
+        self.action_space = spaces.MultiBinary(self.max_offers + self.max_jobs)
+        self.env = None
+
+    def _observe(self):
+        offers = np.zeros((self.max_offers, len(JOB_FEATURES)), dtype=np.float32)
+        jobs = np.zeros((self.max_jobs, len(JOB_FEATURES)), dtype=np.float32)
+        if self.env.offers:
+            offers[:len(self.env.offers)] = [job_features(job) for job in self.env.offers]
+        if self.env.jobs:
+            jobs[:len(self.env.jobs)] = [job_features(job) for job in self.env.jobs]
+        return {'offers': offers,
+                'offer_mask': (np.arange(self.max_offers) < len(self.env.offers)).astype(np.int8),
+                'jobs': jobs,
+                'job_mask': (np.arange(self.max_jobs) < len(self.env.jobs)).astype(np.int8),
+                'day': np.array([self.env.current_day], dtype=np.float32)}
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        self.env = job_env.JobEnv(self.all_jobs, self.n_days, self.n_workers, worker_pay=self.worker_pay)
+        return self._observe(), {}
+
+    def step(self, action):
+        action = np.asarray(action)
+        accept = action[:len(self.env.offers)].astype(int)
+        accept[np.cumsum(accept) > self.max_jobs - len(self.env.jobs)] = 0
+        work = action[self.max_offers:self.max_offers + len(self.env.jobs)].astype(int)
+        before = self.env.total_payment
+        self.env.step(accept.tolist(), work.tolist())
+        terminated = self.env.current_day >= self.n_days
+        return self._observe(), float(self.env.total_payment - before), terminated, False, {}
+
+
+class JobVectorEnv(VectorEnv):
+    metadata = {'autoreset_mode': AutoresetMode.NEXT_STEP}
+
+    def __init__(self, all_jobs, n_days, n_workers, num_envs, worker_pay=0, max_offers=None, max_jobs=20):
+        self.num_envs = num_envs
+        self.n_days = n_days
+        self.max_offers = max_offers or _max_offers(all_jobs, n_days)
+        self.max_jobs = max_jobs
+        self.engine = VectorJobEnv(all_jobs, n_days, n_workers, num_envs, worker_pay=worker_pay)
+        self.single_observation_space = observation_space(self.max_offers, self.max_jobs, n_days)
+        self.single_action_space = spaces.MultiBinary(self.max_offers + self.max_jobs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self._autoreset = False
+
+    def _observe(self):
+        engine = self.engine
+        offers = np.broadcast_to(engine.offers, (self.num_envs, len(engine.offers)))
+        obs_offers = np.zeros((self.num_envs, self.max_offers, len(JOB_FEATURES)), dtype=np.float32)
+        obs_offers[:, :offers.shape[1]] = vector_job_features(engine, offers)
+        obs_jobs = np.zeros((self.num_envs, self.max_jobs, len(JOB_FEATURES)), dtype=np.float32)
+        obs_jobs[:, :engine.active.shape[1]] = vector_job_features(engine, engine.active)
+        job_mask = np.zeros((self.num_envs, self.max_jobs), dtype=np.int8)
+        job_mask[:, :engine.active.shape[1]] = engine.active >= 0
+        offer_mask = np.zeros((self.num_envs, self.max_offers), dtype=np.int8)
+        offer_mask[:, :offers.shape[1]] = 1
+        return {'offers': obs_offers,
+                'offer_mask': offer_mask,
+                'jobs': obs_jobs,
+                'job_mask': job_mask,
+                'day': np.full((self.num_envs, 1), engine.current_day, dtype=np.float32)}
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        self.engine.reset()
+        self._autoreset = False
+        return self._observe(), {}
+
+    def step(self, actions):
+        if self._autoreset:
+            obs, info = self.reset()
+            done = np.zeros(self.num_envs, dtype=bool)
+            return obs, np.zeros(self.num_envs), done, done, info
+        engine = self.engine
+        actions = np.asarray(actions)
+        accept = actions[:, :len(engine.offers)].astype(np.int64)
+        room = self.max_jobs - engine.n_active()
+        accept[np.cumsum(accept, axis=1) > room[:, None]] = 0
+        work = actions[:, self.max_offers:self.max_offers + engine.active.shape[1]]
+        before = engine.total_payment.copy()
+        engine.step(accept, work)
+        rewards = (engine.total_payment - before).astype(np.float64)
+        terminated = np.full(self.num_envs, engine.current_day >= self.n_days)
+        self._autoreset = bool(terminated.any())
+        return self._observe(), rewards, terminated, np.zeros(self.num_envs, dtype=bool), {}
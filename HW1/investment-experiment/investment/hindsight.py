@@ -0,0 +1,244 @@
+"""Hindsight schedules: the best payment a catalogue allows when every progression is known, or a bound on it.
+
+Knowing each job's _progression, its length is fixed: it completes on the
+day it is worked for the len(_progression)-th time, and JobEnv's deadline
+and penalty rules then fix its payment. The best schedule is a 0/1 MILP
+solved with scipy's HiGHS branch-and-bound:
+
+    y[j, c]  job j completes on day c, for the days c where that pays > 0
+    x[j, t]  job j is worked on day t
+
+    sum_c y[j, c] <= 1                        completed at most once
+    sum_t x[j, t] == L_j sum_c y[j, c]        worked exactly L_j days if completed
+    x[j, t] <= sum_{c >= t} y[j, c]           not worked after completing
+    y[j, c] <= x[j, c]                        worked on the day it completes
+    sum_j workers_j x[j, t] <= n_workers      every day's capacity
+
+maximizing sum pay[j, c] y[j, c]. A job offered on day d (0-based, as
+all_jobs[d]) is taken at the end of day d and worked from day d+1, and
+completing on day c pays payment_current() at days_passed = c - d - 1. Taking
+a job and not completing it never pays more than refusing it, and completing
+only where it pays > 0 prunes late completions and the jobs that cannot
+finish in time. Before the soft deadline every completion day pays the same,
+so the fourth constraint pins c to the last day worked instead of letting
+the solver branch over equally good later days.
+
+Capacity is what makes the problem hard: the LP relaxation packs fractions
+of jobs into every day, and HiGHS's cuts close most but not all of that.
+solve() therefore stops at a time limit and reports the best schedule with
+HiGHS's bound on the optimum and the gap between them. Such a schedule is
+only a lower bound on the hindsight optimum: Solution.optimal is set only
+when the gap is 0, and the CLI labels the payment as the best schedule
+found, with its gap, otherwise. Short limits can stop at schedules worse
+than a plain strategy's, so the CLI first plays the strategies it compares
+against and starts from the best of them: on test_jobs.csv 5 seconds then
+pays $26.53 against rate:2.9/shortest's $26.19, where it paid $22.83 alone,
+but leaves a gap of about 46% to the bound, and 30 seconds gets within
+about 3%.
+
+The schedule accepts exactly the jobs it completes. play() replays it
+through JobEnv, which must reach the same payment.
+
+    python -m investment.hindsight --jobs test_jobs.csv
+    python -m investment.hindsight --seed 3 --time-limit 120 rate:2.9/shortest all/fifo
+"""
+import argparse
+from collections import namedtuple
+import copy
+import time
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_array
+
+from . import job_env
+from .strategies import run_strategy, strategy_from_spec
+from .tournament import DEFAULT_CONFIG, add_config_arguments, load_catalogue
+
+# payment and bound are in cents and net of worker pay, work[day] the names of the jobs worked that day.
+# optimal only when the bound has closed on the payment; otherwise the payment is the best found, gap below the bound
+Solution = namedtuple('Solution', ['payment', 'bound', 'gap', 'lp_bound', 'seconds', 'nodes', 'status', 'optimal',
+                                   'accepted', 'work'])
+
+
+def completion_payments(job, offered_day, n_days):
+    """{day: payment} of the days the job can complete on for a positive payment."""
+    length = len(job._progression)
+    last_day = min(offered_day + job.hard_deadline, n_days - 1)
+    probe = copy.copy(job)
+    payments = {}
+    for day in range(offered_day + length, last_day + 1):
+        probe.days_passed = day - offered_day - 1
+        payment = probe.payment_current()
+        if payment > 0:
+            payments[day] = payment
+    return payments
+
+
+def build_model(all_jobs, n_days, n_workers):
+    """The MILP's (objective, constraint matrix, lower, upper) and (job, work days, completion days) per candidate.
+
+    Work and completion days are the variable indices of the candidate's
+    x[j, t] and y[j, c], as {day: index}.
+    """
+    candidates = []
+    objective = []
+    for offered_day in range(min(n_days, len(all_jobs))):
+        for job in all_jobs[offered_day]:
+            payments = completion_payments(job, offered_day, n_days) if job.n_workers <= n_workers else {}
+            if not payments:
+                continue
+            first = len(objective)
+            work_days = range(offered_day + 1, max(payments) + 1)
+            work = {day: first + i for i, day in enumerate(work_days)}
+            done = {day: first + len(work) + i for i, day in enumerate(payments)}
+            objective += [0]*len(work) + [-payment for payment in payments.values()]
+            candidates.append((job, work, done))
+
+    rows, cols, values, lower, upper = [], [], [], [], []
+
+    def add_row(entries, lb, ub):
+        for col, value in entries:
+            rows.append(len(lower))
+            cols.append(col)
+            values.append(value)
+        lower.append(lb)
+        upper.append(ub)
+
+    capacity = {}
+    for job, work, done in candidates:
+        length = len(job._progression)
+        add_row([(y, 1) for y in done.values()], 0, 1)
+        add_row([(x, 1) for x in work.values()] + [(y, -length) for y in done.values()], 0, 0)
+        for day, x in work.items():
+            add_row([(x, 1)] + [(y, -1) for c, y in done.items() if c >= day], -np.inf, 0)
+            capacity.setdefault(day, []).append((x, job.n_workers))
+        for c, y in done.items():
+            add_row([(y, 1), (work[c], -1)], -np.inf, 0)
+    for day, entries in capacity.items():
+        add_row(entries, 0, n_workers)
+    matrix = coo_array((values, (rows, cols)), shape=(len(lower), len(objective))).tocsr()
+    return (np.array(objective, dtype=float), matrix, np.array(lower), np.array(upper)), candidates
+
+
+def schedule(env):
+    """The accepted job names and each day's worked job names of a played JobEnv."""
+    history = env.history.history
+    accepted = {job.name for hist in history for job in hist.get_taken_jobs()}
+    work = [[job.name for job, action in zip(hist.jobs, hist.job_actions) if action] for hist in history]
+    return accepted, work
+
+
+def solve(all_jobs, n_days, n_workers, worker_pay=0, time_limit=30, gap=1e-4, incumbent=None):
+    """The best Solution HiGHS finds for the catalogue's first n_days days.
+
+    HiGHS stops at time_limit seconds or once the relative gap between the
+    schedule and its bound is below gap. The schedule is always feasible.
+    Status 0 only means the gap is below the requested one; the Solution is
+    marked optimal when its gap is 0.
+
+    incumbent is a JobEnv played over the same days, such as a strategy's.
+    scipy cannot hand HiGHS a starting solution, so its payment is added as
+    a cutoff the schedule must reach, which prunes the search the same way,
+    and its schedule is returned if HiGHS finds nothing at least as good in
+    time.
+    """
+    start = time.perf_counter()
+    (objective, matrix, lower, upper), candidates = build_model(all_jobs, n_days, n_workers)
+    worker_cost = worker_pay*n_days
+    if not candidates:
+        return Solution(-worker_cost, -worker_cost, 0, -worker_cost, time.perf_counter() - start, 0, 0, True,
+                        set(), [[] for _ in range(n_days)])
+    constraints = [LinearConstraint(matrix, lower, upper)]
+    relaxed = milp(objective, constraints=constraints, bounds=Bounds(0, 1))
+    if incumbent is not None:
+        # Completed jobs pay at least what the incumbent's schedule does, less rounding
+        cutoff = incumbent.total_payment + worker_cost
+        constraints.append(LinearConstraint(-objective, cutoff - 1e-6*max(1, abs(cutoff)), np.inf))
+    result = milp(objective, integrality=np.ones(len(objective)), constraints=constraints, bounds=Bounds(0, 1),
+                  options={'time_limit': time_limit, 'mip_rel_gap': gap})
+    if result.x is None:
+        if incumbent is None:
+            raise ValueError(f"No schedule found: {result.message}")
+        payment = incumbent.total_payment
+        # Stopped before branching, the LP relaxation is the bound
+        dual_bound = relaxed.fun if result.mip_dual_bound is None else result.mip_dual_bound
+        bound = max(-dual_bound - worker_cost, payment)
+        return Solution(payment, bound, (bound - payment) / max(1, abs(payment)), -relaxed.fun - worker_cost,
+                        time.perf_counter() - start, result.mip_node_count or 0, result.status,
+                        closed(payment, bound), *schedule(incumbent))
+    chosen = result.x > 0.5
+    accepted = set()
+    work = [[] for _ in range(n_days)]
+    for job, work_days, done in candidates:
+        if any(chosen[y] for y in done.values()):
+            accepted.add(job.name)
+            for day, x in work_days.items():
+                if chosen[x]:
+                    work[day].append(job.name)
+    payment = float(-objective[chosen].sum()) - worker_cost
+    bound = -result.mip_dual_bound - worker_cost
+    return Solution(payment, bound, result.mip_gap, -relaxed.fun - worker_cost, time.perf_counter() - start,
+                    result.mip_node_count, result.status, closed(payment, bound), accepted, work)
+
+
+def closed(payment, bound):
+    """Whether the bound proves the payment optimal, up to the solver's rounding."""
+    return bound - payment <= 1e-9*max(1, abs(payment))
+
+
+def play(solution, all_jobs, n_days, n_workers, worker_pay=0):
+    """Replay the solution's schedule through a JobEnv."""
+    env = job_env.JobEnv(all_jobs, n_days, n_workers, worker_pay=worker_pay)
+    for day in range(n_days):
+        work = set(solution.work[day])
+        env.step([int(job.name in solution.accepted) for job in env.offers],
+                 [int(job.name in work) for job in env.jobs])
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the best payment of a job catalogue in hindsight.")
+    parser.add_argument('strategies', nargs='*', default=['rate:2.9/shortest'],
+                        help="strategy specs to compare against (default rate:2.9/shortest)")
+    parser.add_argument('--jobs', default='./test_jobs.csv', help="job catalogue CSV")
+    parser.add_argument('--seed', type=int, default=None, help="solve a JobGenerator catalogue instead of --jobs")
+    parser.add_argument('--time-limit', type=float, default=30, help="seconds (default 30)")
+    parser.add_argument('--gap', type=float, default=1e-4, help="relative optimality gap to stop at (default 1e-4)")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    n_days, n_workers, worker_pay = config['max_rounds'], config['workers'], config['worker_pay']
+    if args.seed is None:
+        all_jobs = load_catalogue(args.jobs, config)
+    else:
+        from .learning import catalogue_days
+        all_jobs = catalogue_days(args.seed, n_days, config)
+    played = {spec: run_strategy(strategy_from_spec(spec), all_jobs, n_days, n_workers, worker_pay, seed=0)
+              for spec in args.strategies}
+    incumbent = max(played.values(), key=lambda env: env.total_payment, default=None)
+    solution = solve(all_jobs, n_days, n_workers, worker_pay, time_limit=args.time_limit, gap=args.gap,
+                     incumbent=incumbent)
+    env = play(solution, all_jobs, n_days, n_workers, worker_pay)
+    if not np.isclose(env.total_payment, solution.payment):
+        raise ValueError(f"Replaying the schedule paid {env.total_payment}, the solver expected {solution.payment}")
+    n_offered = sum(len(all_jobs[day]) for day in range(min(n_days, len(all_jobs))))
+    print(f"{n_offered} jobs over {n_days} days, {len(solution.accepted)} accepted, "
+          f"status {solution.status}, {solution.nodes} nodes in {solution.seconds:.2f}s")
+    # Only a closed gap makes the schedule the hindsight optimum, otherwise it is the best found
+    if solution.optimal:
+        label, unproven = 'hindsight optimum', ''
+    else:
+        label, unproven = 'best schedule found', f"   gap {solution.gap:.2%}, not proven optimal"
+    print(f"{label.capitalize():<24} {solution.payment / 100:>9.2f}{unproven}")
+    print(f"{'Bound':<24} {solution.bound / 100:>9.2f}   gap {solution.gap:.2%}")
+    print(f"{'LP relaxation':<24} {solution.lp_bound / 100:>9.2f}")
+    print(f"{'Utilization':<24} {env.history.utilization():>9.1%}")
+    for spec, played_env in played.items():
+        payment = played_env.total_payment
+        print(f"{spec:<24} {payment / 100:>9.2f}   {payment / solution.payment:.1%} of {label}, "
+              f"{payment / solution.bound:.1%} of bound")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Day histories of many runs as columns of .npy files, appended in chunks and memory-mapped on load.
+
+A store is a directory with three tables, each a record per row:
+
+    days    run, day, n_workers, n_offers, n_jobs
+    offers  run, day, job_day, job_slot, action, workers, parts, complication,
+            soft_deadline, hard_deadline, payment
+    jobs    run, day, job_day, job_slot, action, workers, parts, parts_completed,
+            complication, soft_deadline_remaining, hard_deadline_remaining,
+            payment, final_payment, completed, failed
+
+`jobs` are the jobs that were active at the start of `day`, in the state the
+day's DayHistory records them in, and `action` is the realized work action
+(-1 for jobs that did not fit). job_day and job_slot are the job's place in
+the catalogue.
+
+HistoryWriter.append adds a finished JobEnv's history under a run id and
+writes a chunk whenever chunk_rows job rows are buffered. Each chunk is a
+directory of one .npy per column, named after the writing process and
+renamed into place when complete, so several processes can write to one
+store. load() memory-maps the chunks of only the columns asked for.
+day_summary computes the DayHistory metrics of every (run, day) as
+vectorized group-bys over those columns.
+
+    with HistoryWriter('runs.history') as writer:
+        writer.append(sid, env)
+    summary = day_summary('runs.history')
+"""
+import os
+import shutil
+
+import numpy as np
+
+# Column dtypes. Payments (None) take the catalogue's, ints unless pay_scale_factor made them floats
+TABLES = {
+    'days': {'run': np.int64, 'day': np.int32, 'n_workers': np.int32, 'n_offers': np.int32, 'n_jobs': np.int32},
+    'offers': {'run': np.int64, 'day': np.int32, 'job_day': np.int32, 'job_slot': np.int32, 'action': np.int8,
+               'workers': np.int16, 'parts': np.int16, 'complication': np.float64, 'soft_deadline': np.int32,
+               'hard_deadline': np.int32, 'payment': None},
+    'jobs': {'run': np.int64, 'day': np.int32, 'job_day': np.int32, 'job_slot': np.int32, 'action': np.int8,
+             'workers': np.int16, 'parts': np.int16, 'parts_completed': np.int16, 'complication': np.float64,
+             'soft_deadline_remaining': np.int32, 'hard_deadline_remaining': np.int32, 'payment': None,
+             'final_payment': None, 'completed': np.bool_, 'failed': np.bool_},
+}
+
+def _job_columns(jobs):
+    addresses = [job.address or (-1, -1) for job in jobs]
+    return {'job_day': [day for day, _ in addresses],
+            'job_slot': [slot for _, slot in addresses],
+            'workers': [job.n_workers for job in jobs],
+            'parts': [job.parts for job in jobs],
+            'complication': [job.complication_probability for job in jobs],
+            'payment': [job.payment for job in jobs]}
+
+
+def history_columns(run, history):
+    """The days, offers and jobs columns of one EnvHistory, as lists."""
+    days = history.history
+    offers = [job for hist in days for job in hist._offers]
+    jobs = [job for hist in days for job in hist._jobs]
+    states = [state for hist in days for state in hist._job_states]
+    offer_days = [hist.day for hist in days for _ in hist._offers]
+    job_days = [hist.day for hist in days for _ in hist._jobs]
+    columns = {
+        'days': {'run': [run]*len(days),
+                 'day': [hist.day for hist in days],
+                 'n_workers': [hist.n_workers for hist in days],
+                 'n_offers': [len(hist._offers) for hist in days],
+                 'n_jobs': [len(hist._jobs) for hist in days]},
+        'offers': {'run': [run]*len(offers),
+                   'day': offer_days,
+                   'action': [action for hist in days for action in hist.offer_actions],
+                   'soft_deadline': [job.soft_deadline for job in offers],
+                   'hard_deadline': [job.hard_deadline for job in offers],
+                   **_job_columns(offers)},
+        'jobs': {'run': [run]*len(jobs),
+                 'day': job_days,
+                 'action': [action for hist in days for action in hist.job_actions],
+                 'parts_completed': [state.parts_completed for state in states],
+                 'soft_deadline_remaining': [job.soft_deadline - state.days_passed for job, state in zip(jobs, states)],
+                 'hard_deadline_remaining': [job.hard_deadline - state.days_passed for job, state in zip(jobs, states)],
+                 'final_payment': [state.final_payment for state in states],
+                 'completed': [state.completed for state in states],
+                 'failed': [state.failed for state in states],
+                 **_job_columns(jobs)},
+    }
+    return columns
+
+
+class HistoryWriter:
+    def __init__(self, path, chunk_rows=1 << 16):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._buffers = {table: {column: [] for column in columns} for table, columns in TABLES.items()}
+        self._n_chunks = 0
+        for table in TABLES:
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, run, env):
+        for table, columns in history_columns(run, env.history).items():
+            buffer = self._buffers[table]
+            for column, values in columns.items():
+                buffer[column] += values
+        if len(self._buffers['jobs']['run']) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffers['days']['run']:
+            return
+        name = f'{os.getpid()}-{id(self):x}-{self._n_chunks:06d}'
+        self._n_chunks += 1
+        for table, buffer in self._buffers.items():
+            path = os.path.join(self.path, table, name)
+            # Written under a temporary name and renamed, so readers never see a partial chunk
+            tmp_path = path + '.tmp'
+            os.makedirs(tmp_path)
+            try:
+                for column, dtype in TABLES[table].items():
+                    np.save(os.path.join(tmp_path, column + '.npy'), np.array(buffer[column], dtype=dtype))
+                os.rename(tmp_path, path)
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            for values in buffer.values():
+                values.clear()
+
+    def close(self):
+        self.flush()
+
+
+def chunks(path, table):
+    """Names of the complete chunks of `table`, in a stable order."""
+    return sorted(name for name in os.listdir(os.path.join(path, table)) if not name.endswith('.tmp'))
+
+
+def load(path, table, columns=None, mmap_mode='r'):
+    """Columns of `table` over every chunk. A single chunk stays memory-mapped."""
+    columns = columns or list(TABLES[table])
+    unknown = [column for column in columns if column not in TABLES[table]]
+    if unknown:
+        raise ValueError(f"Unknown {table} columns {unknown}, columns: {list(TABLES[table])}")
+    names = chunks(path, table)
+    loaded = {column: [np.load(os.path.join(path, table, name, column + '.npy'), mmap_mode=mmap_mode)
+                       for name in names]
+              for column in columns}
+    return {column: arrays[0] if len(arrays) == 1 else
+                    np.concatenate(arrays) if arrays else np.zeros(0, dtype=TABLES[table][column] or np.int64)
+            for column, arrays in loaded.items()}
+
+
+def _expected_length(parts_remaining, complication):
+    return np.where(parts_remaining > 0, 1 + (parts_remaining - 1)*complication, 0)
+
+
+def day_summary(path):
+    """DayHistory's per-day metrics for every (run, day), sorted by run and day.
+
+    Returns a dict of arrays: run, day, job_count, workers_assigned,
+    utilization, worker_rate, active_worker_rate, average_length,
+    average_workers, expected_commitment and payment, matching
+    get_n_workers_assigned(), get_utilization(), get_worker_rate(),
+    get_active_worker_rate(), get_average_length(),
+    get_average_workers(), get_expected_commitment() and get_payment().
+    """
+    days = load(path, 'days', ['run', 'day', 'n_workers'])
+    jobs = load(path, 'jobs', ['run', 'day', 'action', 'workers', 'parts', 'parts_completed', 'complication',
+                               'payment', 'final_payment', 'completed', 'failed'])
+    order = np.lexsort((days['day'], days['run']))
+    run, day, n_workers = days['run'][order], days['day'][order], days['n_workers'][order]
+    # Each job row's (run, day) group, found by binary search in the sorted days
+    keys = run.astype(np.int64)*(int(day.max(initial=0)) + 1) + day
+    group = np.searchsorted(keys, jobs['run'].astype(np.int64)*(int(day.max(initial=0)) + 1) + jobs['day'])
+    n_groups = len(keys)
+
+    def group_sum(values):
+        return np.bincount(group, weights=values, minlength=n_groups)
+
+    workers = jobs['workers'].astype(float)
+    worked = jobs['action'] == 1
+    full_length = _expected_length(jobs['parts'], jobs['complication'])
+    current_length = _expected_length(jobs['parts'] - jobs['parts_completed'], jobs['complication'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        full_rate = np.where(jobs['parts'] > 0, jobs['payment'] / (workers*full_length), 0)
+    ended = jobs['completed'] | jobs['failed']
+
+    job_count = np.bincount(group, minlength=n_groups)
+    workers_assigned = group_sum(np.where(worked, workers, 0))
+    worker_rate = group_sum(np.where(worked, workers*full_rate, 0)) / n_workers
+    payment = group_sum(np.where(ended, jobs['final_payment'], 0))
+    if jobs['final_payment'].dtype.kind in 'iu':
+        payment = payment.astype(np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {'run': run,
+                'day': day,
+                'job_count': job_count,
+                'workers_assigned': workers_assigned.astype(np.int64),
+                'utilization': workers_assigned / n_workers,
+                'worker_rate': worker_rate,
+                'active_worker_rate': np.where(workers_assigned > 0, worker_rate*n_workers / workers_assigned, 0),
+                'average_length': np.where(job_count > 0, group_sum(current_length) / job_count, 0),
+                'average_workers': np.where(job_count > 0, group_sum(workers) / job_count, 0),
+                'expected_commitment': group_sum(current_length*workers),
+                'payment': payment}
@@ -1,6 +1,61 @@
 import numpy as np
 from scipy.stats import binom
+from collections import namedtuple
+import operator
+import hashlib
 import copy
+from .catalogue import load_catalogue
+
+# (remaining parts, complication probability, quantile) -> 1 + binomial ppf
+_LENGTH_QUANTILES = {}
+
+def fill_length_quantiles(jobs, quantiles=(0.05, 0.95)):
+    pairs = {(job.parts, job.complication_probability) for job in jobs}
+    n = np.array([parts - 1 for max_parts, _ in pairs for parts in range(1, max_parts + 1)])
+    p = np.array([prob for max_parts, prob in pairs for _ in range(max_parts)])
+    for q in quantiles:
+        lengths = 1 + binom.ppf(q, n, p)
+        for parts, prob, length in zip((n + 1).tolist(), p.tolist(), lengths):
+            _LENGTH_QUANTILES[(parts, prob, q)] = int(length)
+
+def length_quantile(parts, probability, q):
+    key = (parts, probability, q)
+    length = _LENGTH_QUANTILES.get(key)
+    if length is None:
+        length = _LENGTH_QUANTILES[key] = int(1 + binom(parts-1, probability).ppf(q))
+    return length
+
+def string_to_int_list(s):
+    return list(map(int, s.split(',')))
+
+def build_jobs(jobs, parts, pay_scale_factor=1, late_penalty=0.15, fail_penalty=0.2):
+    """One Job per row of a catalogue.Catalogue, in row order."""
+    progression = jobs.progression.tolist()
+    offsets = jobs.progression_offsets.tolist()
+    rows = zip(jobs.name.tolist(), jobs.workers.tolist(), jobs.complication.tolist(),
+               jobs.soft_deadline.tolist(), jobs.hard_deadline.tolist(), jobs.payment.tolist())
+    return [Job(name=name,
+                reqs=workers,
+                parts=parts,
+                complication=complication,
+                soft_deadline=soft_deadline,
+                hard_deadline=hard_deadline,
+                payment=payment*pay_scale_factor,
+                progression=progression[offsets[i]:offsets[i+1]],
+                late_penalty=late_penalty,
+                fail_penalty=fail_penalty)
+            for i, (name, workers, complication, soft_deadline, hard_deadline, payment) in enumerate(rows)]
+
+def read_jobs(filename, n_days, parts, pay_scale_factor=1, late_penalty=0.15, fail_penalty=0.2, cache_dir=None):
+    jobs = load_catalogue(filename, cache_dir)
+    if (jobs.parts != parts).any():
+        raise ValueError(f"{filename} has jobs with other than {parts} parts")
+    if len(jobs.day) and jobs.day.max() > n_days + 1:
+        raise ValueError(f"{filename} has jobs offered after day {n_days + 1}")
+    all_jobs = [[] for _ in range(n_days+1)]
+    for day, job in zip(jobs.day.tolist(), build_jobs(jobs, parts, pay_scale_factor, late_penalty, fail_penalty)):
+        all_jobs[day-1].append(job)
+    return all_jobs
 
 class Job:
     def __init__(self, name, reqs, parts, complication, soft_deadline, hard_deadline, payment, progression, late_penalty=0.15, fail_penalty=0.2):
@@ -18,8 +73,18 @@ class Job:
         self._progression=progression
         self.completed = False
         self.failed = False
+        self.on_time = None
         self._late_penalty = late_penalty
         self._fail_penalty = fail_penalty
+        self.address = None
+
+    def state(self):
+        return JobState(self.parts_completed, self.days_worked, self.days_passed, self.final_payment,
+                        self.completed, self.failed, self.on_time)
+
+    def set_state(self, state):
+        (self.parts_completed, self.days_worked, self.days_passed, self.final_payment,
+         self.completed, self.failed, self.on_time) = state
 
     def parts_remaining(self):
         return self.parts - self.parts_completed
@@ -52,13 +117,13 @@ class Job:
         parts = self.parts if not current else self.parts_remaining()
         if parts == 0:
             return 0
-        return int(1 + binom(parts-1,self.complication_probability).ppf(0.95))
+        return length_quantile(parts, self.complication_probability, 0.95)
 
     def lower_length(self, current=True):
         parts = self.parts if not current else self.parts_remaining()
         if parts == 0:
             return 0
-        return int(1 + binom(parts-1,self.complication_probability).ppf(0.05))
+        return length_quantile(parts, self.complication_probability, 0.05)
 
     def return_rate(self, current=True, omniscient=False):
         parts = self.parts if not current else self.parts_remaining()
@@ -106,6 +171,63 @@ class Job:
                 f'{self.payment_current()} Cents')
 
 
+# The fields of a Job that change while it is offered, worked and ended
+JobState = namedtuple('JobState', ['parts_completed', 'days_worked', 'days_passed', 'final_payment',
+                                   'completed', 'failed', 'on_time'])
+
+
+def _job_field(name):
+    return property(lambda self: getattr(self.job, name))
+
+def _state_field(name):
+    return property(lambda self: getattr(self.state, name))
+
+
+class JobView:
+    """Read-only Job as it was when `state` was recorded.
+
+    Immutable fields are read from the live job, so a recorded day costs one
+    JobState tuple per job instead of a copy of the job.
+    """
+    __slots__ = ('job', 'state')
+
+    def __init__(self, job, state):
+        self.job = job
+        self.state = state
+
+    name = _job_field('name')
+    n_workers = _job_field('n_workers')
+    parts = _job_field('parts')
+    complication_probability = _job_field('complication_probability')
+    soft_deadline = _job_field('soft_deadline')
+    hard_deadline = _job_field('hard_deadline')
+    payment = _job_field('payment')
+    _progression = _job_field('_progression')
+    _late_penalty = _job_field('_late_penalty')
+    _fail_penalty = _job_field('_fail_penalty')
+
+    parts_completed = _state_field('parts_completed')
+    days_worked = _state_field('days_worked')
+    days_passed = _state_field('days_passed')
+    final_payment = _state_field('final_payment')
+    completed = _state_field('completed')
+    failed = _state_field('failed')
+    on_time = _state_field('on_time')
+
+    parts_remaining = Job.parts_remaining
+    soft_deadline_remaining = Job.soft_deadline_remaining
+    is_late = Job.is_late
+    hard_deadline_remaining = Job.hard_deadline_remaining
+    payment_current = Job.payment_current
+    expected_length = Job.expected_length
+    upper_length = Job.upper_length
+    lower_length = Job.lower_length
+    return_rate = Job.return_rate
+    is_ended = Job.is_ended
+    last_progress = Job.last_progress
+    __str__ = Job.__str__
+
+
 def progress_str(job, completed_this_day, include_zero=False):
     perc_comp = job.parts_completed / job.parts * 100
     added_perc_comp = completed_this_day / job.parts * 100
@@ -158,14 +280,16 @@ def common_job_str(job, current=True):
 
 
 class DayHistory:
-    def __init__(self, day, offers, offer_actions, jobs_before, job_actions, n_workers):
+    def __init__(self, day, offers, offer_actions, jobs_before, job_actions, n_workers, offer_states=None, job_states=None):
         self.day = day
-        self.offers = offers
+        self._offers = offers
+        self._offer_states = [job.state() for job in offers] if offer_states is None else offer_states
         self.offer_actions = offer_actions
-        self.jobs = jobs_before
+        self._jobs = jobs_before
+        self._job_states = [job.state() for job in jobs_before] if job_states is None else job_states
         self.job_actions = job_actions
-        self.ended = [job for job in jobs_before if job.is_ended()]
-        self.ended_actions = [job_actions[i] for i in range(len(job_actions)) if self.jobs[i] in self.ended]
+        self._ended = [i for i, state in enumerate(self._job_states) if state.completed or state.failed]
+        self.ended_actions = [job_actions[i] for i in self._ended]
         self._n_workers_assigned = None
         self._utilization = None
         self._active_worker_rate = [None,None]
@@ -176,14 +300,26 @@ class DayHistory:
         self._value = None
         self.n_workers = n_workers
 
+    @property
+    def offers(self):
+        return [JobView(job, state) for job, state in zip(self._offers, self._offer_states)]
+
+    @property
+    def jobs(self):
+        return [JobView(job, state) for job, state in zip(self._jobs, self._job_states)]
+
+    @property
+    def ended(self):
+        return [JobView(self._jobs[i], self._job_states[i]) for i in self._ended]
+
     def get_taken_jobs(self):
-        return [self.offers[i] for i in range(len(self.offers)) if self.offer_actions[i] == 1]
+        return [job for job, action in zip(self.offers, self.offer_actions) if action == 1]
 
     def get_untaken_jobs(self):
-        return [self.offers[i] for i in range(len(self.offers)) if self.offer_actions[i] != 1]
+        return [job for job, action in zip(self.offers, self.offer_actions) if action != 1]
 
     def get_worked_jobs(self):
-        return [self.jobs[i] for i in range(len(self.jobs)) if self.job_actions[i] == 1]
+        return [job for job, action in zip(self.jobs, self.job_actions) if action == 1]
 
     def get_n_workers_assigned(self):
         if self._n_workers_assigned is None:
@@ -209,14 +345,14 @@ class DayHistory:
         return self.get_worker_rate(current)*self.n_workers/self.get_n_workers_assigned()
 
     def get_average_length(self, current=True):
-        if len(self.jobs) == 0:
+        if len(self._jobs) == 0:
             return 0
         if self._average_length[int(current)] is None:
             self._average_length[int(current)] = np.mean([job.expected_length(current) for job in self.jobs])
         return self._average_length[int(current)]
 
     def get_average_workers(self):
-        if len(self.jobs) == 0:
+        if len(self._jobs) == 0:
             return 0
         if self._average_workers is None:
             self._average_workers = np.mean([job.n_workers for job in self.jobs])
@@ -235,22 +371,95 @@ class DayHistory:
 def flatten(lsts):
     return [item for sublist in lsts for item in sublist]
 
+# EnvHistory's running totals, in the order JobEnv's pickled state keeps them
+HISTORY_TOTALS = ('_n_taken', '_n_untaken', '_n_ended', '_n_completed', '_n_on_time', '_accepted_length',
+                  '_accepted_workers', '_accepted_rate', '_n_workers_assigned')
+
 class EnvHistory:
     def __init__(self, n_days, n_workers):
-        self.history = []
+        self._days = []
+        # Days restored from a pickled JobEnv before _days, as (encoded days, catalogue), built on first use
+        self._packed = None
+        self._n_packed = 0
         self.n_days = n_days
         self.n_workers = n_workers
-        self._reset_cache()
-
-    def _reset_cache(self):
-        self._n_taken = None
-        self._n_workers_assigned = None
-        self._total_payments = None
-        self._n_ended = None
+        # Running totals kept up to date by record() so every metric is O(1)
+        self._n_taken = 0
+        self._n_untaken = 0
+        self._n_ended = 0
+        self._n_completed = 0
+        self._n_on_time = 0
+        self._accepted_length = 0
+        self._accepted_workers = 0
+        self._accepted_rate = 0
+        self._n_workers_assigned = 0
+        self._total_payments = []
+
+    @classmethod
+    def unpacked_later(cls, n_days, n_workers, encoded, all_jobs, totals, total_payments):
+        """A history of the encoded days with the given running totals, whose DayHistorys are built on first use."""
+        history = cls(n_days, n_workers)
+        history._n_packed = len(encoded['days'])
+        if history._n_packed:
+            history._packed = ({key: encoded.get(key) for key in DAY_KEYS}, all_jobs)
+        for name, value in zip(HISTORY_TOTALS, totals):
+            setattr(history, name, value)
+        history._total_payments = total_payments
+        return history
+
+    @property
+    def history(self):
+        if self._packed is not None:
+            self._days[:0] = _decode_days(*self._packed, self.n_workers)
+            self._packed = None
+            self._n_packed = 0
+        return self._days
+
+    def n_recorded(self):
+        return self._n_packed + len(self._days)
+
+    def last_day(self):
+        """The last recorded DayHistory, or None, without building the earlier ones."""
+        if self._days:
+            return self._days[-1]
+        if self._packed is not None:
+            return _decode_days(*self._packed, self.n_workers, start=self._n_packed - 1)[0]
+        return None
+
+    def encoded(self):
+        """The recorded days as JobEnv's pickled state keeps them, reusing the restored days' arrays."""
+        days = _encode_days(self._days)
+        return days if self._packed is None else _join_days(self._packed[0], days)
+
+    def __getstate__(self):
+        self.history
+        return self.__dict__
+
+    def __setstate__(self, state):
+        state = dict(state)
+        if 'history' in state:
+            # Pickled before the days could be left encoded
+            state['_days'] = state.pop('history')
+        state.setdefault('_packed', None)
+        state.setdefault('_n_packed', 0)
+        self.__dict__.update(state)
 
     def record(self, day_hist):
-        self.history.append(day_hist)
-        self._reset_cache()
+        self._days.append(day_hist)
+        taken = day_hist.get_taken_jobs()
+        self._n_taken += len(taken)
+        self._n_untaken += len(day_hist.offer_actions) - len(taken)
+        for job in taken:
+            self._accepted_length += job.expected_length(current=False)
+            self._accepted_workers += job.n_workers
+            self._accepted_rate += job.return_rate(current=False)
+        for job in day_hist.ended:
+            self._n_ended += 1
+            self._n_completed += job.completed
+            self._n_on_time += job.on_time
+        self._n_workers_assigned += day_hist.get_n_workers_assigned()
+        total = self._total_payments[-1] if self._total_payments else 0
+        self._total_payments.append(total + day_hist.get_payment())
 
     def get_offered(self, flattened=False):
         lsts = [day_hist.offers for day_hist in self.history]
@@ -269,56 +478,42 @@ class EnvHistory:
         return flatten(lsts) if flattened else lsts
 
     def get_n_taken(self):
-        if self._n_taken is None:
-            self._n_taken = sum(len(day_taken) for day_taken in self.get_taken())
         return self._n_taken
 
     def get_n_ended(self):
-        if self._n_ended is None:
-            self._n_ended = sum(len(day_ended) for day_ended in self.get_ended())
         return self._n_ended
 
     def acceptance_rate(self):
-        n_untaken = sum(len(day_untaken) for day_untaken in self.get_untaken())
-        return self.get_n_taken() / (self.get_n_taken() + n_untaken)
+        return self._n_taken / (self._n_taken + self._n_untaken)
 
     def completion_rate(self):
-        n_completed = sum(job.completed for job in self.get_ended(flattened=True))
-        return n_completed/self.get_n_ended()
+        return self._n_completed / self._n_ended
 
     def on_time_rate(self):
-        n_ontime = sum(job.on_time for job in self.get_ended(flattened=True))
-        return n_ontime / self.get_n_ended()
+        return self._n_on_time / self._n_ended
 
     def avg_accepted_length(self):
-        if self.get_n_taken == 0:
+        if self._n_taken == 0:
             return 0
-        tot_lengths = sum(job.expected_length(current=False) for job in self.get_taken(flattened=True))
-        return tot_lengths / self.get_n_taken()
+        return self._accepted_length / self._n_taken
 
     def avg_accepted_workers(self):
-        if self.get_n_taken == 0:
+        if self._n_taken == 0:
             return 0
-        tot_workers = sum(job.n_workers for job in self.get_taken(flattened=True))
-        return tot_workers / self.get_n_taken()
+        return self._accepted_workers / self._n_taken
 
     def avg_accepted_rate(self):
-        if self.get_n_taken == 0:
+        if self._n_taken == 0:
             return 0
-        tot_rates = sum(job.return_rate(current=False) for job in self.get_taken(flattened=True))
-        return tot_rates / self.get_n_taken()
+        return self._accepted_rate / self._n_taken
 
     def get_n_workers_assigned(self):
-        if self._n_workers_assigned is None:
-            self._n_workers_assigned = sum(day_hist.get_n_workers_assigned() for day_hist in self.history)
         return self._n_workers_assigned
 
     def utilization(self):
-        return self.get_n_workers_assigned() / (self.n_workers*len(self.history))
+        return self.get_n_workers_assigned() / (self.n_workers*self.n_recorded())
 
     def total_payment(self, day=None):
-        if self._total_payments is None:
-            self._total_payments = np.cumsum([day_hist.get_payment() for day_hist in self.history])
         if not day:
             day = len(self._total_payments)
         return self._total_payments[day-1]
@@ -327,28 +522,348 @@ class EnvHistory:
         return self.total_payment() / self.get_n_workers_assigned()
 
     def rate(self):
-        return self.total_payment() / (self.n_workers*len(self.history))
+        return self.total_payment() / (self.n_workers*self.n_recorded())
+
+
+# Job catalogues that pickled environments refer to by key instead of carrying a copy
+_CATALOGUES = {}
+STATE_VERSION = 2 # 1 had no history totals, its history is rebuilt with record()
+
+# A generated catalogue (generator.JobGenerator) addresses its own jobs and has its own key
+def index_catalogue(all_jobs):
+    if hasattr(all_jobs, 'key'):
+        return
+    for day, jobs in enumerate(all_jobs):
+        for slot, job in enumerate(jobs):
+            job.address = (day, slot)
+
+def catalogue_key(all_jobs):
+    if hasattr(all_jobs, 'key'):
+        return all_jobs.key
+    digest = hashlib.sha1(repr(len(all_jobs)).encode())
+    for day, jobs in enumerate(all_jobs):
+        for job in jobs:
+            digest.update(repr((day, job.name, job.n_workers, job.parts, job.complication_probability,
+                                job.soft_deadline, job.hard_deadline, job.payment, job._progression,
+                                job._late_penalty, job._fail_penalty)).encode())
+    return digest.hexdigest()
+
+def register_catalogue(all_jobs):
+    key = catalogue_key(all_jobs)
+    index_catalogue(all_jobs)
+    _CATALOGUES.setdefault(key, all_jobs)
+    return key
+
+def _int_array(values, width):
+    values = np.array(values, dtype=np.int32).reshape(-1, width)
+    if values.size and np.abs(values).max() <= np.iinfo(np.int16).max:
+        values = values.astype(np.int16)
+    return values
+
+def _encode_states(states):
+    return _int_array([(s.parts_completed, s.days_worked, s.days_passed, s.final_payment, s.completed, s.failed,
+                        -1 if s.on_time is None else s.on_time) for s in states], len(JobState._fields))
+
+# Scaled pay can leave fractions of a cent, which the state rows would truncate, so final
+# payments are then also kept as floats. None when every payment is whole.
+def _encode_payments(states):
+    payments = np.array([s.final_payment for s in states], dtype=np.float64)
+    if (payments == np.trunc(payments)).all():
+        return None
+    return payments
+
+def _decode_states(rows, payments=None):
+    states = [JobState(parts_completed, days_worked, days_passed, final_payment, bool(completed), bool(failed),
+                       None if on_time < 0 else bool(on_time))
+              for parts_completed, days_worked, days_passed, final_payment, completed, failed, on_time in rows.tolist()]
+    if payments is not None:
+        states = [state._replace(final_payment=int(payment) if payment.is_integer() else payment)
+                  for state, payment in zip(states, payments.tolist())]
+    return states
+
+# The keys of JobEnv's pickled state that hold the recorded days
+DAY_KEYS = ('days', 'n_offers', 'offer_actions', 'n_jobs', 'history_jobs', 'job_actions', 'history_states',
+            'history_payments')
+
+def _encode_days(days):
+    states = [state for hist in days for state in hist._job_states]
+    return {'days': np.array([hist.day for hist in days], dtype=np.int32),
+            'n_offers': np.array([len(hist.offer_actions) for hist in days], dtype=np.int32),
+            'offer_actions': np.array(flatten(hist.offer_actions for hist in days), dtype=np.int8),
+            'n_jobs': np.array([len(hist.job_actions) for hist in days], dtype=np.int32),
+            'history_jobs': _int_array([job.address for hist in days for job in hist._jobs], 2),
+            'job_actions': np.array(flatten(hist.job_actions for hist in days), dtype=np.int8),
+            'history_states': _encode_states(states),
+            'history_payments': _encode_payments(states)}
+
+def _join_days(head, tail):
+    if not len(tail['days']):
+        return head
+    joined = {key: np.concatenate([head[key], tail[key]])
+              for key in ('days', 'n_offers', 'offer_actions', 'n_jobs', 'job_actions')}
+    joined['history_jobs'] = _int_array(np.concatenate([head['history_jobs'], tail['history_jobs']]), 2)
+    joined['history_states'] = _int_array(np.concatenate([head['history_states'], tail['history_states']]),
+                                          len(JobState._fields))
+    if head['history_payments'] is None and tail['history_payments'] is None:
+        joined['history_payments'] = None
+    else:
+        joined['history_payments'] = np.concatenate(
+            [part['history_payments'] if part['history_payments'] is not None
+             else part['history_states'][:, JobState._fields.index('final_payment')].astype(np.float64)
+             for part in (head, tail)])
+    return joined
+
+def _decode_days(encoded, all_jobs, n_workers, start=0):
+    """DayHistorys of the encoded days from index start on."""
+    offer_end = np.cumsum(encoded['n_offers']).tolist()
+    job_end = np.cumsum(encoded['n_jobs']).tolist()
+    offer_from = offer_end[start-1] if start else 0
+    job_from = job_end[start-1] if start else 0
+    offer_actions = encoded['offer_actions'][offer_from:].tolist()
+    job_actions = encoded['job_actions'][job_from:].tolist()
+    history_jobs = [all_jobs[day][slot] for day, slot in encoded['history_jobs'][job_from:].tolist()]
+    payments = encoded.get('history_payments')
+    history_states = _decode_states(encoded['history_states'][job_from:],
+                                    None if payments is None else payments[job_from:])
+    days = []
+    for i, day in enumerate(encoded['days'][start:].tolist(), start):
+        offer_start = (offer_end[i-1] if i else 0) - offer_from
+        job_start = (job_end[i-1] if i else 0) - job_from
+        offer_stop = offer_end[i] - offer_from
+        job_stop = job_end[i] - job_from
+        days.append(DayHistory(day,
+                               all_jobs[day-1],
+                               offer_actions[offer_start:offer_stop],
+                               history_jobs[job_start:job_stop],
+                               job_actions[job_start:job_stop],
+                               n_workers,
+                               job_states=history_states[job_start:job_stop]))
+    return days
+
+def _encode_totals(total_payments):
+    totals = np.array(total_payments, dtype=np.float64)
+    if (totals == np.trunc(totals)).all():
+        return totals.astype(np.int64)
+    return totals
+
+
+# The part of a JobEnv that step() changes, as returned by JobEnv.snapshot()
+EnvSnapshot = namedtuple('EnvSnapshot', ['current_day', 'total_payment', 'revision', 'jobs', 'job_states',
+                                         'n_recorded'])
+
+
+class ActiveJobs:
+    """A JobEnv's active jobs, in the order they were taken, with their deadlines as days.
+
+    Iterating, len() and indexing follow the order the jobs were taken in,
+    which is the order of a day's work actions. Jobs are kept in a dict by
+    identity, so `in`, add() and remove() are O(1), and indexing builds the
+    list once after each change.
+
+    An active job's remaining deadlines drop by one every day, so its
+    deadlines as days, deadline - days_passed + current day, are fixed while
+    it is active. add() packs them into one int, and by_deadline() sorts on
+    it without calling into the jobs. The sort is stable and the dict keeps
+    the order taken, so ties keep it too.
+    """
+    _BITS = 32
+    _BIAS = 1 << 31
+
+    def __init__(self, jobs=(), day=0):
+        self._entries = {} # id(job) -> (job, soft day, hard day, (soft, hard) key)
+        self._order = None
+        for job in jobs:
+            self.add(job, day)
+
+    def add(self, job, day):
+        self._insert(job.soft_deadline - job.days_passed + day, job.hard_deadline - job.days_passed + day, job)
+
+    def _insert(self, soft, hard, job):
+        key = (soft + self._BIAS) << self._BITS | hard + self._BIAS
+        self._entries[id(job)] = (job, soft, hard, key)
+        self._order = None
+
+    def remove(self, job):
+        if self._entries.pop(id(job), None) is None:
+            raise ValueError(f"Job {job.name} is not active")
+        self._order = None
+
+    def copy(self):
+        """An independent set of the same jobs."""
+        active = ActiveJobs.__new__(ActiveJobs)
+        active._entries = self._entries.copy()
+        active._order = self._order
+        return active
+
+    def in_order(self):
+        """The jobs in the order taken, as a list that later changes leave alone."""
+        if self._order is None:
+            self._order = list(self)
+        return self._order
+
+    def by_deadline(self, day):
+        """The jobs by (max(0, soft deadline remaining), hard deadline remaining) on `day`, ties as taken."""
+        late = sorted((entry for entry in self._entries.values() if entry[1] <= day), key=operator.itemgetter(2))
+        on_time = sorted((entry for entry in self._entries.values() if entry[1] > day), key=operator.itemgetter(3))
+        return [entry[0] for entry in late] + [entry[0] for entry in on_time]
+
+    def __iter__(self):
+        return (entry[0] for entry in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, job):
+        entry = self._entries.get(id(job))
+        return entry is not None and entry[0] is job
+
+    def __getitem__(self, index):
+        return self.in_order()[index]
+
+    def __repr__(self):
+        return f'ActiveJobs({list(self)!r})'
+
+    # Entries are keyed by id(), which does not survive pickling
+    def __getstate__(self):
+        return [(soft, hard, job) for job, soft, hard, _ in self._entries.values()]
+
+    def __setstate__(self, state):
+        self.__init__()
+        for soft, hard, job in state:
+            self._insert(soft, hard, job)
 
 
 class JobEnv():
-    def __init__(self, all_jobs, n_days, n_workers, worker_pay=0):
+    def __init__(self, all_jobs, n_days, n_workers, worker_pay=0, catalogue_key=None):
         self.n_days = n_days
         self.n_workers = n_workers
-        self.jobs = []
+        self.jobs = ActiveJobs()
         self.worker_pay=worker_pay
         self.all_jobs=all_jobs
+        self.catalogue_key = catalogue_key
+        if catalogue_key is None:
+            index_catalogue(all_jobs)
+        self._unbound_state = None
         self.current_day=0
+        self.revision = 0 # Bumped by every step that changes the state
         self.total_payment = 0
+        self.record_history = True
         self.history = EnvHistory(self.n_days, self.n_workers)
         self.offers = self.all_jobs[self.current_day]
 
+    # Rollouts snapshot the environment, play ahead, usually with record_history
+    # off, and restore. Offers follow from the day and everything else that
+    # changes lives in the active jobs' JobStates.
+    def snapshot(self):
+        return EnvSnapshot(self.current_day, self.total_payment, self.revision,
+                           self.jobs.copy(), tuple(job.state() for job in self.jobs), self.history.n_recorded())
+
+    def restore(self, snapshot):
+        self.current_day = snapshot.current_day
+        self.total_payment = snapshot.total_payment
+        self.revision = snapshot.revision
+        for job, state in zip(snapshot.jobs, snapshot.job_states):
+            job.set_state(state)
+        self.jobs = snapshot.jobs.copy()
+        if self.history.n_recorded() != snapshot.n_recorded:
+            history = self.history
+            self.history = EnvHistory(self.n_days, self.n_workers)
+            for day_hist in history.history[:snapshot.n_recorded]:
+                self.history.record(day_hist)
+        if self.current_day < self.n_days:
+            self.offers = self.all_jobs[self.current_day]
+        else:
+            self.offers = []
+
+    # Pickled state holds only the mutable job fields, the action history and
+    # the history's running totals. The catalogue itself is looked up by key,
+    # or supplied with bind() when this process has not seen it yet. Loading
+    # leaves the history's days encoded until something reads them, and saving
+    # reuses their arrays, so a request that steps a day builds only that day.
+    def __getstate__(self):
+        if self.all_jobs is None:
+            return self._unbound_state
+        if self.catalogue_key is None:
+            self.catalogue_key = register_catalogue(self.all_jobs)
+        job_states = [job.state() for job in self.jobs]
+        return {'version': STATE_VERSION,
+                'catalogue_key': self.catalogue_key,
+                'n_days': self.n_days,
+                'n_workers': self.n_workers,
+                'worker_pay': self.worker_pay,
+                'current_day': self.current_day,
+                'revision': self.revision,
+                'total_payment': self.total_payment,
+                'jobs': _int_array([job.address for job in self.jobs], 2),
+                'job_states': _encode_states(job_states),
+                'job_payments': _encode_payments(job_states),
+                'history_totals': tuple(getattr(self.history, name) for name in HISTORY_TOTALS),
+                'total_payments': _encode_totals(self.history._total_payments),
+                **self.history.encoded()}
+
+    def __setstate__(self, state):
+        if 'version' not in state:
+            # Environment pickled with its whole object graph
+            self.__dict__.update(state)
+            self.__dict__.setdefault('revision', len(self.history.history))
+            self.__dict__.setdefault('record_history', True)
+            if not isinstance(self.jobs, ActiveJobs):
+                self.jobs = ActiveJobs(self.jobs, self.current_day)
+            return
+        if state['version'] not in (1, STATE_VERSION):
+            raise ValueError(f"Unsupported JobEnv state version {state['version']}")
+        self.n_days = state['n_days']
+        self.n_workers = state['n_workers']
+        self.worker_pay = state['worker_pay']
+        self.catalogue_key = state['catalogue_key']
+        self.current_day = state['current_day']
+        self.revision = state.get('revision', len(state['days']))
+        self.record_history = True
+        self.total_payment = state['total_payment']
+        all_jobs = _CATALOGUES.get(self.catalogue_key)
+        if all_jobs is None:
+            self.all_jobs = None
+            self._unbound_state = state
+        else:
+            self._restore(state, all_jobs)
+
+    def bind(self, all_jobs):
+        if self.all_jobs is None:
+            if register_catalogue(all_jobs) != self.catalogue_key:
+                raise ValueError("Job catalogue does not match the one this environment was created with")
+            self._restore(self._unbound_state, _CATALOGUES[self.catalogue_key])
+        return self
+
+    def _restore(self, state, all_jobs):
+        self.all_jobs = all_jobs
+        self._unbound_state = None
+        self.jobs = ActiveJobs()
+        for (day, slot), job_state in zip(state['jobs'].tolist(), _decode_states(state['job_states'], state.get('job_payments'))):
+            job = copy.copy(all_jobs[day][slot])
+            job.set_state(job_state)
+            self.jobs.add(job, self.current_day)
+
+        if 'history_totals' in state:
+            self.history = EnvHistory.unpacked_later(self.n_days, self.n_workers, state, all_jobs,
+                                                     state['history_totals'], state['total_payments'].tolist())
+        else:
+            self.history = EnvHistory(self.n_days, self.n_workers)
+            for day_hist in _decode_days(state, all_jobs, self.n_workers):
+                self.history.record(day_hist)
+        if self.current_day < self.n_days:
+            self.offers = self.all_jobs[self.current_day]
+        else:
+            self.offers = []
+
     def step(self, job_acceptances, work_actions):
         if self.current_day >= self.n_days:
             return
 
         used = 0
         realized_actions = copy.copy(work_actions)
-        active_jobs = self.jobs.copy() # Copy so removing jobs from self.jobs doesn't mess up iterating
+        # Ended jobs are only taken out of self.jobs after the loops, so iterating it directly is safe.
+        # The history keeps the day's jobs_before, which in_order() builds at most once per change.
+        active_jobs = self.jobs.in_order() if self.record_history else self.jobs
         for i,job in enumerate(active_jobs):
             if work_actions[i] ==1:
                 if used + job.n_workers <= self.n_workers:
@@ -364,13 +879,15 @@ class JobEnv():
             if job_acceptances[i] == 1:
                 self.take_job(job)
 
-        hist = DayHistory(self.current_day,
-                          copy.deepcopy(self.offers),
-                          realized_acceptances,
-                          copy.deepcopy(active_jobs),
-                          realized_actions,
-                          self.n_workers)
-        self.history.record(hist)
+        if self.record_history:
+            hist = DayHistory(self.current_day,
+                              self.offers,
+                              realized_acceptances,
+                              active_jobs,
+                              realized_actions,
+                              self.n_workers)
+            self.history.record(hist)
+        self.revision += 1
         if self.current_day < self.n_days:
             self.offers = self.all_jobs[self.current_day]
         else:
@@ -389,19 +906,29 @@ class JobEnv():
     def advance_day(self, active_jobs):
         incurred_penalties = 0
         self.current_day += 1
+        ended = []
         for job in active_jobs:
             if not job.is_ended():
                 job.advance_day()
             if job.failed:
                 self.complete_job(job)
                 incurred_penalties += job.final_payment
+            if job.is_ended():
+                ended.append(job)
+        for job in ended:
+            self.jobs.remove(job)
         return incurred_penalties
 
 
     def complete_job(self, job):
+        # advance_day() takes the job out of self.jobs with the rest of the day's ended jobs
         job.final_payment = job.payment_current()
-        self.jobs.remove(job)
 
 
     def take_job(self, job):
-        self.jobs.append(job)
+        # Offers belong to the shared catalogue, so the environment works on its own copy
+        self.jobs.add(copy.copy(job), self.current_day)
+
+    def jobs_by_deadline(self):
+        """Active jobs by soft deadline remaining, late jobs counting as 0, then hard deadline remaining."""
+        return self.jobs.by_deadline(self.current_day)
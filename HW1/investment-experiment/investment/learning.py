@@ -0,0 +1,212 @@
+"""Tabular model-free control of the investment task with NumPy Q-tables.
+
+Each day the agent chooses how picky to be: action a accepts the day's
+offers whose return rate is above THRESHOLDS[a], from refusing everything
+(inf) to accepting everything (-inf), and the active jobs are worked
+shortest first as in policies.work_shortest. The state is the day's
+STATE_FEATURES, each cut into bins by its edges, and the reward is the day's
+change in total payment.
+
+Episodes are played in batches of n_envs on a VectorJobEnv, each batch on a
+new JobGenerator catalogue, with epsilon-greedy exploration. Q-learning
+updates the table after every day of the batch, moving each visited Q(s, a)
+alpha of the way towards the mean target of its visits that day.
+Every-visit Monte-Carlo control replaces each Q(s, a) by the mean return of
+all its visits once the batch is over. The Q-table and visit counts are
+dense arrays of (n_states, n_actions), and train() reports the updates per
+second and table bytes of every batch alongside the payments.
+
+    python -m investment.learning --method q --batches 200 --envs 64
+"""
+import argparse
+from collections import namedtuple
+import time
+
+import numpy as np
+
+from . import policies
+from .generator import JobGenerator
+from .tournament import DEFAULT_CONFIG, add_config_arguments
+from .vector_env import VectorJobEnv
+
+THRESHOLDS = np.array([np.inf, 4.5, 3.5, 3.0, 2.5, 2.0, -np.inf])
+
+# Bin edges of each state feature, see day_features
+STATE_FEATURES = {'days_left': [5, 15, 40],
+                  'load': [0.5, 1, 2, 3, 5],
+                  'best_rate': [2.5, 3, 3.5, 4.5],
+                  'n_offers': [1, 2, 4]}
+
+BatchStats = namedtuple('BatchStats', ['batch', 'episodes', 'updates', 'seconds', 'updates_per_sec',
+                                       'table_bytes', 'epsilon', 'mean_payment'])
+
+
+def day_features(venv):
+    """STATE_FEATURES of every environment before today's step, as (n_envs,) arrays.
+
+    load is the expected worker-days committed to active jobs per worker and
+    best_rate the return rate of the best offer (0 without offers).
+    """
+    jobs = policies.job_features(venv)
+    offers = policies.offer_features(venv)
+    load = np.where(jobs.valid, jobs.expected_length*jobs.workers, 0).sum(axis=1) / venv.n_workers
+    best_rate = np.where(offers.valid, offers.return_rate, 0).max(axis=1, initial=0)
+    return {'days_left': np.full(venv.n_envs, venv.n_days - venv.current_day),
+            'load': load,
+            'best_rate': best_rate,
+            'n_offers': np.full(venv.n_envs, len(venv.offers))}
+
+
+STATE_SHAPE = tuple(len(edges) + 1 for edges in STATE_FEATURES.values())
+N_STATES = int(np.prod(STATE_SHAPE))
+
+
+def discretize(features):
+    bins = [np.digitize(features[name], edges) for name, edges in STATE_FEATURES.items()]
+    return np.ravel_multi_index(bins, STATE_SHAPE)
+
+
+class TabularLearner:
+    """Q(s, a) as a dense (n_states, n_actions) table, with Q-learning or every-visit MC updates."""
+    def __init__(self, method='q', n_states=N_STATES, n_actions=len(THRESHOLDS), alpha=0.1, gamma=1.0):
+        if method not in ('q', 'mc'):
+            raise ValueError(f"Unknown method {method!r}, methods: ['mc', 'q']")
+        self.method = method
+        self.alpha = alpha
+        self.gamma = gamma
+        self.q = np.zeros((n_states, n_actions))
+        self.visits = np.zeros((n_states, n_actions), dtype=np.int64)
+
+    @property
+    def table_bytes(self):
+        return self.q.nbytes + self.visits.nbytes
+
+    def act(self, states, rng, epsilon=0):
+        greedy = self.q[states].argmax(axis=1)
+        explore = rng.random(len(states)) < epsilon
+        return np.where(explore, rng.integers(0, self.q.shape[1], len(states)), greedy)
+
+    def q_update(self, states, actions, rewards, next_states, done):
+        """One Q-learning step of size alpha per visited (s, a), towards the mean target of the batch's visits.
+
+        Adding every environment's step instead would move a common (s, a)
+        by up to n_envs*alpha and diverge.
+        """
+        target = rewards + (0 if done else self.gamma*self.q[next_states].max(axis=1))
+        flat = np.ravel_multi_index((states, actions), self.q.shape)
+        counts = np.bincount(flat, minlength=self.q.size).reshape(self.q.shape)
+        sums = np.bincount(flat, weights=target - self.q[states, actions], minlength=self.q.size).reshape(self.q.shape)
+        seen = counts > 0
+        self.q[seen] += self.alpha*sums[seen] / counts[seen]
+        self.visits += counts
+
+    def mc_update(self, states, actions, rewards):
+        """Every-visit MC from (n_days, n_envs) arrays of whole episodes: Q(s, a) becomes the mean return."""
+        returns = np.zeros(rewards.shape)
+        future = np.zeros(rewards.shape[1])
+        for day in range(len(rewards) - 1, -1, -1):
+            future = rewards[day] + self.gamma*future
+            returns[day] = future
+        flat = np.ravel_multi_index((states.ravel(), actions.ravel()), self.q.shape)
+        counts = np.bincount(flat, minlength=self.q.size).reshape(self.q.shape)
+        sums = np.bincount(flat, weights=returns.ravel(), minlength=self.q.size).reshape(self.q.shape)
+        total = self.visits + counts
+        seen = total > 0
+        self.q[seen] = (self.q[seen]*self.visits[seen] + sums[seen]) / total[seen]
+        self.visits = total
+
+
+def catalogue_days(seed, n_days, config):
+    jobs = JobGenerator(seed, parts=config['parts'], pay_scale_factor=config['pay_scale_factor'],
+                        late_penalty=config['late_penalty'], fail_penalty=config['fail_penalty'])
+    return [jobs[day] for day in range(n_days + 1)]
+
+
+def play_batch(learner, all_jobs, n_days, n_workers, n_envs, rng, epsilon=0, learn=True, worker_pay=0):
+    """Play n_envs episodes at once. Returns the VectorJobEnv and the number of table updates."""
+    venv = VectorJobEnv(all_jobs, n_days, n_workers, n_envs, worker_pay=worker_pay)
+    episode = []
+    states = discretize(day_features(venv))
+    while venv.current_day < n_days:
+        actions = learner.act(states, rng, epsilon)
+        offers = policies.offer_features(venv)
+        accepted = offers.valid & (offers.return_rate > THRESHOLDS[actions][:, None])
+        before = venv.total_payment.copy()
+        venv.step(accepted.astype(np.int8), policies.work_shortest(policies.job_features(venv), n_workers, rng))
+        rewards = venv.total_payment - before
+        next_states = discretize(day_features(venv))
+        if learn and learner.method == 'q':
+            learner.q_update(states, actions, rewards, next_states, venv.current_day >= n_days)
+        episode.append((states, actions, rewards))
+        states = next_states
+    if learn and learner.method == 'mc':
+        learner.mc_update(*(np.array(column) for column in zip(*episode)))
+    return venv, n_days*n_envs if learn else 0
+
+
+def train(learner, n_batches, n_envs, config=None, seed=0, epsilon=(0.3, 0.02), callback=None):
+    """Learn from n_batches batches of episodes, epsilon decaying linearly. Returns the BatchStats."""
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    rng = np.random.default_rng(seed)
+    history = []
+    for batch in range(n_batches):
+        batch_epsilon = epsilon[0] + (epsilon[1] - epsilon[0])*batch / max(1, n_batches - 1)
+        all_jobs = catalogue_days(seed + batch, config['max_rounds'], config)
+        start = time.perf_counter()
+        venv, updates = play_batch(learner, all_jobs, config['max_rounds'], config['workers'], n_envs, rng,
+                                   batch_epsilon, worker_pay=config['worker_pay'])
+        seconds = time.perf_counter() - start
+        history.append(BatchStats(batch, n_envs, updates, seconds, updates / seconds, learner.table_bytes,
+                                  batch_epsilon, venv.total_payment.mean()))
+        if callback is not None:
+            callback(history[-1])
+    return history
+
+
+def evaluate(learner, seeds, config=None, baseline='rate:2.9/shortest'):
+    """Mean payment of the greedy policy and of `baseline` on the catalogues of `seeds`."""
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    rng = np.random.default_rng(0)
+    greedy, fixed = [], []
+    for seed in seeds:
+        all_jobs = catalogue_days(seed, config['max_rounds'], config)
+        venv, _ = play_batch(learner, all_jobs, config['max_rounds'], config['workers'], 1, rng,
+                             learn=False, worker_pay=config['worker_pay'])
+        greedy.append(venv.total_payment[0])
+        fixed.append(policies.run_policy(policies.policy_from_spec(baseline), all_jobs, config['max_rounds'],
+                                         config['workers'], 1, config['worker_pay'], seed=seed).total_payment[0])
+    return np.mean(greedy), np.mean(fixed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Learn a daily offer threshold with tabular model-free control.")
+    parser.add_argument('--method', default='q', choices=['q', 'mc'])
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--envs', type=int, default=64, help="episodes per batch")
+    parser.add_argument('--alpha', type=float, default=0.1, help="Q-learning step size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--eval-seeds', type=int, default=50, help="held-out catalogues to evaluate on")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    learner = TabularLearner(args.method, alpha=args.alpha)
+    print(f"{'Batch':>6} {'Episodes':>9} {'Updates/s':>10} {'Table KiB':>10} {'Epsilon':>8} {'Mean payment':>13}")
+
+    def report(stats):
+        if stats.batch % max(1, args.batches // 20) == 0 or stats.batch == args.batches - 1:
+            print(f"{stats.batch:>6} {(stats.batch + 1)*stats.episodes:>9} {stats.updates_per_sec:>10,.0f} "
+                  f"{stats.table_bytes / 1024:>10.1f} {stats.epsilon:>8.3f} {stats.mean_payment / 100:>13.2f}")
+
+    history = train(learner, args.batches, args.envs, config, seed=args.seed, callback=report)
+    updates = sum(stats.updates for stats in history)
+    seconds = sum(stats.seconds for stats in history)
+    print(f"{updates:,} updates in {seconds:.1f}s, {updates / seconds:,.0f} updates/s, "
+          f"{np.count_nonzero(learner.visits.sum(axis=1))}/{len(learner.q)} states visited")
+    # Held-out catalogues come after every training one
+    greedy, fixed = evaluate(learner, range(args.seed + args.batches, args.seed + args.batches + args.eval_seeds),
+                             config)
+    print(f"Greedy policy ${greedy / 100:.2f}, rate:2.9/shortest ${fixed / 100:.2f} on {args.eval_seeds} held-out catalogues")
+
+
+if __name__ == '__main__':
+    main()
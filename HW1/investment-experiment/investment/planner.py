@@ -0,0 +1,363 @@
+"""Exact dynamic programming for finite-horizon MDPs and the job-acceptance problem.
+
+An MDP is any object with the notebook's interface:
+
+    terminal_state(state) -> (is_terminal, value)
+    available_actions(state) -> iterable of actions
+    possible_states(state, action) -> [(probability, expected reward, next state)]
+
+Planner.bellman is the notebook's recursive bellman() behind a bounded LRU
+cache. tabulate() computes the same values bottom-up, one layer of reachable
+states at a time, which suits MDPs where every transition moves one stage
+forward.
+
+JobMDP encodes a JobEnv as (day, active jobs), each job a tuple of its
+constants plus remaining parts and days passed, sorted so equivalent states
+coincide. An action is (work, accept): indices of the active jobs to work and
+of the day's offers to take, decided together as in JobEnv.step. Working a job
+with r parts left completes k < r parts with probability (1-p)^(k-1) p and
+finishes it with probability (1-p)^(r-1), which gives the 1 + Binomial(r-1, p)
+lengths the quantile ranges are based on.
+
+    python -m investment.planner --horizon 2 --worker-rate 3.5
+"""
+import argparse
+import functools
+import itertools
+import math
+import time
+
+from . import job_env
+
+N_WORKERS, COMPLICATION, PAYMENT, LATE_PENALTY, FAIL_PENALTY, SOFT_DEADLINE, HARD_DEADLINE, PARTS_REMAINING, DAYS_PASSED = range(9)
+
+
+class Planner:
+    def __init__(self, mdp, cache_size=2**20):
+        self.mdp = mdp
+        self.bellman = functools.lru_cache(maxsize=cache_size)(self._bellman)
+        self._elapsed = 0
+
+    def _bellman(self, state):
+        is_terminal, term_value = self.mdp.terminal_state(state)
+        if is_terminal:
+            return term_value, None
+        best_value = None
+        best_action = None
+        for action in self.mdp.available_actions(state):
+            exp_action_value = 0
+            for p_state, reward, next_state in self.mdp.possible_states(state, action):
+                exp_action_value += p_state*(reward + self.bellman(next_state)[0])
+            if best_value is None or exp_action_value > best_value:
+                best_value = exp_action_value
+                best_action = action
+        return best_value, best_action
+
+    def solve(self, state):
+        start = time.perf_counter()
+        result = self.bellman(state)
+        self._elapsed += time.perf_counter() - start
+        return result
+
+    def stats(self):
+        info = self.bellman.cache_info()
+        lookups = info.hits + info.misses
+        return {'states': info.misses,
+                'seconds': self._elapsed,
+                'states_per_sec': info.misses / self._elapsed if self._elapsed else 0,
+                'cache_hits': info.hits,
+                'cache_hit_rate': info.hits / lookups if lookups else 0,
+                'cache_size': info.currsize}
+
+
+def tabulate(mdp, start_state):
+    """Bottom-up value iteration over the layers of states reachable from start_state."""
+    start = time.perf_counter()
+    layers = [{start_state}]
+    while True:
+        next_layer = set()
+        for state in layers[-1]:
+            if not mdp.terminal_state(state)[0]:
+                for action in mdp.available_actions(state):
+                    next_layer.update(next_state for _, _, next_state in mdp.possible_states(state, action))
+        if not next_layer:
+            break
+        layers.append(next_layer)
+
+    table = {}
+    for layer in reversed(layers):
+        for state in layer:
+            is_terminal, term_value = mdp.terminal_state(state)
+            if is_terminal:
+                table[state] = (term_value, None)
+                continue
+            best_value = None
+            best_action = None
+            for action in mdp.available_actions(state):
+                exp_action_value = 0
+                for p_state, reward, next_state in mdp.possible_states(state, action):
+                    exp_action_value += p_state*(reward + table[next_state][0])
+                if best_value is None or exp_action_value > best_value:
+                    best_value = exp_action_value
+                    best_action = action
+            table[state] = (best_value, best_action)
+    elapsed = time.perf_counter() - start
+    stats = {'states': len(table), 'seconds': elapsed, 'states_per_sec': len(table) / elapsed if elapsed else 0}
+    return table, stats
+
+
+def job_key(job):
+    return (job.n_workers, job.complication_probability, job.payment, job._late_penalty, job._fail_penalty,
+            job.soft_deadline, job.hard_deadline, job.parts_remaining(), job.days_passed)
+
+
+def payment_current(job, days_passed):
+    # Same arithmetic as Job.payment_current; round() and np.round both round half to even
+    if job[HARD_DEADLINE] - days_passed <= 0:
+        return int(round(-job[FAIL_PENALTY] * job[PAYMENT]))
+    soft_remaining = job[SOFT_DEADLINE] - days_passed
+    if soft_remaining <= 0:
+        return int(round((1 - job[LATE_PENALTY]*abs(soft_remaining - 1)) * job[PAYMENT]))
+    return job[PAYMENT]
+
+
+# A day's plans ask for the same few hundred (job, worked) pairs over and over: on
+# test_jobs.csv at horizon 2, 256 entries hit 97% of lookups, the same as no bound.
+@functools.lru_cache(maxsize=256)
+def job_outcomes(job, worked, min_probability=0):
+    """[(probability, job after the day or None if it ended, payment)] for one job over one day."""
+    if worked:
+        p, remaining = job[COMPLICATION], job[PARTS_REMAINING]
+        outcomes = [((1-p)**(k-1)*p, job[:PARTS_REMAINING] + (remaining-k, job[DAYS_PASSED])) for k in range(1, remaining)]
+        outcomes.append(((1-p)**(remaining-1), None))
+    else:
+        outcomes = [(1.0, job)]
+    outcomes = [(prob, next_job) for prob, next_job in outcomes if prob > min_probability]
+    total = sum(prob for prob, _ in outcomes)
+    results = []
+    for prob, next_job in outcomes:
+        if next_job is None:
+            results.append((prob / total, None, payment_current(job, job[DAYS_PASSED])))
+            continue
+        days_passed = next_job[DAYS_PASSED] + 1
+        if next_job[HARD_DEADLINE] - days_passed <= 0:
+            results.append((prob / total, None, payment_current(next_job, days_passed)))
+        else:
+            results.append((prob / total, next_job[:DAYS_PASSED] + (days_passed,), 0))
+    return results
+
+
+def salvage_value(job, worker_rate=0):
+    """Payment for finishing `job` in its expected length if it is worked every day.
+
+    `worker_rate` charges each worker-day the job still needs at that many cents,
+    so a short horizon does not take on work its workers could have done better.
+    """
+    expected_length = 1 + (job[PARTS_REMAINING] - 1)*job[COMPLICATION]
+    payment = payment_current(job, job[DAYS_PASSED] + math.ceil(expected_length) - 1)
+    return payment - worker_rate*job[N_WORKERS]*expected_length
+
+
+class JobMDP:
+    """The job-acceptance problem from `start_day` to `end_day`.
+
+    Jobs still active at `end_day` are worth `job_value(job)` each, nothing by
+    default. Because that value and the day's payments add up job by job, the
+    last day's Bellman backup is taken per job instead of over the joint
+    outcomes, with the work set chosen by a knapsack over the workers.
+    Outcomes less likely than `min_probability` are dropped and the rest
+    renormalised, and `max_jobs` caps the number of active jobs; both trade
+    exactness for speed and are off by default.
+    """
+    def __init__(self, offers_by_day, n_workers, start_day, end_day, job_value=None, maximal_work_only=True,
+                 min_probability=0, max_jobs=None):
+        self.offers_by_day = offers_by_day
+        self.n_workers = n_workers
+        self.start_day = start_day
+        self.end_day = end_day
+        self.job_value = job_value
+        self.maximal_work_only = maximal_work_only
+        self.min_probability = min_probability
+        self.max_jobs = max_jobs
+        self._expected_values = {}
+        self._offer_values = {}
+
+    @classmethod
+    def from_env(cls, env, horizon=None, worker_rate=0, **kwargs):
+        """The MDP and start state for env's current day, planning `horizon` days ahead.
+
+        With no horizon the plan runs to env.n_days. A shorter horizon values the
+        jobs still active at its end with salvage_value at `worker_rate` unless
+        given a job_value.
+        """
+        end_day = env.n_days if horizon is None else min(env.n_days, env.current_day + horizon)
+        if end_day < env.n_days:
+            kwargs.setdefault('job_value', functools.partial(salvage_value, worker_rate=worker_rate))
+        offers_by_day = {day: tuple(job_key(job) for job in env.all_jobs[day])
+                         for day in range(env.current_day, end_day)}
+        mdp = cls(offers_by_day, env.n_workers, env.current_day, end_day, **kwargs)
+        return mdp, (env.current_day, tuple(sorted(job_key(job) for job in env.jobs)))
+
+    def terminal_state(self, state):
+        day, jobs = state
+        if day >= self.end_day:
+            return True, sum(map(self.job_value, jobs)) if self.job_value else 0
+        if day == self.end_day - 1 and day > self.start_day:
+            return True, self._last_day_value(jobs, self.offers_by_day[day])
+        return False, ()
+
+    def _last_day_value(self, jobs, offers):
+        # Best work set by 0/1 knapsack over workers; work never lowers a job's value, so the
+        # maximal subsets are covered
+        best = [0.0]*(self.n_workers + 1)
+        for job in jobs:
+            gain = self._expected_value(job, True) - self._expected_value(job, False)
+            for capacity in range(self.n_workers, job[N_WORKERS] - 1, -1):
+                best[capacity] = max(best[capacity], best[capacity - job[N_WORKERS]] + gain)
+        work_value = best[-1] + sum(self._expected_value(job, False) for job in jobs)
+        offer_values = self._offer_values.get(offers)
+        if offer_values is None:
+            offer_values = self._offer_values[offers] = sorted(
+                (value for value in map(self.job_value or (lambda job: 0), offers) if value > 0), reverse=True)
+        if self.max_jobs is not None:
+            offer_values = offer_values[:max(0, self.max_jobs - len(jobs))]
+        return work_value + sum(offer_values)
+
+    def _expected_value(self, job, worked):
+        """Expected payment for `job` over its last day plus its value at end_day."""
+        value = self._expected_values.get((job, worked))
+        if value is None:
+            value = self._expected_values[job, worked] = sum(
+                prob*(payment + (self.job_value(next_job) if next_job and self.job_value else 0))
+                for prob, next_job, payment in self._job_outcomes(job, worked))
+        return value
+
+    def available_actions(self, state):
+        day, jobs = state
+        offers = self.offers_by_day[day]
+        if day + 1 >= self.end_day and self.job_value is None:
+            accepts = [()]  # Nothing taken on the last day can pay before the end
+        else:
+            accepts = _distinct_subsets(offers, range(len(offers)))
+            if self.max_jobs is not None:
+                accepts = [accept for accept in accepts if len(jobs) + len(accept) <= self.max_jobs]
+        works = _work_subsets(jobs, self.n_workers, self.maximal_work_only)
+        return [(work, accept) for work in works for accept in accepts]
+
+    def possible_states(self, state, action):
+        day, jobs = state
+        work, accept = action
+        taken = tuple(self.offers_by_day[day][i] for i in accept)
+        if day + 1 >= self.end_day:
+            # Only the expectation of what is left matters, and it adds up job by job
+            value = sum(self._expected_value(job, i in work) for i, job in enumerate(jobs))
+            if self.job_value:
+                value += sum(map(self.job_value, taken))
+            return [(1.0, value, (day + 1, ()))]
+        return [(prob, reward, (day + 1, tuple(sorted(survivors + taken))))
+                for survivors, (prob, reward) in _day_outcomes(jobs, work, self.min_probability).items()]
+
+    def _job_outcomes(self, job, worked):
+        return job_outcomes(job, worked, self.min_probability)
+
+
+def _distinct_subsets(items, indices):
+    subsets = {}
+    for size in range(len(indices) + 1):
+        for subset in itertools.combinations(indices, size):
+            subsets.setdefault(tuple(sorted(items[i] for i in subset)), subset)
+    return list(subsets.values())
+
+
+@functools.lru_cache(maxsize=2**12)
+def _work_subsets(jobs, n_workers, maximal_only):
+    subsets = {}
+
+    def extend(start, subset, used):
+        # Work never lowers a job's payoff, so a subset another idle job still fits into is dominated
+        if not maximal_only or all(used + job[N_WORKERS] > n_workers
+                                   for i, job in enumerate(jobs) if i not in subset):
+            key = (tuple(sorted(jobs[i] for i in subset)), tuple(sorted(job for i, job in enumerate(jobs) if i not in subset)))
+            subsets.setdefault(key, subset)
+        for i in range(start, len(jobs)):
+            if used + jobs[i][N_WORKERS] <= n_workers:
+                extend(i + 1, subset + (i,), used + jobs[i][N_WORKERS])
+
+    extend(0, (), 0)
+    return list(subsets.values())
+
+
+@functools.lru_cache(maxsize=256)
+def _day_outcomes(jobs, work, min_probability=0):
+    """{surviving jobs: (probability, expected payment)} after working `work` for a day."""
+    outcomes = {(): (1.0, 0.0)}
+    for i, job in enumerate(jobs):
+        folded = {}
+        for survivors, (prob, total) in outcomes.items():
+            for job_prob, next_job, payment in job_outcomes(job, i in work, min_probability):
+                key = survivors if next_job is None else tuple(sorted(survivors + (next_job,)))
+                old_prob, old_total = folded.get(key, (0.0, 0.0))
+                folded[key] = (old_prob + prob*job_prob, old_total + job_prob*(total + prob*payment))
+        outcomes = folded
+    return {survivors: (prob, total / prob) for survivors, (prob, total) in outcomes.items()}
+
+
+def env_actions(env, state, action):
+    """Translate a JobMDP action for `state` into JobEnv.step's offer and work action lists."""
+    work, accept = action
+    worked_keys = [state[1][i] for i in work]
+    work_actions = []
+    for job in env.jobs:
+        key = job_key(job)
+        if key in worked_keys:
+            worked_keys.remove(key)
+            work_actions.append(1)
+        else:
+            work_actions.append(0)
+    offer_actions = [int(i in accept) for i in range(len(env.offers))]
+    return offer_actions, work_actions
+
+
+def run_planner(env, horizon=None, cache_size=2**20, **kwargs):
+    """Play env to the end, replanning every day. Returns env and accumulated planner stats."""
+    totals = {'states': 0, 'seconds': 0.0, 'cache_hits': 0}
+    while env.current_day < env.n_days:
+        mdp, state = JobMDP.from_env(env, horizon, **kwargs)
+        planner = Planner(mdp, cache_size)
+        _, action = planner.solve(state)
+        stats = planner.stats()
+        for key in totals:
+            totals[key] += stats[key]
+        env.step(*env_actions(env, state, action))
+    lookups = totals['states'] + totals['cache_hits']
+    totals['states_per_sec'] = totals['states'] / totals['seconds'] if totals['seconds'] else 0
+    totals['cache_hit_rate'] = totals['cache_hits'] / lookups if lookups else 0
+    return env, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play the job catalogue with a receding-horizon DP planner.")
+    parser.add_argument('--jobs', default='./test_jobs.csv')
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--parts', type=int, default=10)
+    parser.add_argument('--horizon', type=int, default=2, help="days to plan ahead, 0 for the full remaining horizon")
+    parser.add_argument('--worker-rate', type=float, default=3.5,
+                        help="cents per worker-day charged against jobs still active at the horizon")
+    parser.add_argument('--min-probability', type=float, default=0)
+    parser.add_argument('--max-jobs', type=int, default=None)
+    parser.add_argument('--cache-size', type=int, default=2**20)
+    args = parser.parse_args(argv)
+    all_jobs = job_env.read_jobs(args.jobs, args.days, args.parts)
+    env = job_env.JobEnv(all_jobs, args.days, args.workers)
+    env, stats = run_planner(env, args.horizon or None, args.cache_size,
+                             worker_rate=args.worker_rate, min_probability=args.min_probability, max_jobs=args.max_jobs)
+    print(f"Total payment: ${env.total_payment/100:.2f}")
+    print(f"States: {stats['states']:,} in {stats['seconds']:.1f}s ({stats['states_per_sec']:,.0f} states/s), "
+          f"state cache hit rate {stats['cache_hit_rate']:.1%}")
+    outcomes = job_outcomes.cache_info()
+    print(f"Job outcome cache hit rate {outcomes.hits / max(1, outcomes.hits + outcomes.misses):.1%}")
+
+
+if __name__ == '__main__':
+    main()
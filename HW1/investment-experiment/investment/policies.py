@@ -0,0 +1,112 @@
+"""The strategies of strategies.py as array kernels over every environment of a VectorJobEnv.
+
+A policy is policy(features, n_workers, rng) -> (n_envs, n_jobs) 0/1 array,
+where features is a JobFeatures of the day's offers or of the active jobs.
+Padding slots, with valid False, are never chosen. allocate_workers is the
+greedy allocate_resources of strategies.py: jobs are taken in priority order
+while they fit, so its masks always pass the capacity check in step().
+
+    run_policy(policy_from_spec('rate:2.9/shortest'), all_jobs, 100, 10, n_envs=256)
+"""
+from collections import namedtuple
+import functools
+
+import numpy as np
+
+from .vector_env import VectorJobEnv
+
+# (n_envs, n_jobs) arrays of what Job.return_rate() and friends return for current=True
+JobFeatures = namedtuple('JobFeatures', ['valid', 'return_rate', 'expected_length', 'workers',
+                                         'soft_deadline_remaining', 'hard_deadline_remaining'])
+
+Policy = namedtuple('Policy', ['name', 'offer_policy', 'work_policy'])
+
+
+def _features(venv, envs, jobs, valid):
+    jobs = np.where(valid, jobs, 0)
+    parts_remaining = venv.parts[jobs] - venv.parts_completed[envs, jobs]
+    expected_length = np.where(parts_remaining > 0, 1 + (parts_remaining - 1)*venv.complication[jobs], 0)
+    workers = venv.workers[jobs]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_rate = np.where(parts_remaining > 0,
+                               venv.payment_current(envs, jobs) / (workers*expected_length), 0)
+    days_passed = venv.days_passed[envs, jobs]
+    return JobFeatures(valid, return_rate, expected_length, workers,
+                       venv.soft_deadline[jobs] - days_passed, venv.hard_deadline[jobs] - days_passed)
+
+
+def offer_features(venv):
+    envs = np.arange(venv.n_envs)[:, None]
+    jobs = np.broadcast_to(venv.offers, (venv.n_envs, len(venv.offers)))
+    return _features(venv, envs, jobs, np.ones(jobs.shape, dtype=bool))
+
+
+def job_features(venv):
+    envs = np.arange(venv.n_envs)[:, None]
+    return _features(venv, envs, venv.active, venv.active >= 0)
+
+
+def allocate_workers(features, priorities, n_workers):
+    """Work jobs in `priorities` order, an (n_envs, n_jobs) argsort, while each still fits."""
+    rows = np.arange(len(priorities))
+    selected = np.zeros(priorities.shape, dtype=np.int8)
+    available = np.full(len(priorities), n_workers)
+    for rank in range(priorities.shape[1]):
+        jobs = priorities[:, rank]
+        workers = features.workers[rows, jobs]
+        fits = features.valid[rows, jobs] & (workers <= available)
+        selected[rows[fits], jobs[fits]] = 1
+        available -= np.where(fits, workers, 0)
+    return selected
+
+
+def accept_all(features, n_workers, rng):
+    return features.valid.astype(np.int8)
+
+
+def _accept_random(p, features, n_workers, rng):
+    return (features.valid & (rng.random(features.valid.shape) < p)).astype(np.int8)
+
+def accept_random(p=0.5):
+    return functools.partial(_accept_random, p)
+
+
+def _accept_rate_thresh(threshold, delta, features, n_workers, rng):
+    draws = rng.random(features.valid.shape)
+    accepted = np.where(features.return_rate > threshold, draws > delta, draws < delta)
+    return (features.valid & accepted).astype(np.int8)
+
+def accept_rate_thresh(threshold, delta=0):
+    return functools.partial(_accept_rate_thresh, threshold, delta)
+
+
+def work_fifo(features, n_workers, rng):
+    return features.valid.astype(np.int8)
+
+
+def work_shortest(features, n_workers, rng):
+    priorities = np.argsort(np.where(features.valid, features.expected_length, np.inf), axis=1, kind='stable')
+    return allocate_workers(features, priorities, n_workers)
+
+
+OFFER_POLICIES = {'all': lambda: accept_all, 'random': accept_random, 'rate': accept_rate_thresh}
+WORK_POLICIES = {'fifo': work_fifo, 'shortest': work_shortest}
+
+
+def policy_from_spec(spec):
+    """Build a Policy from the same '<offer>/<work>' specs as strategies.strategy_from_spec."""
+    offer_spec, work_spec = spec.split('/')
+    offer_name, *args = offer_spec.split(':')
+    if offer_name not in OFFER_POLICIES or work_spec not in WORK_POLICIES:
+        raise ValueError(f"Unknown policy {spec!r}, offers: {sorted(OFFER_POLICIES)}, work: {sorted(WORK_POLICIES)}")
+    return Policy(spec, OFFER_POLICIES[offer_name](*map(float, args)), WORK_POLICIES[work_spec])
+
+
+def run_policy(policy, all_jobs, n_days, n_workers, n_envs, worker_pay=0, seed=None):
+    """Play `policy` in n_envs environments at once. Returns the VectorJobEnv."""
+    rng = np.random.default_rng(seed)
+    venv = VectorJobEnv(all_jobs, n_days, n_workers, n_envs, worker_pay=worker_pay)
+    for _ in range(n_days):
+        venv.step(policy.offer_policy(offer_features(venv), n_workers, rng),
+                  policy.work_policy(job_features(venv), n_workers, rng))
+    return venv
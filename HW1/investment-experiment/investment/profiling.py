@@ -0,0 +1,188 @@
+"""Opt-in latency and size histograms for the app's hot paths.
+
+Nothing is wrapped until enable() runs, which creating_session does for
+sessions configured with profile=True, so the app pays nothing otherwise.
+enable() swaps every registered function or page hook for a timed wrapper
+and disable() puts the originals back. The wrappers stay for the process,
+but only record inside a profiled session: page hooks and other entry
+points registered with a `session` getter check their session against the
+ones enable() was called for, and everything they call is timed only while
+one of those is running. Statistics are kept per server process, logged
+every LOG_INTERVAL seconds, and downloadable as the summary app's custom
+export.
+"""
+from contextlib import contextmanager
+import contextvars
+import functools
+import inspect
+import logging
+import time
+
+from . import job_env
+
+logger = logging.getLogger(__name__)
+
+LOG_INTERVAL = 60
+REPORT_HEADERS = ['Name', 'Round', 'Unit', 'Count', 'Mean', 'P50', 'P90', 'P99', 'Max', 'Total']
+
+enabled = False
+_sessions = set()
+# Whether the running entry point belongs to a profiled session
+_active = contextvars.ContextVar('profiling_active', default=False)
+_targets = []
+_originals = []
+_histograms = {}
+_last_log = 0
+
+
+class Histogram:
+    """Count, total and power-of-two buckets of recorded values."""
+    __slots__ = ('unit', 'count', 'total', 'max', 'buckets')
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0]*64
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[min(63, int(value).bit_length())] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile."""
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if seen >= q*self.count:
+                return min(self.max, 2**bucket - 1 if bucket else 0)
+        return self.max
+
+
+def record(name, value, unit='us', round_number=''):
+    global _last_log
+    key = (name, round_number)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram(unit)
+    histogram.add(value)
+    now = time.monotonic()
+    if now - _last_log >= LOG_INTERVAL:
+        _last_log = now
+        logger.info('profile: ' + '; '.join(
+            f"{name} n={h.count} p50={h.quantile(0.5):.0f}{h.unit} p99={h.quantile(0.99):.0f}{h.unit}"
+            for (name, round_number), h in sorted(_histograms.items(), key=_report_order) if round_number == ''))
+
+
+def active():
+    return _active.get()
+
+
+@contextmanager
+def session_scope(session):
+    """Record what runs inside only if `session` is profiled."""
+    token = _active.set(session is not None and session.code in _sessions)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def timing(name):
+    if not _active.get():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1e6)
+
+
+def _timed(name, func, session):
+    if inspect.isgeneratorfunction(func):
+        # Time the whole iteration, e.g. a custom_export
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if session is None:
+                with timing(name):
+                    yield from func(*args, **kwargs)
+            else:
+                with session_scope(session(*args, **kwargs)), timing(name):
+                    yield from func(*args, **kwargs)
+    elif session is None:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active.get():
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - start) * 1e6)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with session_scope(session(*args, **kwargs)), timing(name):
+                return func(*args, **kwargs)
+    return wrapper
+
+
+def register(owner, attr, name=None, session=None):
+    """Time owner.attr, a module function or a (static) method, while profiling is enabled.
+
+    Entry points such as page hooks give `session`, a function of the call's
+    arguments returning its oTree session, and decide whether it is profiled.
+    """
+    _targets.append((owner, attr, name or f"{getattr(owner, '__name__', owner)}.{attr}", session))
+
+
+def enable(session):
+    """Profile `session`, wrapping the registered functions if this is the process's first."""
+    global enabled
+    _sessions.add(session.code)
+    if enabled:
+        return
+    enabled = True
+    for owner, attr, name, session_of in _targets:
+        raw = vars(owner)[attr]
+        if isinstance(raw, staticmethod):
+            setattr(owner, attr, staticmethod(_timed(name, raw.__func__, session_of)))
+        else:
+            setattr(owner, attr, _timed(name, raw, session_of))
+        _originals.append((owner, attr, raw))
+
+
+def disable():
+    global enabled
+    while _originals:
+        owner, attr, raw = _originals.pop()
+        setattr(owner, attr, raw)
+    _sessions.clear()
+    enabled = False
+
+
+def reset():
+    _histograms.clear()
+
+
+def _report_order(item):
+    (name, round_number), _ = item
+    return name, round_number != '', round_number or 0
+
+
+def report_rows():
+    yield REPORT_HEADERS
+    for (name, round_number), h in sorted(_histograms.items(), key=_report_order):
+        yield [name, round_number, h.unit, h.count, round(h.total / h.count, 1),
+               *(round(h.quantile(q), 1) for q in (0.5, 0.9, 0.99)), round(h.max, 1), round(h.total, 1)]
+
+
+register(job_env.JobEnv, 'step', 'JobEnv.step')
+register(job_env, 'common_job_str', 'common_job_str')
+register(job_env, 'length_quantile', 'length_quantile')
+register(job_env, 'fill_length_quantiles', 'fill_length_quantiles')
@@ -0,0 +1,191 @@
+"""Rebuild each subject's JobEnv from a job catalogue and an exported action log.
+
+The log is custom_export's CSV (export.HEADERS, the test_actions.csv
+schema). Subjects are told apart by its Participant Code column, since
+SubjectID is only unique within a session, and by SubjectID in logs
+without one. Each day's Offer rows are the day's offers in catalogue order with
+the subject's accept actions. Its Work rows are the jobs active at the start
+of the day with the realized work action, -1 for a job that did not fit.
+Progressions come from the catalogue, so playing the same actions again
+rebuilds the same trajectory: a -1 is replayed as a request to work that
+the environment turns down again.
+
+Replaying checks that the logged job names are the environment's. It can
+also check every Work row's parts, deadlines and payments against the
+replayed day. Payments are only expected to match when the catalogue is
+read with the session's pay_scale_factor, late_penalty and fail_penalty,
+so rescoring a session under other settings should pass
+check_payments=False.
+
+    python -m investment.replay test_actions.csv --jobs test_jobs.csv --name lab --processes 4
+    python -m investment.replay test_actions.csv --late-penalty 0.3 --no-payment-check --name rescored
+"""
+import argparse
+import csv
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from . import job_env
+from .export import HEADERS, PARTICIPANT_HEADER
+from .tournament import DEFAULT_CONFIG, SUMMARY_HEADERS, add_config_arguments, load_catalogue, summary_rows
+
+PROGRESS_COLUMNS = ['Parts Completed', 'Soft Deadline Remaining', 'Hard Deadline Remaining']
+PAYMENT_COLUMNS = ['Current Payment', 'Payment Received']
+
+_catalogue = None
+_config = None
+
+
+def _cell(value):
+    if value == '':
+        return ''
+    # Payments are fractional when pay was scaled
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def read_actions(filename):
+    """{subject_id: {day: (offer_rows, work_rows)}} of the log, each row a dict of HEADERS to numbers or ''.
+
+    subject_id is the participant code, or the int SubjectID when the log has no codes.
+    """
+    subjects = {}
+    with open(filename, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        missing = [name for name in HEADERS if name not in header]
+        if missing:
+            raise ValueError(f"{filename} is missing columns {missing}")
+        columns = [header.index(name) for name in HEADERS]
+        code_column = header.index(PARTICIPANT_HEADER) if PARTICIPANT_HEADER in header else None
+        for line in reader:
+            row = dict(zip(HEADERS, (line[i] for i in columns)))
+            for name in HEADERS[4:]:
+                row[name] = _cell(row[name])
+            subject_id = int(row['SubjectID']) if code_column is None else line[code_column]
+            days = subjects.setdefault(subject_id, {})
+            offers, work = days.setdefault(int(row['Day']), ([], []))
+            if row['Action Type'] == 'Offer':
+                offers.append(row)
+            elif row['Action Type'] == 'Work':
+                work.append(row)
+            else:
+                raise ValueError(f"{filename}: unknown Action Type {row['Action Type']!r}")
+    return subjects
+
+
+def _check_names(subject_id, day, kind, rows, jobs):
+    logged = [row['Job Name'] for row in rows]
+    expected = [job.name for job in jobs]
+    if logged != expected:
+        raise ValueError(f"Subject {subject_id} day {day}: logged {kind} {logged} are not the environment's {expected}")
+
+
+def replay_subject(subject_id, days, all_jobs, n_days, n_workers, worker_pay=0, check_payments=True):
+    """Play one subject's logged days, then the rest of the n_days. Returns the JobEnv and a list of mismatches.
+
+    A mismatch is (subject_id, day, job name, column, logged, replayed). Days
+    without rows had no offers and no active jobs, and are played as such.
+    Days after the last logged one are played with nothing taken or worked,
+    as LiveInvestment.before_next_page plays a participant's remaining days,
+    so worker_pay is charged for them as in the session.
+    """
+    env = job_env.JobEnv(all_jobs, n_days, n_workers, worker_pay=worker_pay)
+    columns = ['Accepted/Worked On'] + PROGRESS_COLUMNS + (PAYMENT_COLUMNS if check_payments else [])
+    mismatches = []
+    last_logged = max(days, default=0)
+    if last_logged > n_days:
+        raise ValueError(f"Subject {subject_id} has days logged up to {last_logged}, after the last day {n_days}")
+    for day in range(1, n_days + 1):
+        if day > last_logged:
+            env.step([0]*len(env.offers), [0]*len(env.jobs))
+            continue
+        offers, work = days.get(day, ([], []))
+        _check_names(subject_id, day, 'offers', offers, env.offers)
+        _check_names(subject_id, day, 'jobs', work, env.jobs)
+        env.step([row['Accepted/Worked On'] for row in offers],
+                 [int(row['Accepted/Worked On'] != 0) for row in work])
+        hist = env.history.history[-1]
+        for row, job, action in zip(work, hist.jobs, hist.job_actions):
+            replayed = {'Accepted/Worked On': action,
+                        'Parts Completed': job.parts_completed,
+                        'Soft Deadline Remaining': job.soft_deadline_remaining(),
+                        'Hard Deadline Remaining': job.hard_deadline_remaining(),
+                        'Current Payment': job.payment_current(),
+                        'Payment Received': job.final_payment if job.is_ended() else ''}
+            for column in columns:
+                if row[column] != replayed[column]:
+                    mismatches.append((subject_id, day, row['Job Name'], column, row[column], replayed[column]))
+    return env, mismatches
+
+
+def _init_worker(jobs_file, config):
+    global _catalogue, _config
+    _catalogue = load_catalogue(jobs_file, config)
+    job_env.register_catalogue(_catalogue)
+    _config = config
+
+
+def _replay_task(task):
+    subject_id, days, check_payments = task
+    return replay_subject(subject_id, days, _catalogue, _config['max_rounds'], _config['workers'],
+                          worker_pay=_config['worker_pay'], check_payments=check_payments)
+
+
+def replay_log(actions_file, jobs_file='./test_jobs.csv', config=None, processes=1, check_payments=True):
+    """Replay every subject of the log. Returns ({subject_id: JobEnv}, mismatches).
+
+    With processes other than 1, subjects are replayed on a process pool and
+    the environments come back referring to this process's copy of the
+    catalogue.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    subjects = read_actions(actions_file)
+    tasks = [(subject_id, days, check_payments) for subject_id, days in subjects.items()]
+    _init_worker(jobs_file, config)
+    if processes == 1:
+        results = map(_replay_task, tasks)
+    else:
+        executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(jobs_file, config))
+        results = executor.map(_replay_task, tasks, chunksize=max(1, len(tasks) // (4*(processes or os.cpu_count()))))
+    envs = {}
+    mismatches = []
+    try:
+        for (subject_id, _, _), (env, subject_mismatches) in zip(tasks, results):
+            envs[subject_id] = env
+            mismatches += subject_mismatches
+    finally:
+        if processes != 1:
+            executor.shutdown()
+    return envs, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild subjects' environments from an exported action log.")
+    parser.add_argument('actions', help="custom_export CSV")
+    parser.add_argument('--jobs', default='./test_jobs.csv', help="job catalogue CSV the session used")
+    parser.add_argument('--name', default='replay', help="write <NAME>_summary.csv (default replay)")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes (0: all cores)")
+    parser.add_argument('--no-payment-check', action='store_true',
+                        help="only check progress, e.g. when rescoring under other penalties")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    envs, mismatches = replay_log(args.actions, args.jobs, config, processes=args.processes or None,
+                                  check_payments=not args.no_payment_check)
+    with open(f'{args.name}_summary.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(SUMMARY_HEADERS)
+        for subject_id, env in envs.items():
+            writer.writerows(summary_rows(subject_id, env))
+    print(f"{'SubjectID':>9} {'Days':>5} {'Payment':>9}")
+    for subject_id, env in envs.items():
+        print(f"{subject_id:>9} {env.current_day:>5} {env.total_payment/100:>9.2f}")
+    for mismatch in mismatches[:20]:
+        print("Subject {} day {} job {}: {} logged {!r}, replayed {!r}".format(*mismatch))
+    print(f"Replayed {len(envs)} subjects to {args.name}_summary.csv, {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
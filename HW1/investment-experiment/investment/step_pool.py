@@ -0,0 +1,142 @@
+"""Step participants' days ahead on a process pool, from what their page has ticked so far.
+
+Every participant's timer runs out at the same moment, so every Investment
+submit of a round reaches the server at once, and each one steps its
+JobEnv and the next page renders its tables while the others queue. With
+the session config step_processes > 0, DraftInvestment is shown in place
+of the Investment page, and it also sends the jobs ticked so far to its
+live method whenever they change, a draft.
+speculate() hands the environment and the draft to a process pool, which
+steps a copy and renders the next page's payloads while the participant
+is still deciding. When the submit names the same jobs as the draft and
+the environment has not changed since, take() returns the stepped
+environment and payloads, and the request only has to commit them.
+
+A submit that differs from its draft is stepped in the request as before:
+it has to wait either way, and stepping in place is quicker than a round
+trip through the pool. So is a draft the pool has not started on yet.
+Stepping is deterministic, so a committed draft is the environment the
+request would have made.
+
+Drafts and pools live in the server process, like the page caches. The
+workers register the session's catalogue once, so environments travel as
+their compact pickles. A pool runs only while a participant who drafted on
+it has days left: finish() stops it after their last day, and the next
+draft starts a new one.
+
+The mode is off by default and not recommended for lab sessions: stepping
+is a small part of a submit next to loading the participant, and
+benchmarks/submit_burst.py measures little gain. Set step_processes to try
+it on a machine with cores to spare.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import pickle
+
+from . import job_env
+
+logger = logging.getLogger(__name__)
+
+# The environment's day and revision when the draft was made, and the job names it ticked
+Draft = namedtuple('Draft', ['day', 'revision', 'offers', 'work', 'future'])
+
+_pools = {}
+# Codes of the participants who drafted on each catalogue's pool and have days left
+_users = {}
+_drafts = {}
+_catalogue = None
+
+
+def day_actions(env, offer_names, work_names):
+    """JobEnv.step's offer and work actions for the jobs named on the page."""
+    offer_names = set(offer_names)
+    work_names = set(work_names)
+    return ([int(job.name in offer_names) for job in env.offers],
+            [int(job.name in work_names) for job in env.jobs])
+
+
+def _names(names):
+    # Forms send '' for nothing ticked
+    return frozenset(name for name in names if name)
+
+
+def _init_worker(all_jobs):
+    global _catalogue
+    _catalogue = all_jobs
+    job_env.register_catalogue(all_jobs)
+
+
+def _step_task(blob, offer_names, work_names, renders):
+    env = pickle.loads(blob).bind(_catalogue)
+    env.step(*day_actions(env, offer_names, work_names))
+    return env, {name: render(env) for name, render in renders.items()}
+
+
+def _catalogue_key(env):
+    return env.catalogue_key or job_env.register_catalogue(env.all_jobs)
+
+
+def pool(env, processes):
+    """The pool stepping environments of env's catalogue, started on first use."""
+    key = _catalogue_key(env)
+    executor = _pools.get(key)
+    if executor is None:
+        executor = _pools[key] = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(env.all_jobs,))
+    return executor
+
+
+def speculate(code, env, offer_names, work_names, processes, renders):
+    """Step a copy of env with the drafted jobs on the pool, in place of participant code's earlier draft.
+
+    renders maps page payload names to functions of the stepped environment.
+    """
+    offers, work = _names(offer_names), _names(work_names)
+    draft = _drafts.get(code)
+    if draft is not None:
+        if draft[:4] == (env.current_day, env.revision, offers, work):
+            return
+        draft.future.cancel()
+    future = pool(env, processes).submit(_step_task, pickle.dumps(env), offers, work, renders)
+    _users.setdefault(_catalogue_key(env), set()).add(code)
+    _drafts[code] = Draft(env.current_day, env.revision, offers, work, future)
+
+
+def take(code, env, offer_names, work_names):
+    """The stepped environment and payloads of participant code's draft, or None if the request must step env.
+
+    The draft is used when it was made from env's current state with the
+    same jobs. It is forgotten either way.
+    """
+    draft = _drafts.pop(code, None)
+    if draft is None:
+        return None
+    if (draft[:4] != (env.current_day, env.revision, _names(offer_names), _names(work_names))
+            or draft.future.cancel()):
+        draft.future.cancel()
+        return None
+    try:
+        return draft.future.result()
+    except Exception:
+        logger.exception("Drafted step failed, stepping in the request")
+        return None
+
+
+def finish(code):
+    """Forget participant code after their last day, stopping pools no one else drafts on."""
+    draft = _drafts.pop(code, None)
+    if draft is not None:
+        draft.future.cancel()
+    for key, codes in list(_users.items()):
+        codes.discard(code)
+        if not codes:
+            del _users[key]
+            _pools.pop(key).shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    for executor in _pools.values():
+        executor.shutdown(cancel_futures=True)
+    _pools.clear()
+    _users.clear()
+    _drafts.clear()
@@ -0,0 +1,82 @@
+from collections import namedtuple
+import functools
+import random
+from . import job_env
+
+# offer_strat(offers, env) and work_strat(jobs, env) return one 0/1 action per job.
+# They are module-level functions or partials of them so strategies can be sent to
+# worker processes.
+Strategy = namedtuple('Strategy', ['name', 'offer_strat', 'work_strat'])
+
+
+def get_priorities(data, key=lambda x: x):
+    return sorted(range(len(data)), key=lambda i: key(data[i]))
+
+
+def allocate_resources(jobs, sorted_indices, available_resources):
+    job_selection = [0] * len(jobs)
+    for i in sorted_indices:
+        job = jobs[i]
+        if job.n_workers <= available_resources:
+            job_selection[i] = 1
+            available_resources -= job.n_workers
+    return job_selection
+
+
+def accept_all(offers, env):
+    return [1]*len(offers)
+
+
+def _accept_random(p, offers, env):
+    return [int(random.random()<p) for _ in range(len(offers))]
+
+def accept_random(p=0.5):
+    return functools.partial(_accept_random, p)
+
+
+def _accept_rate_thresh(threshold, delta, offers, env):
+    actions = []
+    for job in offers:
+        if job.return_rate() > threshold:
+            actions.append(int(random.random()>delta))
+        else:
+            actions.append(int(random.random()<delta))
+    return actions
+
+def accept_rate_thresh(threshold, delta=0):
+    return functools.partial(_accept_rate_thresh, threshold, delta)
+
+
+def work_fifo(jobs, env):
+    return [1]*len(jobs)
+
+
+def work_shortest(jobs, env):
+    priorities = get_priorities(jobs, key=lambda job: job.expected_length())
+    return allocate_resources(jobs, priorities, env.n_workers)
+
+
+OFFER_STRATEGIES = {'all': lambda: accept_all, 'random': accept_random, 'rate': accept_rate_thresh}
+WORK_STRATEGIES = {'fifo': work_fifo, 'shortest': work_shortest}
+
+
+def strategy_from_spec(spec):
+    """Build a Strategy from '<offer>/<work>', e.g. 'rate:2.9/shortest' or 'random:0.5/fifo'.
+
+    The offer part is a name from OFFER_STRATEGIES followed by its numeric
+    arguments separated by ':', the work part a name from WORK_STRATEGIES.
+    """
+    offer_spec, work_spec = spec.split('/')
+    offer_name, *args = offer_spec.split(':')
+    if offer_name not in OFFER_STRATEGIES or work_spec not in WORK_STRATEGIES:
+        raise ValueError(f"Unknown strategy {spec!r}, offers: {sorted(OFFER_STRATEGIES)}, work: {sorted(WORK_STRATEGIES)}")
+    return Strategy(spec, OFFER_STRATEGIES[offer_name](*map(float, args)), WORK_STRATEGIES[work_spec])
+
+
+def run_strategy(strategy, all_jobs, n_days, n_workers, worker_pay=0, seed=None):
+    if seed is not None:
+        random.seed(seed)
+    env = job_env.JobEnv(all_jobs, n_days, n_workers, worker_pay=worker_pay)
+    for _ in range(n_days):
+        env.step(strategy.offer_strat(env.offers, env), strategy.work_strat(env.jobs, env))
+    return env
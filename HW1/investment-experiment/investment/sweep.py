@@ -0,0 +1,250 @@
+"""Sweep the session config: strategies played over a grid or Latin-hypercube sample of settings.
+
+A cell is one setting of some DEFAULT_CONFIG knobs on top of a base config.
+Every (cell, strategy, seed) is one run_strategy session, on the --jobs
+catalogue with `random` seeded to the seed as in tournament.py, or with
+--generated on the jobs of JobGenerator(seed) as in evaluation.py. Reading
+a catalogue CSV fixes parts and needs max_rounds to cover its last day, so
+sweeps over those knobs want generated catalogues. round_length only matters
+to the live session and is not a knob here.
+
+Each run's METRICS are kept in a content-addressed cache: one JSON file per
+run under cache_dir, named after the SHA-1 of (CACHE_VERSION, catalogue,
+config, strategy spec, seed). The catalogue is the CSV's catalogue.file_key
+or 'generator'. Runs already in the cache are not played again, so a
+widened grid only plays its new cells. Workers write their files under a
+temporary name and rename them, so a sweep interrupted at any point resumes
+from the runs that finished. Bump CACHE_VERSION when a change to the
+environment or the strategies makes cached results stale.
+
+    python -m investment.sweep rate:2.9/shortest all/fifo --grid late-penalty=0.1,0.15,0.3 --grid workers=8,10,12
+    python -m investment.sweep rate:2.9/shortest --lhs fail-penalty=0:0.5 --lhs pay-scale-factor=1:3 --samples 32 \\
+        --generated --seeds 0:50 --processes 4
+"""
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import functools
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+from scipy.stats import qmc
+
+from . import catalogue
+from .evaluation import METRIC_NAMES, metric_values
+from .generator import JobGenerator
+from .strategies import run_strategy, strategy_from_spec
+from .tournament import CONFIG_TYPES, DEFAULT_CONFIG, add_config_arguments, load_catalogue, parse_seeds
+
+CACHE_VERSION = 1
+
+# cell indexes the sweep's cells, values are METRICS in METRIC_NAMES order
+RunResult = namedtuple('RunResult', ['cell', 'strategy', 'seed', 'values', 'cached'])
+
+
+def _check_params(names):
+    unknown = [name for name in names if name not in DEFAULT_CONFIG]
+    if unknown:
+        raise ValueError(f"Unknown parameters {unknown}, parameters: {list(DEFAULT_CONFIG)}")
+
+
+def grid(params):
+    """Every combination of {parameter: [values]}, as a list of dicts."""
+    _check_params(params)
+    return [dict(zip(params, values)) for values in itertools.product(*params.values())]
+
+
+def latin_hypercube(ranges, n_samples, seed=0):
+    """n_samples cells of {parameter: (low, high)} by Latin-hypercube sampling.
+
+    Integer parameters (CONFIG_TYPES) are rounded, so their strata may
+    repeat values.
+    """
+    _check_params(ranges)
+    lows, highs = zip(*ranges.values())
+    sample = qmc.scale(qmc.LatinHypercube(d=len(ranges), seed=seed).random(n_samples), lows, highs)
+    cells = []
+    for row in sample.tolist():
+        cells.append({name: int(round(value)) if CONFIG_TYPES[name] is int else value
+                      for name, value in zip(ranges, row)})
+    return cells
+
+
+def run_key(catalogue_id, config, spec, seed):
+    # Cast to the knobs' types so pay_scale_factor 1 and 1.0 share their runs
+    settings = tuple(sorted((name, CONFIG_TYPES[name](value) if name in CONFIG_TYPES else value)
+                            for name, value in config.items()))
+    return hashlib.sha1(repr((CACHE_VERSION, catalogue_id, settings, spec, seed)).encode()).hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + '.json')
+
+
+def read_cached(cache_dir, key):
+    try:
+        with open(cache_path(cache_dir, key)) as file:
+            return json.load(file)['values']
+    except FileNotFoundError:
+        return None
+
+
+def write_cached(cache_dir, key, record):
+    path = cache_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(record, file)
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=16)
+def _csv_catalogue(jobs_file, settings):
+    return load_catalogue(jobs_file, dict(settings))
+
+
+def play(jobs_file, config, spec, seed):
+    """METRICS values of one session, on the CSV's jobs or, when jobs_file is None, JobGenerator(seed)'s."""
+    if jobs_file is None:
+        jobs = JobGenerator(seed, parts=config['parts'], pay_scale_factor=config['pay_scale_factor'],
+                            late_penalty=config['late_penalty'], fail_penalty=config['fail_penalty'])
+    else:
+        jobs = _csv_catalogue(jobs_file, tuple(sorted(config.items())))
+    env = run_strategy(strategy_from_spec(spec), jobs, config['max_rounds'], config['workers'],
+                       worker_pay=config['worker_pay'], seed=seed)
+    return [float(value) for value in metric_values(env)]
+
+
+def _run_task(task):
+    cache_dir, jobs_file, catalogue_id, config, spec, seed = task
+    values = play(jobs_file, config, spec, seed)
+    write_cached(cache_dir, run_key(catalogue_id, config, spec, seed),
+                 dict(catalogue=catalogue_id, config=config, strategy=spec, seed=seed,
+                      metrics=METRIC_NAMES, values=values))
+    return values
+
+
+def sweep(cells, strategies, seeds, jobs_file='./test_jobs.csv', config=None, cache_dir='.sweep_cache',
+          processes=1, callback=None):
+    """One RunResult per (cell, strategy spec, seed), playing only the runs missing from the cache.
+
+    jobs_file None plays generated catalogues. callback(n_done, n_to_play),
+    if given, is called as played runs come in.
+    """
+    base = {**DEFAULT_CONFIG, **(config or {})}
+    catalogue_id = 'generator' if jobs_file is None else catalogue.file_key(jobs_file)
+    runs = [(cell, spec, seed) for cell in range(len(cells)) for spec in strategies for seed in seeds]
+    configs = [{**base, **cell} for cell in cells]
+    for spec in strategies:
+        strategy_from_spec(spec)
+    results = {}
+    tasks = []
+    for run in runs:
+        cell, spec, seed = run
+        values = read_cached(cache_dir, run_key(catalogue_id, configs[cell], spec, seed))
+        if values is None:
+            tasks.append((run, (cache_dir, jobs_file, catalogue_id, configs[cell], spec, seed)))
+        else:
+            results[run] = RunResult(cell, spec, seed, values, True)
+    if tasks:
+        if processes == 1:
+            played = map(_run_task, (task for _, task in tasks))
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(processes)
+            chunksize = max(1, len(tasks) // (4*(processes or os.cpu_count())))
+            played = executor.map(_run_task, [task for _, task in tasks], chunksize=chunksize)
+        try:
+            for n_done, ((run, _), values) in enumerate(zip(tasks, played), 1):
+                results[run] = RunResult(*run, values, False)
+                if callback is not None:
+                    callback(n_done, len(tasks))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    return [results[run] for run in runs]
+
+
+def cell_table(cells, strategies, results, metric='total_payment'):
+    """Rows of cell index, its settings, then the mean and standard deviation of `metric` per strategy."""
+    column = METRIC_NAMES.index(metric)
+    values = {}
+    for result in results:
+        values.setdefault((result.cell, result.strategy), []).append(result.values[column])
+    rows = []
+    for i, cell in enumerate(cells):
+        row = [i, cell]
+        for spec in strategies:
+            sample = np.array(values[i, spec])
+            row += [sample.mean(), sample.std(ddof=1) if len(sample) > 1 else 0.0]
+        rows.append(row)
+    return rows
+
+
+def _parse_param(text):
+    name, _, values = text.partition('=')
+    return name.replace('-', '_'), values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play strategies over a grid or sample of session settings.")
+    parser.add_argument('strategies', nargs='+', help="strategy specs such as rate:2.9/shortest or all/fifo")
+    parser.add_argument('--grid', action='append', default=[], metavar='PARAM=V1,V2,...',
+                        help="values of one parameter, crossed with the other --grid parameters")
+    parser.add_argument('--lhs', action='append', default=[], metavar='PARAM=LOW:HIGH',
+                        help="range of one parameter for Latin-hypercube sampling")
+    parser.add_argument('--samples', type=int, default=20, help="Latin-hypercube cells (default 20)")
+    parser.add_argument('--sample-seed', type=int, default=0)
+    parser.add_argument('--seeds', default='0:10', help="seed range start:stop (default 0:10)")
+    parser.add_argument('--jobs', default='./test_jobs.csv', help="job catalogue CSV")
+    parser.add_argument('--generated', action='store_true', help="play JobGenerator(seed) catalogues instead")
+    parser.add_argument('--cache', default='.sweep_cache', help="result cache directory (default .sweep_cache)")
+    parser.add_argument('--name', default='sweep', help="write <NAME>_runs.csv (default sweep)")
+    parser.add_argument('--metric', default='total_payment', choices=METRIC_NAMES)
+    parser.add_argument('--processes', type=int, default=1, help="worker processes (0: all cores)")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    if args.grid and args.lhs:
+        parser.error("use either --grid or --lhs")
+    if args.lhs:
+        ranges = {}
+        for name, bounds in map(_parse_param, args.lhs):
+            low, _, high = bounds.partition(':')
+            ranges[name] = (float(low), float(high))
+        cells = latin_hypercube(ranges, args.samples, args.sample_seed)
+    else:
+        params = {}
+        for name, values in map(_parse_param, args.grid):
+            _check_params([name])
+            params[name] = [CONFIG_TYPES[name](value) for value in values.split(',')]
+        cells = grid(params)
+
+    def report(n_done, n_to_play):
+        if n_done % max(1, n_to_play // 10) == 0 or n_done == n_to_play:
+            print(f"Played {n_done}/{n_to_play}")
+
+    results = sweep(cells, args.strategies, parse_seeds(args.seeds), None if args.generated else args.jobs,
+                    config, args.cache, processes=args.processes or None, callback=report)
+    names = list(cells[0]) if cells else []
+    with open(f'{args.name}_runs.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Cell', *names, 'Strategy', 'Seed', *METRIC_NAMES])
+        for result in results:
+            writer.writerow([result.cell, *(cells[result.cell][name] for name in names), result.strategy,
+                             result.seed, *result.values])
+    print(f"{'Cell':>4}  {'Settings':<40} " + ' '.join(f'{spec:>24}' for spec in args.strategies))
+    for i, cell, *stats in cell_table(cells, args.strategies, results, args.metric):
+        settings = ' '.join(f'{name}={value:.3g}' for name, value in cell.items())
+        print(f"{i:>4}  {settings:<40} " +
+              ' '.join(f'{mean:>15.4g} ± {sd:<6.3g}' for mean, sd in zip(stats[::2], stats[1::2])))
+    n_cached = sum(result.cached for result in results)
+    print(f"{len(results)} runs to {args.name}_runs.csv, {len(results) - n_cached} played, {n_cached} from {args.cache}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+from otree.api import Currency as c, currency_range, expect, Bot, Submission
+from . import *
+from .strategies import strategy_from_spec
+
+
+def bot_choices(player):
+    # Job names the session's bot_strategy ('rate:2.9/shortest' by default) ticks, as the page sends them
+    env = get_env(player)
+    strategy = strategy_from_spec(player.session.config.get('bot_strategy', 'rate:2.9/shortest'))
+    offers = [job.name for job, action in zip(env.offers, strategy.offer_strat(env.offers, env)) if action == 1]
+    work = [job.name for job, action in zip(env.jobs, strategy.work_strat(env.jobs, env)) if action == 1]
+    return offers, work
+
+
+class PlayerBot(Bot):
+    def play_round(self):
+        if FrontPage.is_displayed(self.player):
+            yield Submission(FrontPage, check_html=False)
+        if LiveInvestment.is_displayed(self.player):
+            # The days were played by call_live_method
+            yield Submission(LiveInvestment, check_html=False)
+        for page in (Investment, DraftInvestment):
+            if page.is_displayed(self.player):
+                offers, work = bot_choices(self.player)
+                yield Submission(page, dict(offer_actions=','.join(offers), work_actions=','.join(work)),
+                                 check_html=False)
+
+
+def call_live_method(method, group, **kwargs):
+    players = group.get_players()
+    for player in players:
+        method(player.id_in_group, {'type': 'load'})
+    for _ in range(players[0].session.n_days):
+        for player in players:
+            offers, work = bot_choices(player)
+            method(player.id_in_group, {'type': 'submit', 'day': get_env(player).current_day + 1,
+                                        'offers': offers, 'work': work})
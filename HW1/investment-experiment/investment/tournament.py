@@ -0,0 +1,172 @@
+"""Run strategies over a range of seeds against the session's job catalogue.
+
+Runs are split into chunks and fanned out over a ProcessPoolExecutor. Each
+worker loads the catalogue once, and every run reseeds `random` with its own
+seed, so the output does not depend on the number of processes. Results are
+written in run order to <name>_summary.csv and <name>_strategies.csv as each
+chunk finishes, in the same format as the notebook's write_csvs.
+
+With --store, every run's day history is appended to a history_store
+directory instead, and the summary CSV is computed from it at the end.
+
+    python -m investment.tournament rate:2.9/shortest rate:3.1/fifo --seeds 0:100 --processes 8
+"""
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import history_store, job_env
+from .strategies import run_strategy, strategy_from_spec
+
+SUMMARY_HEADERS = ['sid', 'Day', 'Job Count', 'Workers Assigned', 'Utilization', 'Worker Rate', 'Active Worker Rate',
+                   'Average Length', 'Average Workers', 'Expected Commitment', 'Payment']
+STRATEGY_HEADERS = ['sid', 'Strategy']
+
+# Same knobs and defaults as the inv_experiment session config
+DEFAULT_CONFIG = dict(max_rounds=100, workers=10, parts=10, late_penalty=0.15, fail_penalty=0.2,
+                      worker_pay=0, pay_scale_factor=1)
+# Their types, declared because whole defaults such as pay_scale_factor=1 do not say float
+CONFIG_TYPES = dict(max_rounds=int, workers=int, parts=int, late_penalty=float, fail_penalty=float,
+                    worker_pay=float, pay_scale_factor=float)
+
+_catalogue = None
+_config = None
+_writer = None
+
+
+def load_catalogue(jobs_file, config):
+    all_jobs = job_env.read_jobs(jobs_file,
+                                 config['max_rounds'],
+                                 config['parts'],
+                                 pay_scale_factor=config['pay_scale_factor'],
+                                 late_penalty=config['late_penalty'],
+                                 fail_penalty=config['fail_penalty'])
+    job_env.fill_length_quantiles(job_env.flatten(all_jobs))
+    return all_jobs
+
+
+def _init_worker(jobs_file, config, store=None):
+    global _catalogue, _config, _writer
+    _catalogue = load_catalogue(jobs_file, config)
+    _config = config
+    _writer = history_store.HistoryWriter(store) if store else None
+
+
+def summary_rows(sid, env):
+    return [[sid,
+             day_hist.day,
+             len(day_hist.job_actions),
+             day_hist.get_n_workers_assigned(),
+             np.round(day_hist.get_utilization(),3),
+             np.round(day_hist.get_worker_rate(),2),
+             np.round(day_hist.get_active_worker_rate(),2),
+             np.round(day_hist.get_average_length(),1),
+             np.round(day_hist.get_average_workers(),1),
+             np.round(day_hist.get_expected_commitment(),1),
+             day_hist.get_payment()]
+            for day_hist in env.history.history]
+
+
+def store_summary_rows(store):
+    """summary_rows of every run in a history store, by vectorized group-bys over its columns."""
+    summary = history_store.day_summary(store)
+    columns = [summary['run'], summary['day'], summary['job_count'], summary['workers_assigned'],
+               np.round(summary['utilization'],3),
+               np.round(summary['worker_rate'],2),
+               np.round(summary['active_worker_rate'],2),
+               np.round(summary['average_length'],1),
+               np.round(summary['average_workers'],1),
+               np.round(summary['expected_commitment'],1),
+               summary['payment']]
+    return zip(*(column.tolist() for column in columns))
+
+
+def _run_chunk(runs):
+    results = []
+    for sid, strategy, seed in runs:
+        env = run_strategy(strategy, _catalogue, _config['max_rounds'], _config['workers'],
+                           worker_pay=_config['worker_pay'], seed=seed)
+        if _writer is None:
+            results.append(summary_rows(sid, env))
+        else:
+            _writer.append(sid, env)
+    if _writer is not None:
+        _writer.flush()
+    return results
+
+
+def run_tournament(strategies, seeds, name='test', jobs_file='./test_jobs.csv', config=None,
+                   processes=None, chunk_size=None, store=None):
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    if store and os.path.exists(store):
+        raise ValueError(f"History store {store} already exists")
+    seeds = list(seeds)
+    runs = [(si*len(seeds) + k, strategy, seed)
+            for si, strategy in enumerate(strategies)
+            for k, seed in enumerate(seeds)]
+    processes = processes or os.cpu_count()
+    chunk_size = chunk_size or max(1, len(runs) // (4*processes))
+    chunks = [runs[i:i+chunk_size] for i in range(0, len(runs), chunk_size)]
+
+    with open(f'{name}_strategies.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(STRATEGY_HEADERS)
+        for sid, strategy, seed in runs:
+            writer.writerow([sid, f'{strategy.name} seed={seed}'])
+
+    with open(f'{name}_summary.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(SUMMARY_HEADERS)
+        if processes == 1:
+            _init_worker(jobs_file, config, store)
+            results = map(_run_chunk, chunks)
+            _write_results(writer, results)
+        else:
+            with ProcessPoolExecutor(processes, initializer=_init_worker,
+                                     initargs=(jobs_file, config, store)) as executor:
+                _write_results(writer, executor.map(_run_chunk, chunks))
+        if store:
+            writer.writerows(store_summary_rows(store))
+    return len(runs)
+
+
+def _write_results(writer, results):
+    for chunk in results:
+        for rows in chunk:
+            writer.writerows(rows)
+
+
+def parse_seeds(s):
+    start, _, stop = s.partition(':')
+    return range(int(start), int(stop)) if stop else range(int(start), int(start)+1)
+
+
+def add_config_arguments(parser):
+    """--max-rounds, --workers, ... options for the DEFAULT_CONFIG knobs."""
+    for key, value in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=CONFIG_TYPES[key], default=value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run strategies over seeds against a job catalogue.")
+    parser.add_argument('strategies', nargs='+', help="strategy specs such as rate:2.9/shortest or all/fifo")
+    parser.add_argument('--seeds', default='0:10', help="seed range start:stop (default 0:10)")
+    parser.add_argument('--name', default='test', help="output file prefix (default test)")
+    parser.add_argument('--jobs', default='./test_jobs.csv', help="job catalogue CSV")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--store', default=None, help="keep every day history in this history store directory")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    n_runs = run_tournament([strategy_from_spec(spec) for spec in args.strategies], parse_seeds(args.seeds),
+                            name=args.name, jobs_file=args.jobs, config=config,
+                            processes=args.processes, chunk_size=args.chunk_size, store=args.store)
+    print(f"Wrote {n_runs} runs to {args.name}_summary.csv and {args.name}_strategies.csv")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+from collections import namedtuple
+import numpy as np
+from . import job_env
+
+FRESH, ACTIVE, COMPLETED, FAILED = 0, 1, 2, 3
+
+# One record per day, arrays are (n_envs, n_offers) or (n_envs, n_active before the step)
+VectorDayHistory = namedtuple('VectorDayHistory', ['day', 'offers', 'offer_actions', 'jobs', 'job_actions',
+                                                   'parts_completed', 'days_worked', 'days_passed',
+                                                   'status', 'final_payment', 'on_time', 'payment'])
+
+
+class VectorJobEnv:
+    """Steps n_envs independent copies of JobEnv over one shared job catalogue.
+
+    Jobs are held as structure-of-arrays: catalogue columns indexed by job and
+    per-environment state indexed by (env, job). `active` lists each
+    environment's active jobs in the same order as JobEnv.jobs, padded with -1,
+    and work actions are given against that order.
+    """
+    def __init__(self, all_jobs, n_days, n_workers, n_envs, worker_pay=0):
+        self.n_days = n_days
+        self.n_workers = n_workers
+        self.n_envs = n_envs
+        self.worker_pay = worker_pay
+        if hasattr(all_jobs, 'key'):
+            # A generated catalogue (generator.JobGenerator) has no end, keep the days played
+            all_jobs = [all_jobs[day] for day in range(n_days)]
+        self.all_jobs = all_jobs
+        self.catalogue = job_env.flatten(all_jobs)
+        self.day_offsets = np.cumsum([0] + [len(day_jobs) for day_jobs in all_jobs])
+        self.workers = np.array([job.n_workers for job in self.catalogue], dtype=np.int64)
+        self.parts = np.array([job.parts for job in self.catalogue], dtype=np.int64)
+        self.complication = np.array([job.complication_probability for job in self.catalogue], dtype=float)
+        self.soft_deadline = np.array([job.soft_deadline for job in self.catalogue], dtype=np.int64)
+        self.hard_deadline = np.array([job.hard_deadline for job in self.catalogue], dtype=np.int64)
+        self.payment = np.array([job.payment for job in self.catalogue], dtype=float)
+        self.late_penalty = np.array([job._late_penalty for job in self.catalogue], dtype=float)
+        self.fail_penalty = np.array([job._fail_penalty for job in self.catalogue], dtype=float)
+        self.length = np.array([len(job._progression) for job in self.catalogue], dtype=np.int64)
+        self.progression = np.zeros((len(self.catalogue), self.length.max(initial=0)), dtype=np.int64)
+        for i, job in enumerate(self.catalogue):
+            self.progression[i, :len(job._progression)] = job._progression
+        self.reset()
+
+    def reset(self):
+        shape = (self.n_envs, len(self.catalogue))
+        self.parts_completed = np.zeros(shape, dtype=np.int64)
+        self.days_worked = np.zeros(shape, dtype=np.int64)
+        self.days_passed = np.zeros(shape, dtype=np.int64)
+        self.status = np.full(shape, FRESH, dtype=np.int8)
+        self.final_payment = np.full(shape, -1, dtype=float)
+        self.on_time = np.zeros(shape, dtype=bool)
+        self.active = np.full((self.n_envs, 0), -1, dtype=np.int64)
+        self.total_payment = np.zeros(self.n_envs, dtype=float)
+        self.current_day = 0
+        self.history = []
+        self.offers = self._offers_for(self.current_day)
+
+    def _offers_for(self, day):
+        if day >= self.n_days or day >= len(self.all_jobs):
+            return np.arange(0)
+        return np.arange(self.day_offsets[day], self.day_offsets[day+1])
+
+    def n_active(self):
+        return (self.active >= 0).sum(axis=1)
+
+    def payment_current(self, envs, jobs):
+        soft_remaining = self.soft_deadline[jobs] - self.days_passed[envs, jobs]
+        hard_remaining = self.hard_deadline[jobs] - self.days_passed[envs, jobs]
+        payment = self.payment[jobs]
+        late = np.round((1 - self.late_penalty[jobs]*np.abs(soft_remaining - 1)) * payment)
+        failed = np.round(-self.fail_penalty[jobs] * payment)
+        # Late and failed payments are rounded to whole cents as in Job.payment_current, on-time ones are as scaled
+        return np.where(hard_remaining <= 0, failed, np.where(soft_remaining <= 0, late, payment))
+
+    def step(self, offer_actions, work_actions):
+        if self.current_day >= self.n_days:
+            return
+
+        offer_actions = np.asarray(offer_actions, dtype=np.int64).reshape(self.n_envs, len(self.offers))
+        work_actions = np.asarray(work_actions, dtype=np.int64).reshape(self.active.shape)
+        active_jobs = self.active
+        realized_actions = work_actions.copy()
+        worked = np.zeros(active_jobs.shape, dtype=bool)
+        used = np.zeros(self.n_envs, dtype=np.int64)
+        # Capacity is checked in active-job order, exactly like JobEnv.step
+        for c in range(active_jobs.shape[1]):
+            jobs = active_jobs[:, c]
+            wanted = (jobs >= 0) & (work_actions[:, c] == 1)
+            fits = wanted & (used + self.workers[jobs] <= self.n_workers)
+            used += np.where(fits, self.workers[jobs], 0)
+            worked[:, c] = fits
+            realized_actions[wanted & ~fits, c] = -1
+
+        payment_before = self.total_payment.copy()
+        envs, cols = np.nonzero(worked)
+        self._work(envs, active_jobs[envs, cols])
+        self._advance_day(active_jobs)
+        day_payment = self.total_payment - payment_before
+        self.total_payment -= self.worker_pay
+        self._take(offer_actions == 1)
+
+        self.history.append(self._day_history(offer_actions, active_jobs, realized_actions, day_payment))
+        self.offers = self._offers_for(self.current_day)
+
+    def _work(self, envs, jobs):
+        self.parts_completed[envs, jobs] += self.progression[jobs, self.days_worked[envs, jobs]]
+        self.days_worked[envs, jobs] += 1
+        done = self.parts_completed[envs, jobs] == self.parts[jobs]
+        envs, jobs = envs[done], jobs[done]
+        self.status[envs, jobs] = COMPLETED
+        self.on_time[envs, jobs] = self.soft_deadline[jobs] - self.days_passed[envs, jobs] > 0
+        self._end(envs, jobs)
+
+    def _advance_day(self, active_jobs):
+        self.current_day += 1
+        envs, cols = np.nonzero(active_jobs >= 0)
+        jobs = active_jobs[envs, cols]
+        still_active = self.status[envs, jobs] == ACTIVE
+        envs, jobs = envs[still_active], jobs[still_active]
+        self.days_passed[envs, jobs] += 1
+        failed = self.hard_deadline[jobs] - self.days_passed[envs, jobs] <= 0
+        envs, jobs = envs[failed], jobs[failed]
+        self.status[envs, jobs] = FAILED
+        self.on_time[envs, jobs] = False
+        self._end(envs, jobs)
+
+    def _end(self, envs, jobs):
+        payments = self.payment_current(envs, jobs)
+        self.final_payment[envs, jobs] = payments
+        np.add.at(self.total_payment, envs, payments)
+
+    def _take(self, taken):
+        offers = np.broadcast_to(self.offers, taken.shape)
+        envs, cols = np.nonzero(taken)
+        self.status[envs, offers[envs, cols]] = ACTIVE
+        # Drop ended jobs and append the taken offers, keeping JobEnv.jobs order
+        rows = np.arange(self.n_envs)[:, None]
+        kept = (self.active >= 0) & (self.status[rows, self.active] == ACTIVE)
+        candidates = np.concatenate([np.where(kept, self.active, -1), np.where(taken, offers, -1)], axis=1)
+        order = np.argsort(candidates < 0, axis=1, kind='stable')
+        width = (candidates >= 0).sum(axis=1).max(initial=0)
+        self.active = np.take_along_axis(candidates, order, axis=1)[:, :width]
+
+    def _day_history(self, offer_actions, active_jobs, realized_actions, day_payment):
+        rows = np.arange(self.n_envs)[:, None]
+        return VectorDayHistory(day=self.current_day,
+                                offers=self.offers,
+                                offer_actions=offer_actions,
+                                jobs=active_jobs,
+                                job_actions=realized_actions,
+                                parts_completed=self.parts_completed[rows, active_jobs],
+                                days_worked=self.days_worked[rows, active_jobs],
+                                days_passed=self.days_passed[rows, active_jobs],
+                                status=self.status[rows, active_jobs],
+                                final_payment=self.final_payment[rows, active_jobs],
+                                on_time=self.on_time[rows, active_jobs],
+                                payment=day_payment)
+
+    def _job_states(self, day_hist, env, n_jobs):
+        status = day_hist.status[env, :n_jobs]
+        ended = (status == COMPLETED) | (status == FAILED)
+        on_time = [bool(x) if end else None for x, end in zip(day_hist.on_time[env, :n_jobs], ended)]
+        return [job_env.JobState(*fields) for fields in zip(day_hist.parts_completed[env, :n_jobs].tolist(),
+                                                            day_hist.days_worked[env, :n_jobs].tolist(),
+                                                            day_hist.days_passed[env, :n_jobs].tolist(),
+                                                            day_hist.final_payment[env, :n_jobs].tolist(),
+                                                            (status == COMPLETED).tolist(),
+                                                            (status == FAILED).tolist(),
+                                                            on_time)]
+
+    def env_history(self, env):
+        history = job_env.EnvHistory(self.n_days, self.n_workers)
+        for day_hist in self.history:
+            n_jobs = int((day_hist.jobs[env] >= 0).sum())
+            history.record(job_env.DayHistory(day_hist.day,
+                                              [self.catalogue[j] for j in day_hist.offers],
+                                              day_hist.offer_actions[env].tolist(),
+                                              [self.catalogue[j] for j in day_hist.jobs[env, :n_jobs]],
+                                              day_hist.job_actions[env, :n_jobs].tolist(),
+                                              self.n_workers,
+                                              job_states=self._job_states(day_hist, env, n_jobs)))
+        return history
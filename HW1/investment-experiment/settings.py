@@ -21,7 +21,13 @@ SESSION_CONFIGS = [
          allow_submit = True,
          accumulate_time = True,
          worker_pay = 0,
-         pay_scale_factor = 1
+         pay_scale_factor = 1,
+         profile = False,
+         live_rounds = False,
+         # Opt-in, see investment/step_pool.py: the measured gain is small
+         step_processes = 0,
+         # A path to also write the custom export to as Parquet, needs pyarrow
+         export_parquet = ''
      ),
 ]
 ROOMS = [
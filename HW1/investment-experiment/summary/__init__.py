@@ -1,4 +1,5 @@
 from otree.api import *
+from investment import profiling
 
 
 doc = """
@@ -35,3 +36,8 @@ class Results(Page):
 
 page_sequence = [
     Results]
+
+
+def custom_export(players):
+    # Timings recorded by this server process for sessions created with profile=True
+    yield from profiling.report_rows()